@@ -2,7 +2,6 @@ import os
 import asyncio
 import logging
 import random
-from datetime import datetime, time
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
@@ -12,6 +11,21 @@ from src.database.models import init_db
 from src.database import db
 from src.database.betting_db import init_betting_db
 from src.handlers.commands import router
+from src.utils.wallet import load_main_wallet_context
+from src.utils.solana_ws import start_solana_ws
+from src.utils.deposits import get_deposit_watcher
+from src.utils.balance_book import get_balance_book
+from src.utils.payment_indexer import get_payment_indexer
+from src.utils.crypto_executor import warm_up as warm_up_crypto
+from src.utils.loop_monitor import get_loop_monitor
+from src.utils.rent_reclaim import get_rent_reclaimer, RECLAIM_SCHEDULE
+from src.utils.broadcast import get_broadcaster
+from src.utils.scheduler import get_scheduler
+from src.utils.webhook import run_updates, webhook_enabled
+from src.utils.throttling import get_throttling_middleware
+from src.utils.tx_prefilter import get_pending_purchases
+from src.utils.fsm_storage import PostgresStorage, create_fsm_storage
+from src.utils.payouts import settle_fee_accruals, get_payout_worker_pool, FEE_SETTLEMENT_SCHEDULE, PAYOUT_STALE_AFTER
 
 logging.basicConfig(
     level=logging.INFO,
@@ -79,78 +93,54 @@ PROMO_MESSAGES = [
 ]
 
 
-async def promo_message_task(bot: Bot):
-    """Send promotional messages to active groups every hour."""
-    await asyncio.sleep(60)  # Wait 1 minute before first promo
+async def check_stale_payout_jobs():
+    """Warn about payout jobs a stopped worker left in processing."""
+    try:
+        stale = await db.count_stale_payout_jobs(PAYOUT_STALE_AFTER)
+        if stale:
+            logger.warning(f"{stale} payout jobs were left processing by a stopped worker - check them before resetting to pending")
+    except Exception as e:
+        logger.error(f"Error checking payout jobs: {e}")
+
+
+async def send_promo(bot: Bot):
+    """Broadcast a promotional message to active groups (scheduled hourly)."""
+    active_chats = await db.get_active_chats()
+    if not active_chats:
+        return
     
-    while True:
-        try:
-            active_chats = await db.get_active_chats()
-            
-            if active_chats:
-                promo = random.choice(PROMO_MESSAGES)
-                
-                keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text=promo["button"], callback_data="action_menu")]
-                ])
-                
-                for chat_id in active_chats:
-                    try:
-                        await bot.send_message(
-                            chat_id,
-                            promo["text"],
-                            reply_markup=keyboard,
-                            parse_mode=ParseMode.HTML
-                        )
-                        logger.info(f"Sent promo to chat {chat_id}")
-                    except Exception as e:
-                        logger.warning(f"Could not send promo to chat {chat_id}: {e}")
-                    
-                    await asyncio.sleep(1)  # Small delay between chats
-            
-            await asyncio.sleep(3600)  # 1 hour
-            
-        except Exception as e:
-            logger.error(f"Error in promo task: {e}")
-            await asyncio.sleep(60)
+    promo = random.choice(PROMO_MESSAGES)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=promo["button"], callback_data="action_menu")]
+    ])
+    await get_broadcaster().broadcast(
+        bot, active_chats, promo["text"], reply_markup=keyboard, parse_mode=ParseMode.HTML
+    )
 
 
-async def daily_winner_task(bot: Bot):
-    while True:
+async def select_daily_winners(bot: Bot):
+    """Pick and announce the Dick of the Day in every active chat (scheduled daily at 12:00 UTC)."""
+    logger.info("Running daily winner selection...")
+    active_chats = await db.get_active_chats()
+    
+    for chat_id in active_chats:
         try:
-            now = datetime.utcnow()
-            target_hour = 12
-            
-            if now.hour == target_hour:
-                logger.info("Running daily winner selection...")
-                active_chats = await db.get_active_chats()
-                
-                for chat_id in active_chats:
-                    try:
-                        winner = await db.select_daily_winner(chat_id)
-                        if winner:
-                            name = winner['first_name'] or winner['username'] or f"User {winner['telegram_id']}"
-                            if winner['username']:
-                                name = f"@{winner['username']}"
-                            
-                            await bot.send_message(
-                                chat_id,
-                                f"🎉 DICK OF THE DAY 🎉\n\n"
-                                f"Congratulations to {name}!\n\n"
-                                f"You've been awarded +{winner['bonus']} cm bonus growth!\n\n"
-                                f"Keep growing and you might be next!"
-                            )
-                            logger.info(f"Daily winner selected for chat {chat_id}")
-                    except Exception as e:
-                        logger.error(f"Error selecting daily winner for chat {chat_id}: {e}")
-                
-                await asyncio.sleep(3600)
-            else:
-                await asyncio.sleep(300)
+            winner = await db.select_daily_winner(chat_id)
+            if winner:
+                name = winner['first_name'] or winner['username'] or f"User {winner['telegram_id']}"
+                if winner['username']:
+                    name = f"@{winner['username']}"
                 
+                await bot.send_message(
+                    chat_id,
+                    f"🎉 DICK OF THE DAY 🎉\n\n"
+                    f"Congratulations to {name}!\n\n"
+                    f"You've been awarded +{winner['bonus']} cm bonus growth!\n\n"
+                    f"Keep growing and you might be next!"
+                )
+                logger.info(f"Daily winner selected for chat {chat_id}")
         except Exception as e:
-            logger.error(f"Error in daily winner task: {e}")
-            await asyncio.sleep(60)
+            logger.error(f"Error selecting daily winner for chat {chat_id}: {e}")
 
 
 async def main():
@@ -174,12 +164,18 @@ async def main():
     await init_betting_db()
     logger.info("Betting database initialized successfully!")
     
+    # Refuses to start when the key doesn't belong to MAIN_WALLET_ADDRESS
+    load_main_wallet_context(strict=True)
+    await warm_up_crypto()
+    
     bot = Bot(
         token=bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
-    dp = Dispatcher()
+    # Webhook replicas share conversation state through Postgres
+    fsm_storage = create_fsm_storage(multi_instance=webhook_enabled())
+    dp = Dispatcher(storage=fsm_storage)
     
     # Add error handler to log all unhandled exceptions
     @dp.error()
@@ -189,6 +185,11 @@ async def main():
         logger.error(traceback.format_exc())
         return True
     
+    # Inner middleware: only updates a handler matched are charged, so group chatter is free
+    throttling = get_throttling_middleware()
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+    
     dp.include_router(router)
     logger.info(f"Router included with {len(router.message.handlers)} message handlers")
     
@@ -229,14 +230,28 @@ async def main():
     await bot.set_my_commands(private_commands, scope=BotCommandScopeAllPrivateChats())
     logger.info("Bot commands registered for groups and private chats")
     
-    asyncio.create_task(daily_winner_task(bot))
-    asyncio.create_task(promo_message_task(bot))
+    get_loop_monitor().start()
+    start_solana_ws()
+    get_deposit_watcher().start()
+    get_balance_book().start()
+    get_payment_indexer().start(bot)
+    get_pending_purchases().start()
+    scheduler = get_scheduler()
+    # A missed daily winner still runs when a replica comes back; a missed promo is skipped
+    scheduler.add("daily_winner", "0 12 * * *", lambda: select_daily_winners(bot), catch_up=True)
+    scheduler.add("promo_message", "0 * * * *", lambda: send_promo(bot), catch_up=False)
+    scheduler.add("fee_settlement", FEE_SETTLEMENT_SCHEDULE, settle_fee_accruals, catch_up=True)
+    scheduler.add("rent_reclaim", RECLAIM_SCHEDULE, get_rent_reclaimer().reclaim, catch_up=False)
+    if isinstance(fsm_storage, PostgresStorage):
+        scheduler.add("fsm_cleanup", "*/15 * * * *", fsm_storage.cleanup, catch_up=False)
+    scheduler.start()
+    await check_stale_payout_jobs()
+    # Payout workers run on every replica: they claim jobs with FOR UPDATE SKIP LOCKED
+    get_payout_worker_pool().start()
     
     logger.info("Starting FAPCOIN DICK BOT...")
-    logger.info("Daily winner selection task started (runs at 12:00 UTC)")
-    logger.info("Promo message task started (runs every hour)")
     
-    await dp.start_polling(bot)
+    await run_updates(dp, bot, bot_token)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,10 @@
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 import random
-from sqlalchemy import select, update, and_, func, or_
+from sqlalchemy import select, update, delete, and_, func, or_, case, bindparam, BigInteger, Float
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models import User, UserChat, Transaction, DailyWinner, PvpChallenge, SupportRequest, BotSettings, UserWallet, FapcoinBet, GroupOwnerWallet, BetStats, create_async_session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .models import User, UserChat, Transaction, DailyWinner, PvpChallenge, SupportRequest, BotSettings, UserWallet, FapcoinBet, GroupOwnerWallet, BetStats, FeeAccrual, PayoutJob, IncomingPayment, RetiredWallet, InactiveChat, ScheduledJob, FsmState, create_async_session
 
 
 SessionLocal = None
@@ -15,6 +17,118 @@ def get_session():
     return SessionLocal
 
 
+@asynccontextmanager
+async def advisory_lock(key: int):
+    """pg_try_advisory_lock on a dedicated connection, held until the block exits.
+    
+    Yields whether the lock was acquired; a crashed holder's lock goes away with its connection.
+    """
+    engine = get_session().kw['bind']
+    async with engine.connect() as conn:
+        acquired = bool((await conn.execute(select(func.pg_try_advisory_lock(key)))).scalar())
+        await conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await conn.execute(select(func.pg_advisory_unlock(key)))
+                await conn.commit()
+
+
+async def get_job_last_run(name: str) -> datetime | None:
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(select(ScheduledJob.last_run_at).where(ScheduledJob.name == name))
+        return result.scalar_one_or_none()
+
+
+async def set_job_last_run(name: str, last_run_at: datetime, status: str, error: str = None, duration: float = None):
+    values = {
+        'last_run_at': last_run_at,
+        'last_status': status,
+        'last_error': error[:1024] if error else None,
+        'last_duration': duration,
+        'updated_at': datetime.utcnow(),
+    }
+    Session = get_session()
+    async with Session() as session:
+        stmt = pg_insert(ScheduledJob).values(name=name, **values)
+        await session.execute(stmt.on_conflict_do_update(index_elements=['name'], set_=values))
+        await session.commit()
+
+
+async def get_fsm_record(key: str) -> tuple[str | None, str | None]:
+    """(state, data JSON) of an unexpired FSM record, or (None, None)."""
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(
+            select(FsmState.state, FsmState.data)
+            .where(FsmState.key == key, FsmState.expires_at > datetime.utcnow())
+        )
+        row = result.first()
+        return (row[0], row[1]) if row else (None, None)
+
+
+async def get_active_fsm_keys() -> list[str]:
+    """Keys of every unexpired FSM record."""
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(select(FsmState.key).where(FsmState.expires_at > datetime.utcnow()))
+        return list(result.scalars().all())
+
+
+async def set_fsm_field(key: str, field: str, value: str | None, expires_at: datetime):
+    """Set state or data of an FSM record and push back its expiry.
+    
+    An expired record's other field is cleared so stale state never comes back to life.
+    """
+    other = getattr(FsmState, 'data' if field == 'state' else 'state')
+    Session = get_session()
+    async with Session() as session:
+        stmt = pg_insert(FsmState).values(key=key, expires_at=expires_at, **{field: value})
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={
+                field: value,
+                other.key: case((FsmState.expires_at > datetime.utcnow(), other), else_=None),
+                'expires_at': expires_at,
+            },
+        ))
+        await session.commit()
+
+
+async def delete_fsm_record(key: str):
+    Session = get_session()
+    async with Session() as session:
+        await session.execute(delete(FsmState).where(FsmState.key == key))
+        await session.commit()
+
+
+async def take_fsm_record(key: str, state: str) -> str | None:
+    """Delete an unexpired FSM record that is in state and return its data JSON.
+    
+    One statement, so of several concurrent callers only one gets the record; the rest get None.
+    """
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(
+            delete(FsmState)
+            .where(FsmState.key == key, FsmState.state == state, FsmState.expires_at > datetime.utcnow())
+            .returning(func.coalesce(FsmState.data, '{}'))
+        )
+        row = result.first()
+        await session.commit()
+        return row[0] if row else None
+
+
+async def delete_expired_fsm_records() -> int:
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(delete(FsmState).where(FsmState.expires_at <= datetime.utcnow()))
+        await session.commit()
+        return result.rowcount
+
+
 async def get_or_create_user(telegram_id: int, username: str = None, first_name: str = None) -> User:
     Session = get_session()
     async with Session() as session:
@@ -219,8 +333,8 @@ async def get_or_create_user_wallet(telegram_id: int) -> UserWallet:
         result = await session.execute(select(UserWallet).where(UserWallet.telegram_id == telegram_id))
         wallet = result.scalar_one_or_none()
         if not wallet:
-            from src.utils.wallet import generate_wallet
-            public_key, encrypted_private_key = generate_wallet(telegram_id)
+            from src.utils.crypto_executor import generate_wallet
+            public_key, encrypted_private_key = await generate_wallet(telegram_id)
             wallet = UserWallet(
                 telegram_id=telegram_id,
                 public_key=public_key,
@@ -257,7 +371,8 @@ async def update_wallet_balance(telegram_id: int, new_balance: float) -> bool:
         return False
 
 
-async def create_pending_transaction(telegram_id: int, chat_id: int, package_number: int, expected_amount: float) -> Transaction:
+async def create_pending_transaction(telegram_id: int, chat_id: int, package_number: int, expected_amount: float,
+                                     reference: str = None) -> Transaction:
     Session = get_session()
     async with Session() as session:
         import uuid
@@ -268,7 +383,8 @@ async def create_pending_transaction(telegram_id: int, chat_id: int, package_num
             chat_id=chat_id,
             amount_paid=expected_amount,
             package_number=package_number,
-            status='pending'
+            status='pending',
+            reference=reference
         )
         session.add(transaction)
         await session.commit()
@@ -276,61 +392,242 @@ async def create_pending_transaction(telegram_id: int, chat_id: int, package_num
         return transaction
 
 
-async def get_pending_transactions(telegram_id: int) -> list:
+async def is_transaction_already_used(tx_hash: str) -> bool:
     Session = get_session()
     async with Session() as session:
         result = await session.execute(
             select(Transaction).where(
                 and_(
-                    Transaction.telegram_id == telegram_id,
-                    Transaction.status == 'pending'
+                    Transaction.transaction_id == tx_hash,
+                    Transaction.status == 'confirmed'
                 )
-            ).order_by(Transaction.created_at.desc())
+            )
         )
-        return result.scalars().all()
+        return result.scalar_one_or_none() is not None
 
 
-async def is_transaction_already_used(tx_hash: str) -> bool:
+PURCHASE_AMOUNT_TOLERANCE = 0.01
+PURCHASE_CLOCK_SKEW = timedelta(minutes=2)
+
+
+async def _confirm_purchase(session: AsyncSession, tx: Transaction, payment: IncomingPayment):
+    """Mark a pending purchase paid by payment and add its growth; caller commits."""
+    tx.status = 'confirmed'
+    tx.transaction_id = payment.signature
+    payment.transaction_row_id = tx.id
+    
+    uc_result = await session.execute(
+        select(UserChat).where(
+            and_(UserChat.telegram_id == tx.telegram_id, UserChat.chat_id == tx.chat_id)
+        )
+    )
+    user_chat = uc_result.scalar_one_or_none()
+    if not user_chat:
+        user_chat = UserChat(telegram_id=tx.telegram_id, chat_id=tx.chat_id, paid_length=0.0)
+        session.add(user_chat)
+    
+    user_chat.paid_length = (user_chat.paid_length or 0.0) + tx.package_number
+
+
+async def record_incoming_payments(payments: list) -> int:
+    """Store payments seen by the indexer (dicts with signature, sender, amount, block_time).
+    
+    Already-recorded signatures are ignored. Returns the number of new rows.
+    """
+    if not payments:
+        return 0
     Session = get_session()
     async with Session() as session:
         result = await session.execute(
-            select(Transaction).where(
-                and_(
-                    Transaction.transaction_id == tx_hash,
-                    Transaction.status == 'confirmed'
-                )
-            )
+            pg_insert(IncomingPayment)
+            .values(payments)
+            .on_conflict_do_nothing(index_elements=['signature'])
+            .returning(IncomingPayment.id)
         )
-        return result.scalar_one_or_none() is not None
+        inserted = len(result.all())
+        await session.commit()
+        return inserted
 
 
-async def confirm_transaction(transaction_id: str, on_chain_tx_id: str, growth: float) -> bool:
+async def get_open_purchase_references(window: timedelta) -> list:
+    """(transaction row id, reference, amount_paid) of pending purchases with a reference, newer than window."""
     Session = get_session()
     async with Session() as session:
         result = await session.execute(
-            select(Transaction).where(Transaction.transaction_id == transaction_id)
+            select(Transaction.id, Transaction.reference, Transaction.amount_paid)
+            .where(and_(
+                Transaction.status == 'pending',
+                Transaction.reference.isnot(None),
+                Transaction.created_at >= datetime.utcnow() - window
+            ))
+            .order_by(Transaction.created_at)
         )
-        tx = result.scalar_one_or_none()
-        if not tx or tx.status != 'pending':
-            return False
+        return [tuple(row) for row in result.all()]
+
+
+async def confirm_reference_payments(payments: list) -> list:
+    """Confirm purchases whose reference key appeared in a payment to the team wallet.
+    
+    payments are dicts with transaction_row_id plus the IncomingPayment fields
+    (signature, sender, amount, block_time). The payment is recorded and linked in the
+    same transaction. Returns match dicts like match_incoming_payments.
+    """
+    if not payments:
+        return []
+    Session = get_session()
+    async with Session() as session:
+        await session.execute(
+            pg_insert(IncomingPayment)
+            .values([{k: p[k] for k in ('signature', 'sender', 'amount', 'block_time')} for p in payments])
+            .on_conflict_do_nothing(index_elements=['signature'])
+        )
+        rows = {tx.id: tx for tx in (await session.execute(
+            select(Transaction)
+            .where(and_(Transaction.id.in_([p['transaction_row_id'] for p in payments]), Transaction.status == 'pending'))
+            .with_for_update(skip_locked=True)
+        )).scalars().all()}
+        recorded = {ip.signature: ip for ip in (await session.execute(
+            select(IncomingPayment)
+            .where(IncomingPayment.signature.in_([p['signature'] for p in payments]))
+            .with_for_update()
+        )).scalars().all()}
         
-        tx.status = 'confirmed'
-        tx.transaction_id = on_chain_tx_id
+        matches = []
+        for p in payments:
+            tx = rows.get(p['transaction_row_id'])
+            payment = recorded.get(p['signature'])
+            if tx is None or payment is None or payment.transaction_row_id is not None:
+                continue
+            await _confirm_purchase(session, tx, payment)
+            matches.append({
+                'telegram_id': tx.telegram_id,
+                'chat_id': tx.chat_id,
+                'growth': tx.package_number,
+                'signature': payment.signature
+            })
         
-        uc_result = await session.execute(
-            select(UserChat).where(
-                and_(UserChat.telegram_id == tx.telegram_id, UserChat.chat_id == tx.chat_id)
-            )
-        )
-        user_chat = uc_result.scalar_one_or_none()
-        if not user_chat:
-            user_chat = UserChat(telegram_id=tx.telegram_id, chat_id=tx.chat_id)
-            session.add(user_chat)
+        await session.commit()
+        return matches
+
+
+async def match_incoming_payments(window: timedelta) -> list:
+    """Confirm pending purchases paid by unmatched incoming payments, in one transaction.
+    
+    A payment matches a pending row whose amount is within PURCHASE_AMOUNT_TOLERANCE
+    and which was created at most `window` before the payment. If the sender is a
+    bot wallet, only that user's rows qualify. Payments that fit several users'
+    purchases are left for the user to claim with their tx hash.
+    
+    Returns [{'telegram_id', 'chat_id', 'growth', 'signature'}] for each confirmed purchase.
+    """
+    Session = get_session()
+    async with Session() as session:
+        since = datetime.utcnow() - window
+        payments = (await session.execute(
+            select(IncomingPayment)
+            .where(and_(IncomingPayment.transaction_row_id.is_(None), IncomingPayment.block_time >= since))
+            .order_by(IncomingPayment.block_time)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        if not payments:
+            return []
         
-        user_chat.paid_length += growth
+        # Hashes already claimed through /verify before the indexer saw them
+        claimed = dict((await session.execute(
+            select(Transaction.transaction_id, Transaction.id)
+            .where(Transaction.transaction_id.in_([p.signature for p in payments]))
+        )).all())
+        
+        pending = (await session.execute(
+            select(Transaction)
+            .where(and_(Transaction.status == 'pending', Transaction.created_at >= since - window))
+            .order_by(Transaction.created_at)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        
+        senders = {p.sender for p in payments if p.sender}
+        wallet_owners = {}
+        if senders:
+            wallet_owners = dict((await session.execute(
+                select(UserWallet.public_key, UserWallet.telegram_id).where(UserWallet.public_key.in_(senders))
+            )).all())
+        
+        matches = []
+        for payment in payments:
+            if payment.signature in claimed:
+                payment.transaction_row_id = claimed[payment.signature]
+                continue
+            candidates = [
+                tx for tx in pending
+                if tx.status == 'pending'
+                and abs(payment.amount - tx.amount_paid) <= tx.amount_paid * PURCHASE_AMOUNT_TOLERANCE
+                and tx.created_at <= payment.block_time + PURCHASE_CLOCK_SKEW
+                and payment.block_time - tx.created_at <= window
+            ]
+            owner = wallet_owners.get(payment.sender)
+            if owner is not None:
+                candidates = [tx for tx in candidates if tx.telegram_id == owner]
+            if len({tx.telegram_id for tx in candidates}) != 1:
+                continue
+            
+            tx = candidates[0]
+            await _confirm_purchase(session, tx, payment)
+            matches.append({
+                'telegram_id': tx.telegram_id,
+                'chat_id': tx.chat_id,
+                'growth': tx.package_number,
+                'signature': payment.signature
+            })
         
         await session.commit()
-        return True
+        return matches
+
+
+async def claim_incoming_payment(signature: str, telegram_id: int) -> dict:
+    """Apply an indexed payment to one of the user's pending purchases by its tx hash.
+    
+    Returns {'status': 'confirmed', 'growth', 'amount'} or {'status': ...} with one of
+    'not_indexed', 'already_used', 'no_pending', 'amount_mismatch'.
+    """
+    Session = get_session()
+    async with Session() as session:
+        payment = (await session.execute(
+            select(IncomingPayment).where(IncomingPayment.signature == signature).with_for_update()
+        )).scalar_one_or_none()
+        if payment is None:
+            return {'status': 'not_indexed'}
+        if payment.transaction_row_id is not None:
+            return {'status': 'already_used'}
+        
+        pending = (await session.execute(
+            select(Transaction)
+            .where(and_(Transaction.telegram_id == telegram_id, Transaction.status == 'pending'))
+            .order_by(Transaction.created_at.desc())
+            .with_for_update()
+        )).scalars().all()
+        if not pending:
+            return {'status': 'no_pending'}
+        
+        affordable = [tx for tx in pending if payment.amount >= tx.amount_paid * 0.99]
+        if not affordable:
+            return {'status': 'amount_mismatch', 'amount': payment.amount}
+        tx = min(affordable, key=lambda t: payment.amount - t.amount_paid)
+        
+        await _confirm_purchase(session, tx, payment)
+        await session.commit()
+        return {'status': 'confirmed', 'growth': tx.package_number, 'amount': payment.amount}
+
+
+async def get_pending_purchase_users(since: datetime) -> list[int]:
+    """Users with a purchase still waiting for payment, created after since."""
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(
+            select(Transaction.telegram_id)
+            .where(and_(Transaction.status == 'pending', Transaction.created_at >= since))
+            .distinct()
+        )
+        return list(result.scalars().all())
 
 
 async def add_paid_growth(telegram_id: int, chat_id: int, growth: float, transaction_id: str, package_number: int) -> bool:
@@ -470,12 +767,36 @@ async def get_active_chats() -> list:
         week_ago = datetime.utcnow() - timedelta(days=7)
         result = await session.execute(
             select(UserChat.chat_id)
-            .where(UserChat.last_active >= week_ago)
+            .where(
+                UserChat.last_active >= week_ago,
+                UserChat.chat_id.not_in(select(InactiveChat.chat_id))
+            )
             .distinct()
         )
         return [row[0] for row in result.all()]
 
 
+async def mark_chats_inactive(chats: list):
+    """Record chats the bot can't post in. chats is a list of (chat_id, reason)."""
+    if not chats:
+        return
+    Session = get_session()
+    async with Session() as session:
+        stmt = pg_insert(InactiveChat).values([
+            {'chat_id': chat_id, 'reason': (reason or '')[:255]} for chat_id, reason in chats
+        ])
+        await session.execute(stmt.on_conflict_do_nothing(index_elements=['chat_id']))
+        await session.commit()
+
+
+async def reactivate_chat(chat_id: int):
+    """The bot is back in the chat; include it in broadcasts again."""
+    Session = get_session()
+    async with Session() as session:
+        await session.execute(delete(InactiveChat).where(InactiveChat.chat_id == chat_id))
+        await session.commit()
+
+
 async def create_pvp_challenge(chat_id: int, challenger_id: int, opponent_id: int, bet: float, opponent_username: str = None) -> PvpChallenge:
     Session = get_session()
     async with Session() as session:
@@ -825,7 +1146,7 @@ async def set_package_growth(package_num: int, growth: int, updated_by: int = No
 
 
 async def get_or_create_user_wallet(telegram_id: int) -> UserWallet:
-    from src.utils.wallet import generate_wallet
+    from src.utils.crypto_executor import generate_wallet
     Session = get_session()
     async with Session() as session:
         result = await session.execute(
@@ -833,12 +1154,13 @@ async def get_or_create_user_wallet(telegram_id: int) -> UserWallet:
         )
         wallet = result.scalar_one_or_none()
         if not wallet:
-            public_key, encrypted_private_key = generate_wallet()
+            public_key, encrypted_private_key = await generate_wallet(telegram_id)
             wallet = UserWallet(
                 telegram_id=telegram_id,
                 public_key=public_key,
                 encrypted_private_key=encrypted_private_key,
-                balance=0.0
+                balance=0.0,
+                onchain_balance_raw=0
             )
             session.add(wallet)
             await session.commit()
@@ -867,6 +1189,14 @@ async def delete_user_wallet(telegram_id: int) -> bool:
             # Only delete if balance is 0
             if wallet.balance > 0:
                 return False
+            # Keep the key so the rent reclaimer can close the wallet's token account later
+            await session.execute(
+                pg_insert(RetiredWallet).values(
+                    telegram_id=wallet.telegram_id,
+                    public_key=wallet.public_key,
+                    encrypted_private_key=wallet.encrypted_private_key,
+                ).on_conflict_do_nothing(index_elements=['public_key'])
+            )
             await session.delete(wallet)
             await session.commit()
             return True
@@ -920,6 +1250,102 @@ async def deduct_wallet_balance(telegram_id: int, amount: float) -> tuple:
         return True, wallet.balance, None
 
 
+async def get_watched_wallets() -> list:
+    """(telegram_id, public_key, onchain_balance_raw) for every burner wallet, for the deposit watcher."""
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(
+            select(UserWallet.telegram_id, UserWallet.public_key, UserWallet.onchain_balance_raw)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+async def get_wallet_page(after_id: int, limit: int) -> list:
+    """(id, telegram_id, public_key, encrypted_private_key) for burner wallets after after_id, in id order."""
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(
+            select(UserWallet.id, UserWallet.telegram_id, UserWallet.public_key, UserWallet.encrypted_private_key)
+            .where(UserWallet.id > after_id)
+            .order_by(UserWallet.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+async def get_open_retired_wallets(after_id: int, limit: int) -> list:
+    """(id, public_key, encrypted_private_key) for retired wallets whose token account isn't closed yet."""
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(
+            select(RetiredWallet.id, RetiredWallet.public_key, RetiredWallet.encrypted_private_key)
+            .where(RetiredWallet.closed_at.is_(None), RetiredWallet.id > after_id)
+            .order_by(RetiredWallet.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+async def mark_retired_wallets_closed(closures: list, signature: str = None):
+    """Mark retired wallets done. closures is a list of (retired wallet id, lamports reclaimed)."""
+    if not closures:
+        return
+    table = RetiredWallet.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('wallet_id'))
+        .values(
+            closed_at=datetime.utcnow(),
+            reclaimed_lamports=bindparam('lamports', type_=BigInteger),
+            close_signature=signature
+        )
+    )
+    Session = get_session()
+    async with Session() as session:
+        await session.execute(stmt, [{'wallet_id': wallet_id, 'lamports': lamports} for wallet_id, lamports in closures])
+        await session.commit()
+
+
+async def apply_onchain_balances(observations: list, decimals: int) -> int:
+    """Apply deposit watcher observations in one bulk UPDATE.
+
+    observations is a list of (telegram_id, previous_raw, observed_raw). Each row is only
+    updated while its watermark still equals previous_raw, so a concurrent sweep can never
+    credit the same deposit twice. Increases are credited to balance; decreases (withdrawals,
+    recoveries) only move the watermark. Rows with a NULL watermark are seeded without a credit:
+    balance isn't tied to the chain (bet losses and withdrawals lower it while the tokens stay
+    put), so the first observation can't tell deposits apart from tokens already spent.
+    Returns the number of rows updated.
+    """
+    if not observations:
+        return 0
+    
+    table = UserWallet.__table__
+    stmt = (
+        update(table)
+        .where(and_(
+            table.c.telegram_id == bindparam('tid'),
+            table.c.onchain_balance_raw.is_not_distinct_from(bindparam('previous', type_=BigInteger))
+        ))
+        .values(
+            balance=table.c.balance + bindparam('credit', type_=Float),
+            onchain_balance_raw=bindparam('observed', type_=BigInteger),
+            updated_at=datetime.utcnow()
+        )
+    )
+    scale = 10 ** decimals
+    params = []
+    for telegram_id, previous, observed in observations:
+        credit = (observed - previous) / scale if previous is not None and observed > previous else 0.0
+        params.append({'tid': telegram_id, 'previous': previous, 'observed': observed, 'credit': credit})
+    
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(stmt, params)
+        await session.commit()
+        return result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(params)
+
+
 async def create_fapcoin_bet(chat_id: int, challenger_id: int, opponent_id: int, bet_amount: float, opponent_username: str = None) -> FapcoinBet | None:
     Session = get_session()
     async with Session() as session:
@@ -1029,6 +1455,18 @@ async def accept_fapcoin_bet(bet_id: int, treasury_wallet: str, dev_wallet: str,
             stats.total_volume += total_pot
             stats.total_treasury_fees += distribution['treasury']
             stats.total_group_fees += distribution['group_owner']
+            
+            # Fees are accrued here and paid out in bulk by the settlement job
+            if treasury_wallet and distribution['treasury'] > 0:
+                session.add(FeeAccrual(
+                    bet_id=bet.id, chat_id=bet.chat_id, fee_type='treasury',
+                    wallet_address=treasury_wallet, amount=distribution['treasury']
+                ))
+            if not is_main_group and group_owner_wallet and distribution['group_owner'] > 0:
+                session.add(FeeAccrual(
+                    bet_id=bet.id, chat_id=bet.chat_id, fee_type='group_owner',
+                    wallet_address=group_owner_wallet, amount=distribution['group_owner']
+                ))
         
         return {
             "winner_id": winner_id,
@@ -1173,11 +1611,141 @@ async def has_pending_bet_between(chat_id: int, user1_id: int, user2_id: int) ->
         return result.scalar_one_or_none() is not None
 
 
-async def record_failed_fee_payout(bet_id: int, fee_type: str, amount: float, wallet: str, error: str) -> None:
-    """Record a failed fee payout for later retry.
+def _payout_job_insert(idempotency_key: str, kind: str, to_address: str, amount, reference: str = None):
+    return pg_insert(PayoutJob).values(
+        idempotency_key=idempotency_key,
+        kind=kind,
+        reference=reference,
+        to_address=to_address,
+        amount=amount,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=['idempotency_key'])
+
+
+async def enqueue_payout_job(idempotency_key: str, kind: str, to_address: str, amount: float, reference: str = None) -> bool:
+    """Add a payout to the outbox. Returns False if a job with this key already exists."""
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(
+            _payout_job_insert(idempotency_key, kind, to_address, amount, reference).returning(PayoutJob.id)
+        )
+        inserted = result.first() is not None
+        await session.commit()
+        return inserted
+
+
+async def claim_fee_accruals(min_amount: float) -> tuple:
+    """Claim pending fee accruals and queue one payout job per wallet.
     
-    Logs the failure for tracking purposes.
+    Every pending row of a wallet whose pending total is at least min_amount is moved to
+    'settling' under a fresh settlement id in a single UPDATE, so two sweeps can never
+    claim the same row. The payout jobs are written in the same transaction, so a claimed
+    settlement always has its job. Returns (settlement_id, {wallet_address: total}).
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.error(f"FAILED FEE PAYOUT: bet_id={bet_id}, type={fee_type}, amount={amount}, wallet={wallet}, error={error}")
+    import uuid
+    settlement_id = uuid.uuid4().hex
+    Session = get_session()
+    async with Session() as session:
+        due_wallets = (
+            select(FeeAccrual.wallet_address)
+            .where(FeeAccrual.status == 'pending')
+            .group_by(FeeAccrual.wallet_address)
+            .having(func.sum(FeeAccrual.amount) >= min_amount)
+        )
+        result = await session.execute(
+            update(FeeAccrual)
+            .where(and_(FeeAccrual.status == 'pending', FeeAccrual.wallet_address.in_(due_wallets)))
+            .values(status='settling', settlement_id=settlement_id)
+            .returning(FeeAccrual.wallet_address, FeeAccrual.amount)
+        )
+        totals = {}
+        for wallet_address, amount in result.all():
+            totals[wallet_address] = totals.get(wallet_address, 0) + amount
+        for wallet_address, total in totals.items():
+            await session.execute(_payout_job_insert(
+                f"fee:{settlement_id}:{wallet_address}", 'fee_settlement', wallet_address, total, settlement_id
+            ))
+        await session.commit()
+        return settlement_id, {wallet: float(total) for wallet, total in totals.items()}
+
+
+async def claim_payout_jobs(worker_id: str, limit: int) -> list:
+    """Claim up to limit due payout jobs for this worker.
+    
+    FOR UPDATE SKIP LOCKED lets several workers (and bot replicas) claim concurrently
+    without blocking on or double-claiming each other's rows.
+    """
+    Session = get_session()
+    async with Session() as session:
+        async with session.begin():
+            now = datetime.utcnow()
+            result = await session.execute(
+                select(PayoutJob)
+                .where(and_(PayoutJob.status == 'pending', PayoutJob.next_attempt_at <= now))
+                .order_by(PayoutJob.next_attempt_at, PayoutJob.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            jobs = list(result.scalars().all())
+            for job in jobs:
+                job.status = 'processing'
+                job.attempts += 1
+                job.locked_by = worker_id
+                job.locked_at = now
+        return jobs
+
+
+# Final payout job status -> status of the fee accruals it settles
+_FEE_SETTLEMENT_OUTCOMES = {'confirmed': 'settled', 'unconfirmed': 'unconfirmed', 'failed': 'failed'}
+
+
+async def finish_payout_job(job_id: int, status: str, tx_signature: str = None, error: str = None, next_attempt_at: datetime = None) -> None:
+    """Record a payout attempt. status 'pending' schedules a retry at next_attempt_at.
+    
+    When a fee settlement job reaches a final status, its accruals are updated in the
+    same transaction.
+    """
+    Session = get_session()
+    async with Session() as session:
+        async with session.begin():
+            job = await session.get(PayoutJob, job_id, with_for_update=True)
+            if job is None or job.status != 'processing':
+                return
+            job.status = status
+            job.tx_signature = tx_signature or job.tx_signature
+            job.last_error = error[:1024] if error else None
+            job.locked_by = None
+            job.locked_at = None
+            if next_attempt_at is not None:
+                job.next_attempt_at = next_attempt_at
+            
+            if job.kind == 'fee_settlement' and status in _FEE_SETTLEMENT_OUTCOMES:
+                accrual_status = _FEE_SETTLEMENT_OUTCOMES[status]
+                await session.execute(
+                    update(FeeAccrual)
+                    .where(and_(
+                        FeeAccrual.settlement_id == job.reference,
+                        FeeAccrual.wallet_address == job.to_address,
+                        FeeAccrual.status == 'settling'
+                    ))
+                    .values(
+                        status=accrual_status,
+                        tx_signature=job.tx_signature,
+                        settled_at=datetime.utcnow() if accrual_status == 'settled' else None
+                    )
+                )
+
+
+async def count_stale_payout_jobs(older_than: timedelta) -> int:
+    """Jobs stuck in 'processing' (worker died mid-payout); they need a manual check before re-paying."""
+    Session = get_session()
+    async with Session() as session:
+        result = await session.execute(
+            select(func.count(PayoutJob.id)).where(and_(
+                PayoutJob.status == 'processing',
+                PayoutJob.locked_at < datetime.utcnow() - older_than
+            ))
+        )
+        return result.scalar() or 0
@@ -1,6 +1,6 @@
 import os
 from datetime import datetime
-from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Boolean, create_engine, Index, Numeric
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Boolean, Text, create_engine, Index, Numeric
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
@@ -46,6 +46,7 @@ class Transaction(Base):
     amount_paid = Column(Float, nullable=False)
     package_number = Column(Integer, nullable=False)
     status = Column(String(50), default='pending')
+    reference = Column(String(64), unique=True, nullable=True)  # Solana Pay reference key of the purchase intent
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -102,10 +103,28 @@ class UserWallet(Base):
     public_key = Column(String(64), unique=True, nullable=False)
     encrypted_private_key = Column(String(512), nullable=False)
     balance = Column(Float, default=0.0)
+    onchain_balance_raw = Column(BigInteger, nullable=True)  # last token amount seen by the deposit watcher, in base units
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class RetiredWallet(Base):
+    """A deleted burner wallet, kept until its token account has been closed and its rent reclaimed."""
+    __tablename__ = 'retired_wallets'
+    __table_args__ = (
+        Index('ix_open_retired_wallets', 'id', postgresql_where="closed_at IS NULL"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(BigInteger, nullable=False)
+    public_key = Column(String(64), unique=True, nullable=False)
+    encrypted_private_key = Column(String(512), nullable=False)
+    retired_at = Column(DateTime, default=datetime.utcnow)
+    closed_at = Column(DateTime, nullable=True)
+    reclaimed_lamports = Column(BigInteger, nullable=True)
+    close_signature = Column(String(128), nullable=True)
+
+
 class FapcoinBet(Base):
     __tablename__ = 'fapcoin_bets'
     __table_args__ = (
@@ -130,6 +149,100 @@ class FapcoinBet(Base):
     resolved_at = Column(DateTime, nullable=True)
 
 
+class FeeAccrual(Base):
+    __tablename__ = 'fee_accruals'
+    __table_args__ = (
+        Index('ix_pending_fee_accruals', 'wallet_address', 'status',
+              postgresql_where="status = 'pending'"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    bet_id = Column(Integer, nullable=False, index=True)
+    chat_id = Column(BigInteger, nullable=False)
+    fee_type = Column(String(50), nullable=False)  # treasury, group_owner
+    wallet_address = Column(String(64), nullable=False)
+    amount = Column(Numeric(18, 2), nullable=False)
+    status = Column(String(50), default='pending')  # pending, settling, settled, unconfirmed, failed
+    settlement_id = Column(String(64), nullable=True, index=True)
+    tx_signature = Column(String(128), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    settled_at = Column(DateTime, nullable=True)
+
+
+class PayoutJob(Base):
+    __tablename__ = 'payout_jobs'
+    __table_args__ = (
+        Index('ix_due_payout_jobs', 'next_attempt_at', 'id',
+              postgresql_where="status = 'pending'"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String(128), unique=True, nullable=False)
+    kind = Column(String(50), nullable=False)  # fee_settlement
+    reference = Column(String(64), nullable=True)  # e.g. the fee settlement id
+    to_address = Column(String(64), nullable=False)
+    amount = Column(Numeric(18, 2), nullable=False)
+    status = Column(String(50), default='pending', index=True)  # pending, processing, confirmed, unconfirmed, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    locked_by = Column(String(128), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    tx_signature = Column(String(128), nullable=True)
+    last_error = Column(String(1024), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IncomingPayment(Base):
+    __tablename__ = 'incoming_payments'
+    __table_args__ = (
+        Index('ix_unmatched_incoming_payments', 'block_time',
+              postgresql_where="transaction_row_id IS NULL"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    signature = Column(String(128), unique=True, nullable=False)
+    sender = Column(String(64), nullable=True)  # owner of the token account the FAPCOIN came from
+    amount = Column(Float, nullable=False)
+    block_time = Column(DateTime, nullable=False)
+    transaction_row_id = Column(Integer, nullable=True)  # transactions.id of the purchase it paid for
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class InactiveChat(Base):
+    """A chat the bot can no longer post in (kicked, blocked, deleted); skipped by broadcasts."""
+    __tablename__ = 'inactive_chats'
+    
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, unique=True, nullable=False)
+    reason = Column(String(255), nullable=True)
+    marked_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ScheduledJob(Base):
+    """Last run of a scheduler job, shared by every replica."""
+    __tablename__ = 'scheduled_jobs'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+    last_run_at = Column(DateTime, nullable=False)  # the scheduled time covered by the last run
+    last_status = Column(String(50), nullable=True)  # ok, failed, skipped, seeded
+    last_error = Column(String(1024), nullable=True)
+    last_duration = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class FsmState(Base):
+    """Conversation state of a multi-step flow (withdrawal, custom buy), shared by every replica."""
+    __tablename__ = 'fsm_states'
+    
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=True)  # JSON
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
 class BetStats(Base):
     __tablename__ = 'bet_stats'
     
@@ -220,6 +333,27 @@ async def init_db():
                 conn.commit()
             except Exception:
                 pass
+            
+            # Deposit watcher watermark; NULL marks wallets not yet seen by the watcher
+            try:
+                conn.execute(text(
+                    "ALTER TABLE user_wallets ADD COLUMN IF NOT EXISTS onchain_balance_raw BIGINT"
+                ))
+                conn.commit()
+            except Exception:
+                pass
+            
+            # Solana Pay reference per purchase intent
+            try:
+                conn.execute(text(
+                    "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS reference VARCHAR(64)"
+                ))
+                conn.execute(text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS transactions_reference_key ON transactions (reference)"
+                ))
+                conn.commit()
+            except Exception:
+                pass
         
         engine.dispose()
     except Exception as e:
@@ -1,8 +1,6 @@
 import os
 import random
-import re
 import logging
-import aiohttp
 import base58
 from datetime import datetime
 from aiogram import Router, F, Bot
@@ -10,11 +8,16 @@ from aiogram import Router, F, Bot
 logger = logging.getLogger(__name__)
 from aiogram.types import Message, InlineQuery, InlineQueryResultArticle, InputTextMessageContent, CallbackQuery
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ChatMemberUpdated
-from aiogram.filters import Command, ChatMemberUpdatedFilter, IS_MEMBER, IS_NOT_MEMBER
+from aiogram.filters import Command, ChatMemberUpdatedFilter, StateFilter, IS_MEMBER, IS_NOT_MEMBER
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.filters.command import CommandStart
 from aiogram.enums import ParseMode, ChatType
 
 from src.database import db
+from src.utils.solana_pay import new_reference, transfer_request_url
+from src.utils.tx_prefilter import validate_solana_tx_hash, get_pending_purchases, get_tx_hash_prefilter
 
 router = Router()
 
@@ -102,14 +105,17 @@ def get_buy_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def validate_solana_tx_hash(tx_hash: str) -> bool:
-    if len(tx_hash) < 43 or len(tx_hash) > 100:
-        return False
-    try:
-        decoded = base58.b58decode(tx_hash)
-        return len(decoded) >= 32
-    except:
-        return False
+def solana_pay_text(team_wallet: str, amount: int, reference: str) -> str:
+    """Solana Pay link block for the buy screen; paying through it confirms the purchase automatically."""
+    from src.utils.wallet import FAPCOIN_MINT
+    if not FAPCOIN_MINT or not validate_solana_address(team_wallet):
+        return ""
+    url = transfer_request_url(team_wallet, amount, spl_token=FAPCOIN_MINT, reference=reference,
+                               label="FAPCOIN Growth", message=f"+{amount} cm")
+    return (
+        f"📱 <b>Or pay with Solana Pay</b> (confirmed automatically):\n"
+        f"<code>{url}</code>\n\n"
+    )
 
 
 def validate_solana_address(address: str) -> bool:
@@ -124,8 +130,14 @@ def validate_solana_address(address: str) -> bool:
         return False
 
 
+@router.my_chat_member(ChatMemberUpdatedFilter(IS_MEMBER >> IS_NOT_MEMBER))
+async def bot_removed_from_chat(event: ChatMemberUpdated):
+    await db.mark_chats_inactive([(event.chat.id, "bot removed")])
+
+
 @router.my_chat_member(ChatMemberUpdatedFilter(IS_NOT_MEMBER >> IS_MEMBER))
 async def bot_added_to_chat(event: ChatMemberUpdated):
+    await db.reactivate_chat(event.chat.id)
     if event.chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🎮 Start Playing", callback_data="action_menu")]
@@ -350,10 +362,15 @@ async def cmd_recover(message: Message):
         await message.answer(f"❌ No wallet found for Telegram ID: {target_telegram_id}", parse_mode=None)
         return
     
+    from src.utils.rpc import RpcError
     from src.utils.wallet import get_token_balance, get_sol_balance
     
-    fapcoin_balance = await get_token_balance(wallet.public_key)
-    sol_balance = await get_sol_balance(wallet.public_key)
+    try:
+        fapcoin_balance = await get_token_balance(wallet.public_key)
+        sol_balance = await get_sol_balance(wallet.public_key)
+    except RpcError as e:
+        await message.answer(f"❌ Could not read the wallet balance, try again shortly: {e}", parse_mode=None)
+        return
     
     if len(args) == 2:
         user = await db.get_user_by_telegram_id(target_telegram_id)
@@ -420,6 +437,122 @@ async def cmd_recover(message: Message):
         await message.answer(f"❌ Transfer failed: {error}", parse_mode=None)
 
 
+@router.message(Command("sweepall"))
+async def cmd_sweepall(message: Message, bot: Bot):
+    """Sweep FAPCOIN out of every burner wallet - owner only.
+    Usage: /sweepall [destination|main] [min_amount]
+    Or: /sweepall status | stop | resume
+    """
+    if not is_owner(message.from_user.id):
+        await message.answer("❌ This command is only for the bot owner.", parse_mode=None)
+        return
+
+    from src.utils.sweeper import get_wallet_sweeper, format_progress
+    from src.utils.wallet import get_main_wallet_address, validate_solana_address
+
+    sweeper = get_wallet_sweeper()
+    args = message.text.split()
+
+    if len(args) < 2:
+        await message.answer(
+            "🧹 <b>BULK WALLET SWEEP</b>\n\n"
+            "<b>Sweep every burner wallet:</b>\n"
+            "<code>/sweepall main</code> - to the main wallet\n"
+            "<code>/sweepall [dest_address] [min_amount]</code>\n\n"
+            "<b>Control:</b>\n"
+            "<code>/sweepall status</code> - Progress of the current or last sweep\n"
+            "<code>/sweepall stop</code> - Stop after the current batch\n"
+            "<code>/sweepall resume</code> - Continue from the checkpoint",
+            parse_mode=ParseMode.HTML
+        )
+        return
+
+    action = args[1].lower()
+    if action == "status":
+        state = await sweeper.load_checkpoint()
+        if state is None:
+            await message.answer("No sweep has been run yet.", parse_mode=None)
+        else:
+            await message.answer(format_progress(state), parse_mode=ParseMode.HTML)
+        return
+
+    if action == "stop":
+        if sweeper.stop():
+            await message.answer("⏸ Sweep will stop after the current batch.", parse_mode=None)
+        else:
+            await message.answer("No sweep is running.", parse_mode=None)
+        return
+
+    if action == "resume":
+        error = await sweeper.resume(bot, message.chat.id)
+        if error:
+            await message.answer(f"❌ {error}", parse_mode=None)
+        return
+
+    destination = get_main_wallet_address() if action == "main" else args[1]
+    if not destination or not validate_solana_address(destination):
+        await message.answer("❌ Invalid destination address (or main wallet not configured).", parse_mode=None)
+        return
+
+    min_amount = 0.0
+    if len(args) > 2:
+        try:
+            min_amount = float(args[2])
+        except ValueError:
+            await message.answer("❌ Invalid minimum amount. Must be a number.", parse_mode=None)
+            return
+
+    error = await sweeper.start(bot, message.chat.id, destination, min_amount)
+    if error:
+        await message.answer(f"❌ {error}", parse_mode=None)
+
+
+@router.message(Command("reclaimrent"))
+async def cmd_reclaimrent(message: Message):
+    """Close empty token accounts of deleted burner wallets - owner only.
+    Usage: /reclaimrent to see stats, /reclaimrent run to run now
+    """
+    if not is_owner(message.from_user.id):
+        await message.answer("❌ This command is only for the bot owner.", parse_mode=None)
+        return
+
+    from src.utils.rent_reclaim import get_rent_reclaimer
+
+    reclaimer = get_rent_reclaimer()
+    args = message.text.split()
+    if len(args) > 1 and args[1].lower() == "run":
+        from src.utils.scheduler import run_exclusive
+        await message.answer("⏳ Closing empty token accounts of retired wallets...", parse_mode=None)
+        try:
+            ran = await run_exclusive("rent_reclaim", reclaimer.reclaim)
+        except Exception as e:
+            await message.answer(f"❌ Rent reclaim failed: {e}", parse_mode=None)
+            return
+        if not ran:
+            await message.answer("⏳ Another instance is reclaiming rent right now. Try again later.", parse_mode=None)
+            return
+
+    totals = reclaimer.totals
+    text = (
+        f"♻️ <b>RENT RECLAIM</b>\n\n"
+        f"<b>Since start:</b> {totals['runs']} runs\n"
+        f"Closed: {totals['closed']} accounts in {totals['transactions']} transactions\n"
+        f"Recovered: {totals['lamports'] / 1e9:.6f} SOL | Failed: {totals['failed']}"
+    )
+    run = reclaimer.last_run
+    if run:
+        text += (
+            f"\n\n<b>Last run:</b>\n"
+            f"Checked: {run['checked']} | Still funded: {run['funded']}\n"
+            f"Closed: {run['closed']} in {run['transactions']} transactions\n"
+            f"Recovered: {run['lamports'] / 1e9:.6f} SOL | Failed: {run['failed']}\n"
+            f"Took {run['seconds']:.1f} s ({run['per_second']:.1f} accounts/s)"
+        )
+    else:
+        text += "\n\nNo run yet. Use <code>/reclaimrent run</code> to run now."
+    await message.answer(text, parse_mode=ParseMode.HTML)
+
+
 @router.message(Command("showwallet"))
 async def cmd_showwallet(message: Message):
     """Show current team wallet - owner only."""
@@ -445,6 +578,90 @@ async def cmd_showwallet(message: Message):
     )
 
 
+@router.message(Command("perf"))
+async def cmd_perf(message: Message, fsm_storage: BaseStorage):
+    """Event loop lag and crypto executor stats - owner only."""
+    if not is_owner(message.from_user.id):
+        await message.answer("❌ This command is only for the bot owner.", parse_mode=None)
+        return
+
+    from src.utils.crypto_executor import get_crypto_executor
+    from src.utils.loop_monitor import get_loop_monitor
+    from src.utils.broadcast import get_broadcaster
+    from src.utils.rpc import get_limiter
+    from src.utils.throttling import get_throttling_middleware
+
+    lag = get_loop_monitor().stats()
+    executor = get_crypto_executor()
+    limiter = get_limiter()
+    rpc = limiter.stats
+    broadcast = get_broadcaster().last_report
+    throttling = get_throttling_middleware()
+    prefilter = get_tx_hash_prefilter().stats
+    fsm = getattr(fsm_storage, 'stats', None)
+    fsm_text = (
+        f"<b>FSM state reads:</b>\n"
+        f"From DB: {fsm['read']} | Skipped (no active flow): {fsm['skipped']}\n\n"
+    ) if fsm else ""
+    await message.answer(
+        f"⏱ <b>Performance</b>\n\n"
+        f"<b>Event loop lag (last minute):</b>\n"
+        f"Last: {lag['last']:.1f} ms | Mean: {lag['mean']:.1f} ms\n"
+        f"p99: {lag['p99']:.1f} ms | Max: {lag['max']:.1f} ms\n"
+        f"Max since start: {lag['max_ever']:.1f} ms\n\n"
+        f"<b>Crypto executor:</b>\n"
+        f"Workers: {executor.workers} | Jobs: {executor.jobs} | Pending: {executor.pending}\n"
+        f"Busy: {executor.busy_seconds:.2f} s\n\n"
+        f"<b>RPC limiter:</b>\n"
+        f"Requests: {rpc['requests']} | Retries: {rpc['retries']}\n"
+        f"429s: {rpc['throttled']} | 5xx: {rpc['server_errors']}\n"
+        f"Concurrency limit: {limiter.limit:.1f} | In flight: {limiter.in_flight}\n\n"
+        f"<b>Throttling:</b>\n"
+        f"Allowed: {throttling.stats['allowed']} | Throttled: {throttling.stats['throttled']}\n"
+        f"Tracked users: {len(throttling.users)} | chats: {len(throttling.chats)}\n\n"
+        f"<b>Tx hash prefilter:</b>\n"
+        f"Filtered: {prefilter['filtered']} | Scanned: {prefilter['scanned']} | Hashes: {prefilter['matched']}\n\n"
+        f"{fsm_text}"
+        f"<b>Last broadcast:</b>\n"
+        f"{broadcast.summary() if broadcast else 'None yet'}",
+        parse_mode=ParseMode.HTML
+    )
+
+
+@router.message(Command("reloadwallet"))
+async def cmd_reloadwallet(message: Message):
+    """Reload the main payout wallet after a key rotation - owner only.
+    Usage: /reloadwallet [new_address] - the key must belong to new_address (default: the current wallet)
+    """
+    telegram_id = message.from_user.id
+
+    if not is_owner(telegram_id):
+        await message.answer("❌ This command is only for the bot owner.", parse_mode=None)
+        return
+
+    from src.utils.wallet import get_main_wallet_address, load_main_wallet_context
+
+    previous_address = get_main_wallet_address()
+    args = message.text.split()
+    expected_address = args[1] if len(args) > 1 else previous_address
+    context = load_main_wallet_context(expected_address)
+
+    if not context or context.address != expected_address:
+        await message.answer(
+            f"❌ Main wallet could not be loaded as {expected_address}. Check the logs; "
+            f"the previous wallet stays active.",
+            parse_mode=None
+        )
+        return
+
+    status = "unchanged" if context.address == previous_address else "rotated"
+    await message.answer(
+        f"🔑 <b>Main Wallet Reloaded</b> ({status})\n\n"
+        f"<code>{context.address}</code>",
+        parse_mode=ParseMode.HTML
+    )
+
+
 @router.callback_query(F.data == "admin_setwallet")
 async def callback_admin_setwallet(callback: CallbackQuery):
     """Prompt to set wallet via command."""
@@ -749,6 +966,39 @@ async def cmd_daily(message: Message):
     )
 
 
+class BuyStates(StatesGroup):
+    amount = State()
+
+
+async def send_buy_invoice(message: Message, telegram_id: int, chat_id: int, amount: int, edit: bool = False):
+    """Record a pending purchase of amount cm and show where to pay (editing message if edit)."""
+    reference = new_reference()
+    await db.create_pending_transaction(telegram_id, chat_id, amount, amount, reference=reference)
+    get_pending_purchases().add(telegram_id)
+    team_wallet = await db.get_team_wallet() or os.environ.get('TEAM_WALLET_ADDRESS', 'Not configured')
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ I've Paid!", callback_data=f"paid_{amount}")],
+        [InlineKeyboardButton(text="◀️ Back", callback_data="action_buy")]
+    ])
+    
+    send = message.edit_text if edit else message.answer
+    await send(
+        f"💰 <b>BUY {amount} CM</b> 💰\n\n"
+        f"━━━━━━━━━━━━━━━━━━━━━\n"
+        f"🌱 <b>+{amount} cm Growth</b>\n"
+        f"💵 Price: <b>{amount:,} $FAPCOIN</b>\n"
+        f"━━━━━━━━━━━━━━━━━━━━━\n\n"
+        f"📤 <b>Send exactly {amount:,} FAPCOIN to:</b>\n\n"
+        f"<code>{team_wallet}</code>\n\n"
+        f"⬆️ <i>Tap to copy address</i>\n\n"
+        f"{solana_pay_text(team_wallet, amount, reference)}"
+        f"After sending, click <b>I've Paid!</b>",
+        reply_markup=keyboard,
+        parse_mode=ParseMode.HTML
+    )
+
+
 @router.message(Command("buy"))
 async def cmd_buy(message: Message):
     telegram_id = message.from_user.id
@@ -780,27 +1030,7 @@ async def cmd_buy(message: Message):
                 await message.answer(f"❌ Maximum purchase is {MAX_BUY_AMOUNT} cm per transaction", parse_mode=None)
                 return
             
-            await db.create_pending_transaction(telegram_id, chat_id, amount, amount)
-            team_wallet = await db.get_team_wallet() or os.environ.get('TEAM_WALLET_ADDRESS', 'Not configured')
-            
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="✅ I've Paid!", callback_data=f"paid_{amount}")],
-                [InlineKeyboardButton(text="◀️ Back", callback_data="action_buy")]
-            ])
-            
-            await message.answer(
-                f"💰 <b>BUY {amount} CM</b> 💰\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━━\n"
-                f"🌱 <b>+{amount} cm Growth</b>\n"
-                f"💵 Price: <b>{amount:,} $FAPCOIN</b>\n"
-                f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"📤 <b>Send exactly {amount:,} FAPCOIN to:</b>\n\n"
-                f"<code>{team_wallet}</code>\n\n"
-                f"⬆️ <i>Tap to copy address</i>\n\n"
-                f"After sending, click <b>I've Paid!</b>",
-                reply_markup=keyboard,
-                parse_mode=ParseMode.HTML
-            )
+            await send_buy_invoice(message, telegram_id, chat_id, amount)
             return
         except ValueError:
             pass
@@ -1128,10 +1358,13 @@ async def callback_confirm_loan(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "action_buy")
-async def callback_buy(callback: CallbackQuery):
+async def callback_buy(callback: CallbackQuery, state: FSMContext):
     telegram_id = callback.from_user.id
     chat_id = callback.message.chat.id
     
+    if await state.get_state() == BuyStates.amount.state:
+        await state.clear()
+    
     # Purchases must be made in groups
     if callback.message.chat.type == ChatType.PRIVATE:
         await callback.answer("⚠️ Please use /buy in a group chat to add length to your group leaderboard!", show_alert=True)
@@ -1154,7 +1387,7 @@ async def callback_buy(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("buy_amount_"))
-async def callback_buy_amount(callback: CallbackQuery):
+async def callback_buy_amount(callback: CallbackQuery, state: FSMContext):
     telegram_id = callback.from_user.id
     chat_id = callback.message.chat.id
     
@@ -1171,38 +1404,21 @@ async def callback_buy_amount(callback: CallbackQuery):
     
     await db.get_or_create_user(telegram_id, callback.from_user.username, callback.from_user.first_name)
     await db.get_or_create_user_chat(telegram_id, chat_id)
-    await db.create_pending_transaction(telegram_id, chat_id, amount, amount)  # 1:1 ratio
-    
-    team_wallet = await db.get_team_wallet() or os.environ.get('TEAM_WALLET_ADDRESS', 'Not configured')
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ I've Paid!", callback_data=f"paid_{amount}")],
-        [InlineKeyboardButton(text="◀️ Back", callback_data="action_buy")]
-    ])
-    
-    await callback.message.edit_text(
-        f"💰 <b>BUY {amount} CM</b> 💰\n\n"
-        f"━━━━━━━━━━━━━━━━━━━━━\n"
-        f"🌱 <b>+{amount} cm Growth</b>\n"
-        f"💵 Price: <b>{amount:,} $FAPCOIN</b>\n"
-        f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-        f"📤 <b>Send exactly {amount:,} FAPCOIN to:</b>\n\n"
-        f"<code>{team_wallet}</code>\n\n"
-        f"⬆️ <i>Tap to copy address</i>\n\n"
-        f"After sending, click <b>I've Paid!</b>",
-        reply_markup=keyboard,
-        parse_mode=ParseMode.HTML
-    )
+    if await state.get_state() == BuyStates.amount.state:
+        await state.clear()
+    await send_buy_invoice(callback.message, telegram_id, chat_id, amount, edit=True)
     await callback.answer()
 
 
 @router.callback_query(F.data == "buy_custom")
-async def callback_buy_custom(callback: CallbackQuery):
+async def callback_buy_custom(callback: CallbackQuery, state: FSMContext):
     # Purchases must be made in groups
     if callback.message.chat.type == ChatType.PRIVATE:
         await callback.answer("⚠️ Please use /buy in a group chat!", show_alert=True)
         return
     
+    await state.set_state(BuyStates.amount)
+    
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="◀️ Back", callback_data="action_buy")]
     ])
@@ -1214,7 +1430,7 @@ async def callback_buy_custom(callback: CallbackQuery):
         f"📦 Max: <b>{MAX_BUY_AMOUNT} cm</b>\n"
         "━━━━━━━━━━━━━━━━━━━━━\n\n"
         "Type the amount you want to buy:\n\n"
-        "Example: <code>/buy 150</code>\n\n"
+        "Example: <code>150</code> or <code>/buy 150</code>\n\n"
         "<i>This will cost 150 FAPCOIN for +150 cm</i>",
         reply_markup=keyboard,
         parse_mode=ParseMode.HTML
@@ -1222,6 +1438,20 @@ async def callback_buy_custom(callback: CallbackQuery):
     await callback.answer()
 
 
+@router.message(BuyStates.amount, F.text.regexp(r"^\d+$"))
+async def handle_custom_buy_amount(message: Message, state: FSMContext):
+    amount = int(message.text)
+    if amount < 1:
+        await message.answer("❌ Amount must be at least 1 cm", parse_mode=None)
+        return
+    if amount > MAX_BUY_AMOUNT:
+        await message.answer(f"❌ Maximum purchase is {MAX_BUY_AMOUNT} cm per transaction", parse_mode=None)
+        return
+    
+    await state.clear()
+    await send_buy_invoice(message, message.from_user.id, message.chat.id, amount)
+
+
 @router.callback_query(F.data.startswith("paid_"))
 async def callback_paid(callback: CallbackQuery):
     # Purchases must be made in groups
@@ -1285,8 +1515,20 @@ async def cmd_verify(message: Message):
         )
         return
     
-    already_used = await db.is_transaction_already_used(tx_hash)
-    if already_used:
+    await claim_payment_hash(message, tx_hash)
+
+
+async def claim_payment_hash(message: Message, tx_hash: str):
+    """Apply a pasted tx hash to the user's pending purchase from the payment index.
+    
+    No RPC here: the payment indexer records payments to the team wallet, this only
+    looks the hash up and wakes the indexer if it hasn't seen it yet.
+    """
+    from src.utils.payment_indexer import get_payment_indexer
+    
+    telegram_id = message.from_user.id
+    
+    if await db.is_transaction_already_used(tx_hash):
         await message.answer(
             "❌ <b>Transaction Already Used</b>\n\n"
             "This transaction has already been claimed.",
@@ -1294,170 +1536,60 @@ async def cmd_verify(message: Message):
         )
         return
     
-    pending_txs = await db.get_pending_transactions(telegram_id)
-    logger.info(f"Found {len(pending_txs) if pending_txs else 0} pending transactions for user {telegram_id}")
-    
-    if not pending_txs:
+    try:
+        claim = await db.claim_incoming_payment(tx_hash, telegram_id)
+    except Exception as e:
+        logger.error(f"Payment claim error: {e}")
         await message.answer(
-            "❌ <b>No Pending Purchase</b>\n\n"
-            "Use /buy or /menu to buy a package first.",
+            "❌ <b>Error verifying transaction</b>\n\n"
+            "Please try again later or contact support.",
             parse_mode=ParseMode.HTML
         )
         return
     
-    pending_tx = pending_txs[0]
-    # package_number now stores the amount (1:1 ratio)
-    growth_amount = pending_tx.package_number
-    logger.info(f"Verifying tx {tx_hash[:20]}... for {growth_amount} cm")
-    
-    solana_rpc = os.environ.get('SOLANA_RPC_URL', '')
-    team_wallet = await db.get_team_wallet() or os.environ.get('TEAM_WALLET_ADDRESS', '')
-    
-    if not solana_rpc or not team_wallet:
+    status = claim['status']
+    if status == 'confirmed':
+        growth_amount = claim['growth']
         await message.answer(
-            "⚠️ <b>Verification Unavailable</b>\n\n"
-            "Payment verification is not configured.\n"
-            "Please contact support.",
+            f"✅ <b>PAYMENT VERIFIED!</b> ✅\n\n"
+            f"━━━━━━━━━━━━━━━━━━━━━\n"
+            f"✓ Transaction confirmed on Solana\n"
+            f"✓ Payment received: <b>{claim['amount']:,.2f} FAPCOIN</b>\n"
+            f"✓ Growth added to your account\n"
+            f"━━━━━━━━━━━━━━━━━━━━━\n\n"
+            f"🎉 <b>+{growth_amount} cm added!</b>\n\n"
+            f"💎 Every purchase in $FAPCOIN is sent to our\n"
+            f"treasury wallet to support the project! 💎\n\n"
+            f"Go back to the group and use /top to see\n"
+            f"your new position on the leaderboard!",
             parse_mode=ParseMode.HTML
         )
         return
     
-    await message.answer("🔍 <b>Verifying transaction on Solana...</b>", parse_mode=ParseMode.HTML)
-    
-    try:
-        verification = await verify_solana_transaction(
-            tx_hash, team_wallet, pending_tx.amount_paid, solana_rpc
-        )
-        
-        if verification['verified']:
-            success = await db.confirm_transaction(pending_tx.transaction_id, tx_hash, growth_amount)
-            if success:
-                await message.answer(
-                    f"✅ <b>PAYMENT VERIFIED!</b> ✅\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n"
-                    f"🎉 You received <b>+{growth_amount} cm</b>!\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"💎 Every purchase in $FAPCOIN is sent to our\n"
-                    f"treasury wallet to support the project! 💎\n\n"
-                    f"Thank you for your purchase!",
-                    parse_mode=ParseMode.HTML
-                )
-            else:
-                await message.answer("❌ Error confirming. Contact support.", parse_mode=None)
-        else:
-            error = verification.get('error', 'unknown')
-            if error == 'tx_not_found':
-                error_msg = "Transaction not found. Wait a few minutes and try again."
-            elif error == 'tx_failed':
-                error_msg = "Transaction failed on blockchain."
-            elif error == 'transfer_not_found':
-                error_msg = "Transfer to team wallet not found in transaction."
-            else:
-                error_msg = "Could not verify transaction."
-            
-            await message.answer(
-                f"❌ <b>Verification Failed</b>\n\n{error_msg}\n\n"
-                f"If you believe this is an error, contact support.",
-                parse_mode=ParseMode.HTML
-            )
-    except Exception as e:
-        import logging
-        logging.error(f"Verification error: {e}")
+    if status == 'not_indexed':
+        get_payment_indexer().wake()
         await message.answer(
-            f"❌ <b>Error verifying transaction</b>\n\n"
-            f"Please try again later or contact support.",
+            "⏳ <b>Payment Not Seen Yet</b>\n\n"
+            "Payments to the team wallet are picked up automatically once\n"
+            "finalized on Solana, usually within a minute. You'll get a\n"
+            "message in your group when your purchase is confirmed.\n\n"
+            "If it doesn't show up, contact support.",
             parse_mode=ParseMode.HTML
         )
-
-
-async def verify_solana_transaction(tx_hash: str, to_wallet: str, expected_amount: float, rpc_url: str) -> dict:
-    result = {'verified': False, 'error': None, 'found_amount': 0, 'found_to': None}
+        return
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getTransaction",
-                "params": [tx_hash, {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}]
-            }
-            
-            async with session.post(rpc_url, json=payload) as response:
-                if response.status != 200:
-                    result['error'] = 'rpc_error'
-                    return result
-                
-                data = await response.json()
-                
-                if 'result' not in data or data['result'] is None:
-                    result['error'] = 'tx_not_found'
-                    return result
-                
-                tx = data['result']
-                
-                if tx.get('meta', {}).get('err') is not None:
-                    result['error'] = 'tx_failed'
-                    return result
-                
-                instructions = tx.get('transaction', {}).get('message', {}).get('instructions', [])
-                inner_instructions = tx.get('meta', {}).get('innerInstructions', [])
-                
-                all_instructions = list(instructions)
-                for inner in inner_instructions:
-                    all_instructions.extend(inner.get('instructions', []))
-                
-                for instr in all_instructions:
-                    parsed = instr.get('parsed')
-                    if not parsed:
-                        continue
-                    
-                    instr_type = parsed.get('type', '')
-                    info = parsed.get('info', {})
-                    
-                    if instr_type in ['transfer', 'transferChecked']:
-                        destination = info.get('destination', '')
-                        
-                        if instr_type == 'transferChecked':
-                            token_amount = info.get('tokenAmount', {})
-                            amount = float(token_amount.get('uiAmount', 0))
-                        else:
-                            amount = float(info.get('amount', 0))
-                            amount = amount / (10 ** 9)
-                        
-                        result['found_amount'] = amount
-                        result['found_to'] = destination
-                        
-                        if to_wallet.lower() in destination.lower() or destination.lower() in to_wallet.lower():
-                            if amount >= expected_amount * 0.99:
-                                result['verified'] = True
-                                return result
-                
-                post_balances = tx.get('meta', {}).get('postTokenBalances', [])
-                pre_balances = tx.get('meta', {}).get('preTokenBalances', [])
-                
-                for post in post_balances:
-                    owner = post.get('owner', '')
-                    if owner.lower() == to_wallet.lower():
-                        post_amount = float(post.get('uiTokenAmount', {}).get('uiAmount', 0) or 0)
-                        pre_amount = 0
-                        for pre in pre_balances:
-                            if pre.get('accountIndex') == post.get('accountIndex'):
-                                pre_amount = float(pre.get('uiTokenAmount', {}).get('uiAmount', 0) or 0)
-                                break
-                        
-                        received = post_amount - pre_amount
-                        if received >= expected_amount * 0.99:
-                            result['verified'] = True
-                            result['found_amount'] = received
-                            result['found_to'] = owner
-                            return result
-                
-                result['error'] = 'transfer_not_found'
-                return result
-                
-    except Exception as e:
-        result['error'] = f'exception'
-        return result
+    if status == 'already_used':
+        error_msg = "This transaction has already been claimed."
+    elif status == 'no_pending':
+        error_msg = "No pending purchase. Use /buy or /menu to buy a package first."
+    else:
+        error_msg = f"Payment of {claim['amount']:,.2f} FAPCOIN doesn't cover any of your pending purchases."
+    
+    await message.answer(
+        f"❌ <b>Verification Failed</b>\n\n{error_msg}\n\n"
+        f"If you believe this is an error, contact support.",
+        parse_mode=ParseMode.HTML
+    )
 
 
 @router.callback_query(F.data == "action_pvp_info")
@@ -1797,9 +1929,41 @@ async def callback_support(callback: CallbackQuery):
     await callback.answer()
 
 
+def deposit_status_text(wallet) -> tuple:
+    """Deposit screen from the watcher's cached balance. Returns (text, deposit_found)."""
+    from src.utils.deposits import get_deposit_watcher
+    watcher = get_deposit_watcher()
+    credited = watcher.pop_recent_credit(wallet.telegram_id)
+    
+    if credited:
+        return (
+            f"✅ <b>DEPOSIT FOUND!</b>\n\n"
+            f"━━━━━━━━━━━━━━━━━━━━━\n"
+            f"➕ <b>Deposited:</b> {credited:,.2f} $FAPCOIN\n"
+            f"💵 <b>New Balance:</b> {wallet.balance:,.2f} $FAPCOIN\n"
+            f"━━━━━━━━━━━━━━━━━━━━━\n\n"
+            f"Your balance has been updated!\n\n"
+            f"🚀 Powered by $FAPCOIN on Solana"
+        ), True
+    
+    since = watcher.seconds_since_sweep()
+    checked = f"{since:.0f}s ago" if since is not None else "automatically every 30s"
+    return (
+        f"📥 <b>DEPOSIT CHECK</b>\n\n"
+        f"━━━━━━━━━━━━━━━━━━━━━\n"
+        f"📬 <b>Your Deposit Address:</b>\n<code>{wallet.public_key}</code>\n\n"
+        f"💵 <b>Current Balance:</b> {wallet.balance:,.2f} $FAPCOIN\n"
+        f"🔄 <b>Last checked:</b> {checked}\n"
+        f"━━━━━━━━━━━━━━━━━━━━━\n\n"
+        f"📲 Send FAPCOIN tokens to your deposit address above.\n"
+        f"Deposits are credited automatically within a minute.\n\n"
+        f"🚀 Powered by $FAPCOIN on Solana"
+    ), False
+
+
 @router.callback_query(F.data == "action_deposit")
 async def callback_deposit(callback: CallbackQuery):
-    """Check for deposits via button - checks on-chain balance"""
+    """Show deposit status via button - reads the balance kept by the deposit watcher"""
     telegram_id = callback.from_user.id
     
     try:
@@ -1808,56 +1972,8 @@ async def callback_deposit(callback: CallbackQuery):
         
         keyboard = get_back_button()
         
-        await callback.message.edit_text(
-            f"⏳ <b>Checking on-chain balance...</b>\n\n"
-            f"Please wait...",
-            parse_mode=ParseMode.HTML
-        )
-        
-        from src.utils.wallet import get_token_balance
-        on_chain_balance = await get_token_balance(wallet.public_key)
-        
-        # Always sync with on-chain balance to ensure accuracy
-        if on_chain_balance != wallet.balance:
-            deposit_amount = on_chain_balance - wallet.balance
-            await db.update_wallet_balance(telegram_id, on_chain_balance)
-            
-            if deposit_amount > 0:
-                await callback.message.edit_text(
-                    f"✅ <b>DEPOSIT FOUND!</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n"
-                    f"➕ <b>Deposited:</b> {deposit_amount:,.2f} $FAPCOIN\n"
-                    f"💵 <b>New Balance:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"Your balance has been updated!\n\n"
-                    f"🚀 Powered by $FAPCOIN on Solana",
-                    reply_markup=keyboard,
-                    parse_mode=ParseMode.HTML
-                )
-            else:
-                # Balance decreased or synced (withdrawal or other)
-                await callback.message.edit_text(
-                    f"📥 <b>WALLET SYNCED</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n"
-                    f"💵 <b>Current Balance:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"Your balance is now in sync with the blockchain.",
-                    reply_markup=keyboard,
-                    parse_mode=ParseMode.HTML
-                )
-        else:
-            await callback.message.edit_text(
-                f"📥 <b>DEPOSIT CHECK</b>\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━━\n"
-                f"📬 <b>Your Deposit Address:</b>\n<code>{wallet.public_key}</code>\n\n"
-                f"💵 <b>Current Balance:</b> {wallet.balance:,.2f} $FAPCOIN\n"
-                f"🔗 <b>On-chain:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-                f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"📲 Send FAPCOIN tokens to your deposit address above.\n\n"
-                f"🚀 Powered by $FAPCOIN on Solana",
-                reply_markup=keyboard,
-                parse_mode=ParseMode.HTML
-            )
+        text, _ = deposit_status_text(wallet)
+        await callback.message.edit_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
         await callback.answer()
     except Exception as e:
         logger.error(f"DEPOSIT callback error: {e}")
@@ -2086,145 +2202,20 @@ async def inline_handler(inline_query: InlineQuery):
     await inline_query.answer(results, cache_time=60)
 
 
-def extract_tx_hash(text: str) -> str | None:
-    """Extract transaction hash from any format - URL, raw hash, or text containing hash."""
-    text = text.strip()
-    
-    # Common Solana explorer URL patterns
-    url_patterns = [
-        r'solscan\.io/tx/([A-Za-z0-9]{43,90})',
-        r'explorer\.solana\.com/tx/([A-Za-z0-9]{43,90})',
-        r'solana\.fm/tx/([A-Za-z0-9]{43,90})',
-        r'solanabeach\.io/transaction/([A-Za-z0-9]{43,90})',
-    ]
-    
-    for pattern in url_patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(1)
-    
-    # If it's a raw hash (direct paste)
-    if validate_solana_tx_hash(text):
-        return text
-    
-    # Try to find any base58 string that looks like a tx hash in the text
-    # Solana tx hashes are 64-88 chars of base58 (typically 87-88)
-    base58_pattern = r'\b([1-9A-HJ-NP-Za-km-z]{64,90})\b'
-    matches = re.findall(base58_pattern, text)
-    
-    for match in matches:
-        if validate_solana_tx_hash(match):
-            return match
-    
-    return None
-
-
-@router.message(F.text.func(lambda text: text is not None and not text.startswith("/")))
-async def catch_tx_hash(message: Message):
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    text = message.text.strip() if message.text else ""
-    
-    logger.info(f"Received message from {message.from_user.id}: '{text[:50]}...'")
+# Ordinary chatter is dropped by the prefilter; users in a flow (e.g. typing a withdrawal address) skip this
+@router.message(get_tx_hash_prefilter(), StateFilter(None))
+async def catch_tx_hash(message: Message, tx_hash: str):
+    telegram_id = message.from_user.id
+    logger.info(f"Detected tx hash from user {telegram_id}: {tx_hash[:20]}...")
     
-    # Try to extract tx hash from URL or raw text
-    tx_hash = extract_tx_hash(text)
+    await message.answer(
+        "🔍 <b>Transaction hash detected!</b>\n\n"
+        "⏳ Checking your payment...",
+        parse_mode=ParseMode.HTML
+    )
     
-    if tx_hash:
-        logger.info(f"Detected tx hash from user {message.from_user.id}: {tx_hash[:20]}...")
-        
-        telegram_id = message.from_user.id
-        
-        await message.answer(
-            "🔍 <b>Transaction hash detected!</b>\n\n"
-            "⏳ Checking Solana blockchain...",
-            parse_mode=ParseMode.HTML
-        )
-        
-        await db.get_or_create_user(telegram_id, message.from_user.username, message.from_user.first_name)
-        
-        already_used = await db.is_transaction_already_used(tx_hash)
-        if already_used:
-            await message.answer(
-                "❌ <b>Transaction Already Used</b>\n\n"
-                "This transaction has already been claimed.",
-                parse_mode=ParseMode.HTML
-            )
-            return
-        
-        pending_txs = await db.get_pending_transactions(telegram_id)
-        if not pending_txs:
-            await message.answer(
-                "❌ <b>No Pending Purchase</b>\n\n"
-                "Use /buy or /menu to select a package first.",
-                parse_mode=ParseMode.HTML
-            )
-            return
-        
-        pending_tx = pending_txs[0]
-        # package_number now stores the amount (1:1 ratio)
-        growth_amount = pending_tx.package_number
-        
-        solana_rpc = os.environ.get('SOLANA_RPC_URL', '')
-        team_wallet = await db.get_team_wallet() or os.environ.get('TEAM_WALLET_ADDRESS', '')
-        
-        if not solana_rpc or not team_wallet:
-            await message.answer(
-                "⚠️ <b>Verification Unavailable</b>\n\n"
-                "Payment verification is not configured.\n"
-                "Please contact support.",
-                parse_mode=ParseMode.HTML
-            )
-            return
-        
-        try:
-            verification = await verify_solana_transaction(
-                tx_hash, team_wallet, pending_tx.amount_paid, solana_rpc
-            )
-            
-            if verification['verified']:
-                success = await db.confirm_transaction(pending_tx.transaction_id, tx_hash, growth_amount)
-                if success:
-                    await message.answer(
-                        f"✅ <b>PAYMENT VERIFIED!</b> ✅\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━\n"
-                        f"✓ Transaction confirmed on Solana\n"
-                        f"✓ Payment received: <b>{growth_amount:,} FAPCOIN</b>\n"
-                        f"✓ Growth added to your account\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"🎉 <b>+{growth_amount} cm added!</b>\n\n"
-                        f"💎 Every purchase in $FAPCOIN is sent to our\n"
-                        f"treasury wallet to support the project! 💎\n\n"
-                        f"Go back to the group and use /top to see\n"
-                        f"your new position on the leaderboard!",
-                        parse_mode=ParseMode.HTML
-                    )
-                else:
-                    await message.answer("❌ Error confirming. Contact support.", parse_mode=None)
-            else:
-                error = verification.get('error', 'unknown')
-                if error == 'tx_not_found':
-                    error_msg = "Transaction not found. Wait a few minutes and try again."
-                elif error == 'tx_failed':
-                    error_msg = "Transaction failed on blockchain."
-                elif error == 'transfer_not_found':
-                    error_msg = "Transfer to team wallet not found in transaction."
-                else:
-                    error_msg = "Could not verify transaction."
-                
-                await message.answer(
-                    f"❌ <b>Verification Failed</b>\n\n{error_msg}\n\n"
-                    f"If you believe this is an error, contact support.",
-                    parse_mode=ParseMode.HTML
-                )
-        except Exception as e:
-            logger.error(f"Verification error: {e}")
-            await message.answer(
-                "❌ <b>Error verifying transaction</b>\n\n"
-                "Please try again later or contact support.",
-                parse_mode=ParseMode.HTML
-            )
+    await db.get_or_create_user(telegram_id, message.from_user.username, message.from_user.first_name)
+    await claim_payment_hash(message, tx_hash)
 
 
 @router.message(Command("wallet"))
@@ -2253,7 +2244,7 @@ async def cmd_wallet(message: Message):
         f"💵 <b>Balance:</b> {wallet.balance:,.2f} $FAPCOIN\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n\n"
         f"📲 Send FAPCOIN to your deposit address above.\n"
-        f"Use /deposit after sending to update your balance.\n\n"
+        f"Deposits are credited automatically - check with /deposit.\n\n"
         f"⚔️ Use /fapbet [amount] @user to start a bet!\n\n"
         f"🚀 Powered by $FAPCOIN on Solana",
         parse_mode=ParseMode.HTML
@@ -2267,10 +2258,6 @@ async def callback_wallet(callback: CallbackQuery):
     await db.get_or_create_user(telegram_id, callback.from_user.username, callback.from_user.first_name)
     wallet = await db.get_or_create_user_wallet(telegram_id)
     
-    from src.utils.wallet import get_token_balance
-    on_chain_balance = await get_token_balance(wallet.public_key)
-    await db.update_wallet_balance(telegram_id, on_chain_balance)
-    
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📥 Check Deposit", callback_data="wallet_deposit")],
         [InlineKeyboardButton(text="📤 Withdraw", callback_data="wallet_withdraw")],
@@ -2282,7 +2269,7 @@ async def callback_wallet(callback: CallbackQuery):
         f"💰 <b>YOUR FAPCOIN WALLET</b> 💰\n\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n"
         f"📍 <b>Address:</b>\n<code>{wallet.public_key}</code>\n\n"
-        f"💰 <b>Balance:</b> {on_chain_balance:,.2f} FAPCOIN\n"
+        f"💰 <b>Balance:</b> {wallet.balance:,.2f} FAPCOIN\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n\n"
         f"⚠️ This is your permanent wallet. Send FAPCOIN here to use it in the bot.",
         reply_markup=keyboard,
@@ -2293,7 +2280,7 @@ async def callback_wallet(callback: CallbackQuery):
 
 @router.callback_query(F.data == "wallet_deposit")
 async def callback_wallet_deposit(callback: CallbackQuery):
-    """Check for new deposits and update balance - fetches on-chain balance"""
+    """Show deposit status - reads the balance kept by the deposit watcher"""
     telegram_id = callback.from_user.id
     
     logger.info(f"WALLET_DEPOSIT callback from user {telegram_id}")
@@ -2306,52 +2293,11 @@ async def callback_wallet_deposit(callback: CallbackQuery):
             [InlineKeyboardButton(text="◀️ Back to Wallet", callback_data="action_wallet")]
         ])
         
-        from src.utils.wallet import get_token_balance
-        on_chain_balance = await get_token_balance(wallet.public_key)
-        
-        if on_chain_balance != wallet.balance:
-            deposit_amount = on_chain_balance - wallet.balance
-            await db.update_wallet_balance(telegram_id, on_chain_balance)
-            
-            if deposit_amount > 0:
-                await callback.message.edit_text(
-                    f"✅ <b>DEPOSIT FOUND!</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n"
-                    f"➕ <b>Deposited:</b> {deposit_amount:,.2f} $FAPCOIN\n"
-                    f"💵 <b>New Balance:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"Your balance has been updated!\n\n"
-                    f"🚀 Powered by $FAPCOIN on Solana",
-                    reply_markup=keyboard,
-                    parse_mode=ParseMode.HTML
-                )
-                await callback.answer("Deposit found!")
-                return
-            else:
-                await callback.message.edit_text(
-                    f"📥 <b>WALLET SYNCED</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n"
-                    f"💵 <b>Current Balance:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"Your balance is now in sync with the blockchain.",
-                    reply_markup=keyboard,
-                    parse_mode=ParseMode.HTML
-                )
-                await callback.answer("Balance synced!")
-                return
-        
-        await callback.message.edit_text(
-            f"📥 <b>DEPOSIT CHECK</b>\n\n"
-            f"━━━━━━━━━━━━━━━━━━━━━\n"
-            f"📬 <b>Your Deposit Address:</b>\n<code>{wallet.public_key}</code>\n\n"
-            f"💵 <b>Current Balance:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-            f"🔗 <b>On-chain:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-            f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-            f"📲 Send FAPCOIN tokens to your deposit address.\n\n"
-            f"🚀 Powered by $FAPCOIN on Solana",
-            reply_markup=keyboard,
-            parse_mode=ParseMode.HTML
-        )
+        text, found = deposit_status_text(wallet)
+        await callback.message.edit_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+        if found:
+            await callback.answer("Deposit found!")
+            return
     except Exception as e:
         logger.error(f"WALLET_DEPOSIT error: {e}")
         await callback.answer(f"Error checking deposits: {str(e)[:50]}", show_alert=True)
@@ -2582,7 +2528,7 @@ async def cmd_newwallet(message: Message):
 
 @router.message(Command("deposit"))
 async def cmd_deposit(message: Message):
-    """Check for new deposits to user's wallet with on-chain balance check"""
+    """Show deposit status from the balance kept by the deposit watcher"""
     telegram_id = message.from_user.id
     
     logger.info(f"DEPOSIT command from user {telegram_id}")
@@ -2591,59 +2537,17 @@ async def cmd_deposit(message: Message):
         await db.get_or_create_user(telegram_id, message.from_user.username, message.from_user.first_name)
         wallet = await db.get_or_create_user_wallet(telegram_id)
         
-        status_msg = await message.answer(
-            f"⏳ <b>Checking on-chain balance...</b>\n\n"
-            f"Please wait...",
-            parse_mode=ParseMode.HTML
-        )
-        
-        from src.utils.wallet import get_token_balance
-        on_chain_balance = await get_token_balance(wallet.public_key)
-        
-        # Always sync with on-chain balance to ensure accuracy
-        if on_chain_balance != wallet.balance:
-            deposit_amount = on_chain_balance - wallet.balance
-            await db.update_wallet_balance(telegram_id, on_chain_balance)
-            
-            if deposit_amount > 0:
-                await status_msg.edit_text(
-                    f"✅ <b>DEPOSIT FOUND!</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n"
-                    f"➕ <b>Deposited:</b> {deposit_amount:,.2f} $FAPCOIN\n"
-                    f"💵 <b>New Balance:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"Your balance has been updated!\n\n"
-                    f"🚀 Powered by $FAPCOIN on Solana",
-                    parse_mode=ParseMode.HTML
-                )
-            else:
-                # Balance decreased or synced (withdrawal or other)
-                await status_msg.edit_text(
-                    f"📥 <b>WALLET SYNCED</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n"
-                    f"💵 <b>Current Balance:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"Your balance is now in sync with the blockchain.",
-                    parse_mode=ParseMode.HTML
-                )
-        else:
-            await status_msg.edit_text(
-                f"📥 <b>DEPOSIT CHECK</b>\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━━\n"
-                f"📬 <b>Your Deposit Address:</b>\n<code>{wallet.public_key}</code>\n\n"
-                f"💵 <b>Current Balance:</b> {wallet.balance:,.2f} $FAPCOIN\n"
-                f"🔗 <b>On-chain:</b> {on_chain_balance:,.2f} $FAPCOIN\n"
-                f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"📲 Send FAPCOIN tokens to your deposit address above.\n\n"
-                f"🚀 Powered by $FAPCOIN on Solana",
-                parse_mode=ParseMode.HTML
-            )
+        text, _ = deposit_status_text(wallet)
+        await message.answer(text, parse_mode=ParseMode.HTML)
     except Exception as e:
         logger.error(f"DEPOSIT error: {e}")
         await message.answer(f"❌ Error checking deposits: {str(e)[:100]}", parse_mode=None)
 
 
-withdrawal_state = {}
+class WithdrawStates(StatesGroup):
+    address = State()
+    confirm = State()
+
 
 @router.message(Command("withdraw"))
 async def cmd_withdraw(message: Message):
@@ -2708,7 +2612,7 @@ async def cmd_withdraw(message: Message):
 
 
 @router.callback_query(F.data.startswith("withdraw_amt_"))
-async def callback_withdraw_amount(callback: CallbackQuery):
+async def callback_withdraw_amount(callback: CallbackQuery, state: FSMContext):
     """Step 2: Amount selected, ask for destination"""
     telegram_id = callback.from_user.id
     amount_str = callback.data.replace("withdraw_amt_", "")
@@ -2728,7 +2632,8 @@ async def callback_withdraw_amount(callback: CallbackQuery):
         await callback.answer("❌ Minimum withdrawal is 500 FAPCOIN", show_alert=True)
         return
     
-    withdrawal_state[telegram_id] = {"amount": amount, "step": "address"}
+    await state.set_state(WithdrawStates.address)
+    await state.set_data({"amount": amount})
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="⬅️ Back", callback_data="withdraw_back_step1")],
@@ -2750,14 +2655,9 @@ async def callback_withdraw_amount(callback: CallbackQuery):
     await callback.answer("✅ Amount selected")
 
 
-@router.message(F.text.regexp(r"^[1-9A-HJ-NP-Za-km-z]{32,44}$"))
-async def handle_withdrawal_address(message: Message):
+@router.message(WithdrawStates.address, F.text.regexp(r"^[1-9A-HJ-NP-Za-km-z]{32,44}$"))
+async def handle_withdrawal_address(message: Message, state: FSMContext):
     """Step 3: Address received, show confirmation"""
-    telegram_id = message.from_user.id
-    
-    if telegram_id not in withdrawal_state or withdrawal_state[telegram_id].get("step") != "address":
-        return
-    
     address = message.text.strip()
     from src.utils.wallet import validate_solana_address
     
@@ -2765,9 +2665,9 @@ async def handle_withdrawal_address(message: Message):
         await message.answer("❌ Invalid Solana address. Please send a valid address.", parse_mode=None)
         return
     
-    amount = withdrawal_state[telegram_id]["amount"]
-    withdrawal_state[telegram_id]["address"] = address
-    withdrawal_state[telegram_id]["step"] = "confirm"
+    data = await state.update_data(address=address)
+    amount = data["amount"]
+    await state.set_state(WithdrawStates.confirm)
     
     short_addr = f"{address[:6]}...{address[-4:]}"
     
@@ -2794,22 +2694,24 @@ async def handle_withdrawal_address(message: Message):
 
 
 @router.callback_query(F.data == "withdraw_confirm")
-async def callback_withdraw_confirm(callback: CallbackQuery):
+async def callback_withdraw_confirm(callback: CallbackQuery, state: FSMContext):
     """Step 4: Process withdrawal with on-chain transfer"""
     telegram_id = callback.from_user.id
     
-    if telegram_id not in withdrawal_state or withdrawal_state[telegram_id].get("step") != "confirm":
+    # Taken in one step before sending so a second tap, even handled concurrently, finds nothing
+    from src.utils.fsm_storage import take_state
+    data = await take_state(state, WithdrawStates.confirm)
+    if data is None:
         await callback.answer("❌ Session expired. Use /withdraw to start again.", show_alert=True)
         return
     
-    amount = withdrawal_state[telegram_id]["amount"]
-    address = withdrawal_state[telegram_id]["address"]
+    amount = data["amount"]
+    address = data["address"]
     
     wallet = await db.get_or_create_user_wallet(telegram_id)
     
     if wallet.balance < amount:
         await callback.answer("❌ Insufficient balance!", show_alert=True)
-        del withdrawal_state[telegram_id]
         return
     
     short_addr = f"{address[:6]}...{address[-4:]}"
@@ -2831,7 +2733,6 @@ async def callback_withdraw_confirm(callback: CallbackQuery):
     
     if tx_success:
         success, new_balance, error = await db.deduct_wallet_balance(telegram_id, amount)
-        del withdrawal_state[telegram_id]
         
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🔗 View on Solscan", url=f"https://solscan.io/tx/{tx_signature}")],
@@ -2856,8 +2757,6 @@ async def callback_withdraw_confirm(callback: CallbackQuery):
         logger.info(f"WITHDRAWAL SUCCESS: User {telegram_id} withdrew {amount} FAPCOIN to {address}, tx: {tx_signature}")
         await callback.answer("✅ Withdrawal complete!")
     else:
-        del withdrawal_state[telegram_id]
-        
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🔄 Try Again", callback_data="action_withdraw")],
             [InlineKeyboardButton(text="📞 Contact Support", callback_data="action_support")]
@@ -2882,12 +2781,11 @@ async def callback_withdraw_confirm(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "withdraw_back_step1")
-async def callback_withdraw_back_step1(callback: CallbackQuery):
+async def callback_withdraw_back_step1(callback: CallbackQuery, state: FSMContext):
     """Go back to step 1 - amount selection"""
     telegram_id = callback.from_user.id
     
-    if telegram_id in withdrawal_state:
-        del withdrawal_state[telegram_id]
+    await state.clear()
     
     wallet = await db.get_or_create_user_wallet(telegram_id)
     
@@ -2921,16 +2819,15 @@ async def callback_withdraw_back_step1(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "withdraw_back_step2")
-async def callback_withdraw_back_step2(callback: CallbackQuery):
+async def callback_withdraw_back_step2(callback: CallbackQuery, state: FSMContext):
     """Go back to step 2 - address entry"""
-    telegram_id = callback.from_user.id
-    
-    if telegram_id not in withdrawal_state:
+    data = await state.get_data()
+    if "amount" not in data:
         await callback.answer("❌ Session expired. Use /withdraw to start again.", show_alert=True)
         return
     
-    amount = withdrawal_state[telegram_id].get("amount", 0)
-    withdrawal_state[telegram_id]["step"] = "address"
+    amount = data["amount"]
+    await state.set_state(WithdrawStates.address)
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="⬅️ Back", callback_data="withdraw_back_step1")],
@@ -2953,12 +2850,9 @@ async def callback_withdraw_back_step2(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "withdraw_cancel")
-async def callback_withdraw_cancel(callback: CallbackQuery):
+async def callback_withdraw_cancel(callback: CallbackQuery, state: FSMContext):
     """Cancel withdrawal"""
-    telegram_id = callback.from_user.id
-    
-    if telegram_id in withdrawal_state:
-        del withdrawal_state[telegram_id]
+    await state.clear()
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="💰 Check Wallet", callback_data="action_wallet")],
@@ -3221,68 +3115,6 @@ async def cmd_fapbet(message: Message):
         )
 
 
-async def process_bet_fee_payouts(
-    bet_id: int,
-    treasury_wallet: str,
-    treasury_fee: float,
-    group_owner_wallet: str,
-    group_owner_fee: float,
-    is_main_group: bool,
-    chat_id: int,
-    bot
-):
-    """Process fee payouts with retry logic after bet resolution.
-    
-    This runs as a background task to send fees to treasury and group owner.
-    """
-    import asyncio
-    from src.utils.wallet import send_fapcoin_with_retry
-    
-    MIN_FEE_PAYOUT = 10.0
-    
-    fee_results = []
-    
-    if treasury_wallet and treasury_fee >= MIN_FEE_PAYOUT:
-        logger.info(f"Bet {bet_id}: Sending {treasury_fee} FAPCOIN treasury fee to {treasury_wallet}")
-        success, tx_sig, error = await send_fapcoin_with_retry(
-            treasury_wallet, treasury_fee, max_retries=3, check_delay=5.0
-        )
-        if success:
-            logger.info(f"Bet {bet_id}: Treasury fee sent successfully. TX: {tx_sig}")
-            fee_results.append(("treasury", True, tx_sig))
-        else:
-            logger.error(f"Bet {bet_id}: Treasury fee failed: {error}")
-            fee_results.append(("treasury", False, error))
-            await db.record_failed_fee_payout(bet_id, "treasury", treasury_fee, treasury_wallet, error)
-    
-    if not is_main_group and group_owner_wallet and group_owner_fee >= MIN_FEE_PAYOUT:
-        logger.info(f"Bet {bet_id}: Sending {group_owner_fee} FAPCOIN group owner fee to {group_owner_wallet}")
-        success, tx_sig, error = await send_fapcoin_with_retry(
-            group_owner_wallet, group_owner_fee, max_retries=3, check_delay=5.0
-        )
-        if success:
-            logger.info(f"Bet {bet_id}: Group owner fee sent successfully. TX: {tx_sig}")
-            fee_results.append(("group_owner", True, tx_sig))
-        else:
-            logger.error(f"Bet {bet_id}: Group owner fee failed: {error}")
-            fee_results.append(("group_owner", False, error))
-            await db.record_failed_fee_payout(bet_id, "group_owner", group_owner_fee, group_owner_wallet, error)
-    
-    failed_payouts = [r for r in fee_results if not r[1]]
-    if failed_payouts:
-        try:
-            fail_msg = "\n".join([f"• {r[0]}: {r[2]}" for r in failed_payouts])
-            await bot.send_message(
-                chat_id,
-                f"⚠️ <b>Fee Payout Issue</b>\n\n"
-                f"Some bet fees couldn't be sent:\n{fail_msg}\n\n"
-                f"This will be retried automatically.",
-                parse_mode=ParseMode.HTML
-            )
-        except Exception as e:
-            logger.error(f"Failed to send fee failure notification: {e}")
-
-
 @router.callback_query(F.data.startswith("fapbet_accept_"))
 async def callback_fapbet_accept(callback: CallbackQuery, bot: Bot):
     bet_id = int(callback.data.split("_")[2])
@@ -3377,18 +3209,6 @@ async def callback_fapbet_accept(callback: CallbackQuery, bot: Bot):
         parse_mode=ParseMode.HTML
     )
     await callback.answer(f"🏆 {winner_name} wins!")
-    
-    import asyncio
-    asyncio.create_task(process_bet_fee_payouts(
-        bet_id=bet_id,
-        treasury_wallet=treasury_wallet,
-        treasury_fee=result['treasury_fee'],
-        group_owner_wallet=group_owner_wallet,
-        group_owner_fee=result['group_owner_fee'],
-        is_main_group=is_main_group,
-        chat_id=bet.chat_id,
-        bot=bot
-    ))
 
 
 @router.callback_query(F.data.startswith("fapbet_decline_"))
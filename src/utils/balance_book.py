@@ -0,0 +1,182 @@
+import time
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+from src.utils.rpc import rpc_request
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = 60.0
+ATA_RENT_LAMPORTS = 2_039_280  # rent-exempt minimum for a token account, paid when we create one
+TX_FEE_LAMPORTS = 500_000  # base fee plus the highest priority fee the fee oracle will pay
+PAYOUT_LAMPORTS = ATA_RENT_LAMPORTS + TX_FEE_LAMPORTS
+
+
+class Reservation:
+    """Funds held for one payout until it is committed (spent) or released."""
+    __slots__ = ("token_raw", "lamports", "generation", "settled")
+
+    def __init__(self, token_raw: int, lamports: int, generation: int):
+        self.token_raw = token_raw
+        self.lamports = lamports
+        self.generation = generation
+        self.settled = False
+
+
+class BalanceBook:
+    """In-memory SOL and FAPCOIN balance of the main wallet.
+
+    Seeded from chain on first use and reconciled every RECONCILE_INTERVAL seconds.
+    Payouts reserve their amount (plus worst-case SOL for fees and ATA rent) before
+    building a transaction, so the admission check needs no RPC and concurrent payouts
+    in this process can't promise the same tokens twice. Committed payouts are subtracted
+    locally until the next reconcile replaces the estimate with the real balance. Every
+    replica runs its own reconcile because the book is in its memory and its payout
+    workers check against it; that is one getMultipleAccounts per replica per minute.
+
+    Holds are per process: replicas don't see each other's, so together they can admit
+    more than the wallet holds until the next reconcile. A payout admitted that way fails
+    its simulation (insufficient funds) and is never sent: an outbox job is retried with
+    backoff and a direct withdrawal reports the error. The book is a fast admission check;
+    the chain is what actually prevents overspending.
+    """
+
+    def __init__(self, interval: float = RECONCILE_INTERVAL):
+        self.interval = interval
+        self.address: Optional[str] = None
+        self.token_raw = 0
+        self.lamports = 0
+        self.reserved_token_raw = 0
+        self.reserved_lamports = 0
+        self.reconciled_at: Optional[float] = None
+        self._generation = 0
+        self._spent_token_raw = 0  # running totals, to correct a reconcile that raced a commit
+        self._spent_lamports = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                from src.utils.wallet import get_main_wallet_context
+                context = get_main_wallet_context()
+                if context and context.ata:
+                    await self.reconcile(context)
+            except Exception as e:
+                logger.error(f"Main wallet reconcile failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    @property
+    def available_token_raw(self) -> int:
+        return self.token_raw - self.reserved_token_raw
+
+    @property
+    def available_lamports(self) -> int:
+        return self.lamports - self.reserved_lamports
+
+    async def reconcile(self, context) -> bool:
+        """Replace the local balances with the chain's. Returns False if the read failed."""
+        from src.utils.deposits import decode_token_amount
+
+        async with self._lock:
+            spent_token, spent_lamports = self._spent_token_raw, self._spent_lamports
+            result = await rpc_request(
+                "getMultipleAccounts",
+                [[context.address, str(context.ata)], {"encoding": "base64", "commitment": "confirmed"}]
+            )
+            if "error" in result:
+                logger.warning(f"Main wallet reconcile RPC error: {result['error']}")
+                return False
+            wallet_account, token_account = result.get("result", {}).get("value", [None, None])
+            token_raw = decode_token_amount(token_account.get("data")) if token_account else 0
+            if token_raw is None:
+                logger.warning("Main wallet token account could not be decoded")
+                return False
+            lamports = wallet_account.get("lamports", 0) if wallet_account else 0
+
+            if context.address != self.address:
+                # New or rotated wallet: holds taken against the old one no longer apply
+                self.address = context.address
+                self._generation += 1
+                self.reserved_token_raw = 0
+                self.reserved_lamports = 0
+
+            # A commit during the read may or may not be in it; assume not and under-count
+            self.token_raw = token_raw - (self._spent_token_raw - spent_token)
+            self.lamports = lamports - (self._spent_lamports - spent_lamports)
+            self.reconciled_at = time.monotonic()
+            return True
+
+    async def reserve(self, context, amount: float) -> Tuple[Optional[Reservation], Optional[str]]:
+        """Hold amount FAPCOIN and worst-case fees for one payout.
+
+        Only the first call (or the first after a wallet rotation) reads the chain.
+        Returns (reservation, None) or (None, error_message).
+        """
+        from src.utils.wallet import FAPCOIN_DECIMALS
+
+        if context.address != self.address or self.reconciled_at is None:
+            try:
+                loaded = await self.reconcile(context)
+            except Exception as e:
+                logger.error(f"Main wallet balance read failed: {e}")
+                loaded = False
+            if not loaded:
+                return None, "Could not read main wallet balance"
+
+        token_raw = int(round(amount * (10 ** FAPCOIN_DECIMALS)))
+        if self.available_lamports < PAYOUT_LAMPORTS:
+            return None, (f"Insufficient SOL for gas fees (have {self.available_lamports / 1_000_000_000:.4f} SOL "
+                          f"available, need {PAYOUT_LAMPORTS / 1_000_000_000:.4f})")
+        if self.available_token_raw < token_raw:
+            scale = 10 ** FAPCOIN_DECIMALS
+            return None, (f"Insufficient FAPCOIN in main wallet "
+                          f"(have {self.available_token_raw / scale:,.2f}, need {amount:,.2f})")
+
+        self.reserved_token_raw += token_raw
+        self.reserved_lamports += PAYOUT_LAMPORTS
+        return Reservation(token_raw, PAYOUT_LAMPORTS, self._generation), None
+
+    def commit(self, reservation: Reservation):
+        """The payout was (or may have been) sent: move the hold into the spent balance."""
+        if not self._settle(reservation):
+            return
+        self.token_raw -= reservation.token_raw
+        self.lamports -= reservation.lamports
+        self._spent_token_raw += reservation.token_raw
+        self._spent_lamports += reservation.lamports
+
+    def release(self, reservation: Reservation):
+        """The payout certainly did not send: give the hold back."""
+        self._settle(reservation)
+
+    def settle(self, reservation: Reservation, spent: bool):
+        if spent:
+            self.commit(reservation)
+        else:
+            self.release(reservation)
+
+    def _settle(self, reservation: Reservation) -> bool:
+        if reservation.settled:
+            return False
+        reservation.settled = True
+        if reservation.generation != self._generation:
+            return False
+        self.reserved_token_raw -= reservation.token_raw
+        self.reserved_lamports -= reservation.lamports
+        return True
+
+
+_book: Optional[BalanceBook] = None
+
+
+def get_balance_book() -> BalanceBook:
+    global _book
+    if _book is None:
+        _book = BalanceBook()
+    return _book
@@ -0,0 +1,170 @@
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramMigrateToChat, TelegramRetryAfter
+)
+
+from src.utils.rpc import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 25.0  # Telegram allows about 30 messages/s per bot; keep some headroom
+PER_CHAT_RATE = 20 / 60  # groups accept about 20 messages per minute from a bot
+BROADCAST_WORKERS = 20
+MAX_SEND_ATTEMPTS = 3
+INACTIVE_FLUSH_EVERY = 50
+CHAT_BUCKETS_MAX = 10_000
+# BadRequest texts that mean the chat is gone for good
+GONE_MARKERS = ("chat not found", "bot was kicked", "bot is not a member", "group chat was deactivated",
+                "need administrator rights", "have no rights to send")
+
+
+class BroadcastReport:
+    """Delivery counts for one broadcast."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.deactivated = 0
+        self.retried = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def summary(self) -> str:
+        rate = self.sent / self.elapsed if self.elapsed > 0 else 0.0
+        return (f"{self.sent}/{self.total} delivered, {self.failed} failed, {self.deactivated} chats marked inactive, "
+                f"{self.retried} retries in {self.elapsed:.0f}s ({rate:.1f} msg/s)")
+
+
+class Broadcaster:
+    """Sends one message to many chats concurrently within Telegram's limits.
+
+    Workers share a global token bucket (GLOBAL_RATE) and each chat has its own
+    (PER_CHAT_RATE). TelegramRetryAfter pauses every worker for the time Telegram asks
+    and requeues the chat; chats the bot was kicked from or that no longer exist are
+    recorded in inactive_chats and skipped from then on. Migrated groups get the message
+    at their new id.
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, per_chat_rate: float = PER_CHAT_RATE,
+                 workers: int = BROADCAST_WORKERS):
+        self.workers = workers
+        self.per_chat_rate = per_chat_rate
+        self._global = TokenBucket(global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self.last_report: Optional[BroadcastReport] = None
+
+    async def _wait_turn(self, chat_id: int):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_MAX:
+                self._chats.clear()
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, burst=1)
+        while True:
+            now = time.monotonic()
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            delay = max(self._global.delay(), bucket.delay())
+            if delay == 0:
+                self._global.take(1)
+                bucket.take(1)
+                return
+            await asyncio.sleep(delay)
+
+    async def broadcast(self, bot, chat_ids: List[int], text: str, **kwargs) -> BroadcastReport:
+        """Send text (and send_message kwargs such as reply_markup) to every chat once."""
+        from src.database import db
+
+        report = BroadcastReport(len(chat_ids))
+        self.last_report = report
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait((chat_id, 1))
+        inactive: List[Tuple[int, str]] = []
+
+        async def flush_inactive():
+            batch = inactive[:]
+            inactive.clear()
+            try:
+                await db.mark_chats_inactive(batch)
+            except Exception as e:
+                logger.error(f"Could not mark {len(batch)} chats inactive: {e}")
+
+        async def worker():
+            while True:
+                chat_id, attempt = await queue.get()
+                try:
+                    gone_reason = await self._send(bot, chat_id, attempt, text, kwargs, queue, report)
+                    if gone_reason:
+                        inactive.append((chat_id, gone_reason))
+                        report.deactivated += 1
+                        if len(inactive) >= INACTIVE_FLUSH_EVERY:
+                            await flush_inactive()
+                finally:
+                    queue.task_done()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(min(self.workers, max(1, len(chat_ids))))]
+        try:
+            await queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await flush_inactive()
+        report.finished = time.monotonic()
+        logger.info(f"Broadcast finished: {report.summary()}")
+        return report
+
+    async def _send(self, bot, chat_id: int, attempt: int, text: str, kwargs: dict,
+                    queue: asyncio.Queue, report: BroadcastReport) -> Optional[str]:
+        """Deliver to one chat. Returns the reason when the chat should be marked inactive."""
+        await self._wait_turn(chat_id)
+        try:
+            await bot.send_message(chat_id, text, **kwargs)
+            report.sent += 1
+        except TelegramRetryAfter as e:
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            logger.warning(f"Broadcast flood control: pausing {e.retry_after}s")
+            self._requeue(chat_id, attempt, queue, report, str(e))
+        except TelegramMigrateToChat as e:
+            # The group became a supergroup; its old id is gone
+            queue.put_nowait((e.migrate_to_chat_id, attempt))
+            return "migrated"
+        except TelegramForbiddenError as e:
+            return str(e.message)[:255]
+        except TelegramBadRequest as e:
+            if any(marker in e.message.lower() for marker in GONE_MARKERS):
+                return str(e.message)[:255]
+            report.failed += 1
+            logger.warning(f"Could not broadcast to chat {chat_id}: {e}")
+        except Exception as e:
+            self._requeue(chat_id, attempt, queue, report, str(e))
+        return None
+
+    def _requeue(self, chat_id: int, attempt: int, queue: asyncio.Queue, report: BroadcastReport, error: str):
+        if attempt < MAX_SEND_ATTEMPTS:
+            report.retried += 1
+            queue.put_nowait((chat_id, attempt + 1))
+        else:
+            report.failed += 1
+            logger.warning(f"Could not broadcast to chat {chat_id} after {attempt} attempts: {error}")
+
+
+_broadcaster: Optional[Broadcaster] = None
+
+
+def get_broadcaster() -> Broadcaster:
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = Broadcaster()
+    return _broadcaster
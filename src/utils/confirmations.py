@@ -0,0 +1,193 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.rpc import rpc_request
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_STATUS_CHUNK = 256  # getSignatureStatuses accepts at most 256 signatures per call
+POLL_INTERVAL = 2.0
+DEFAULT_TIMEOUT = 60.0
+PUSHED_POLL_EVERY = 5  # while the websocket is up, pushed signatures are only polled every Nth tick
+
+
+class _PendingSignature:
+    __slots__ = ("future", "last_valid_block_height", "deadline", "pushed")
+
+    def __init__(self, future: asyncio.Future, last_valid_block_height: Optional[int], deadline: float):
+        self.future = future
+        self.last_valid_block_height = last_valid_block_height
+        self.deadline = deadline
+        self.pushed = False
+
+
+class ConfirmationTracker:
+    """Single poller for every in-flight transfer.
+
+    Callers register a signature and await its result; one task checks all pending
+    signatures per tick (chunked getSignatureStatuses + one getBlockHeight) and
+    resolves each future with (status, error). status is one of 'confirmed',
+    'finalized', 'failed', 'expired' or 'timeout'.
+
+    When the Solana websocket is connected, signatures are also subscribed there and
+    usually resolve from the push notification; polling for them drops to a slow
+    safety net and returns to full speed whenever the socket is down.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL, chunk_size: int = SIGNATURE_STATUS_CHUNK):
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self._pending: Dict[str, _PendingSignature] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._ticks = 0
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def track(self, signature: str, last_valid_block_height: int = None, timeout: float = DEFAULT_TIMEOUT) -> asyncio.Future:
+        """Register a signature and return the future that resolves to (status, error)."""
+        entry = self._pending.get(signature)
+        if entry and not entry.future.done():
+            return entry.future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = _PendingSignature(future, last_valid_block_height, loop.time() + timeout)
+        self._pending[signature] = entry
+
+        from src.utils.solana_ws import get_solana_ws
+        ws = get_solana_ws()
+        if ws is not None:
+            ws.subscribe_signature(signature)
+            entry.pushed = True
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    async def wait(self, signature: str, last_valid_block_height: int = None, timeout: float = DEFAULT_TIMEOUT) -> Tuple[str, Optional[str]]:
+        """Wait until the signature is confirmed, fails, expires or times out."""
+        # Shielded so one cancelled waiter doesn't cancel the shared future for the others
+        return await asyncio.shield(self.track(signature, last_valid_block_height, timeout))
+
+    def resolve(self, signature: str, status: str, error: str = None):
+        """Resolve a tracked signature from outside the poll loop."""
+        entry = self._pending.pop(signature, None)
+        if entry is None:
+            return
+        if not entry.future.done():
+            entry.future.set_result((status, error))
+        if entry.pushed:
+            from src.utils.solana_ws import get_solana_ws
+            ws = get_solana_ws()
+            if ws is not None:
+                ws.unsubscribe_signature(signature)
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._tick()
+            except Exception as e:
+                logger.error(f"Confirmation tracker tick failed: {e}")
+
+    async def _tick(self):
+        for signature in [s for s, e in self._pending.items() if e.future.done()]:
+            self.resolve(signature, "cancelled")
+        if not self._pending:
+            return
+
+        from src.utils.solana_ws import get_solana_ws
+        ws = get_solana_ws()
+        push_live = ws is not None and ws.is_connected
+        self._ticks += 1
+        safety_tick = self._ticks % PUSHED_POLL_EVERY == 0
+
+        now = asyncio.get_running_loop().time()
+        signatures = [
+            s for s, e in self._pending.items()
+            if not (push_live and e.pushed) or safety_tick or now >= e.deadline
+        ]
+        if not signatures:
+            return
+
+        # Fetch the height before the statuses: a signature still unknown afterwards
+        # can no longer land once this height is past its lastValidBlockHeight
+        block_height = None
+        if any(self._pending[s].last_valid_block_height is not None for s in signatures):
+            result = await rpc_request("getBlockHeight")
+            block_height = result.get("result")
+
+        statuses = await self._fetch_statuses(signatures, search_history=False)
+
+        now = asyncio.get_running_loop().time()
+        expiry_candidates = []
+        for signature in signatures:
+            entry = self._pending.get(signature)
+            if entry is None:
+                continue
+            if signature not in statuses:
+                continue  # RPC error for this chunk, try again next tick
+
+            status = statuses[signature]
+            if status is not None:
+                if status.get("err"):
+                    self.resolve(signature, "failed", f"Transaction failed on-chain: {status['err']}")
+                    continue
+                confirmation = status.get("confirmationStatus", "")
+                if confirmation in ["confirmed", "finalized"]:
+                    self.resolve(signature, confirmation)
+                    continue
+            elif (block_height is not None and entry.last_valid_block_height is not None
+                  and block_height > entry.last_valid_block_height):
+                expiry_candidates.append(signature)
+                continue
+
+            if now >= entry.deadline:
+                self.resolve(signature, "timeout", "Transaction sent but confirmation timed out")
+
+        if expiry_candidates:
+            # One history lookup before declaring expiry, in case the status cache missed it
+            history = await self._fetch_statuses(expiry_candidates, search_history=True)
+            for signature in expiry_candidates:
+                if signature not in history:
+                    continue
+                status = history[signature]
+                if status is None:
+                    self.resolve(signature, "expired", "Transaction expired (blockhash too old)")
+                elif status.get("err"):
+                    self.resolve(signature, "failed", f"Transaction failed on-chain: {status['err']}")
+                else:
+                    self.resolve(signature, status.get("confirmationStatus") or "confirmed")
+
+    async def _fetch_statuses(self, signatures: List[str], search_history: bool) -> Dict[str, Optional[dict]]:
+        statuses = {}
+        for i in range(0, len(signatures), self.chunk_size):
+            chunk = signatures[i:i + self.chunk_size]
+            try:
+                result = await rpc_request(
+                    "getSignatureStatuses",
+                    [chunk, {"searchTransactionHistory": search_history}]
+                )
+            except Exception as e:
+                logger.warning(f"getSignatureStatuses failed for {len(chunk)} signatures: {e}")
+                continue
+            if "error" in result:
+                logger.warning(f"getSignatureStatuses RPC error: {result['error']}")
+                continue
+            values = result.get("result", {}).get("value", [])
+            for signature, status in zip(chunk, values):
+                statuses[signature] = status
+        return statuses
+
+
+_tracker: Optional[ConfirmationTracker] = None
+
+
+def get_confirmation_tracker() -> ConfirmationTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = ConfirmationTracker()
+    return _tracker
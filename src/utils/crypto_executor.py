@@ -0,0 +1,104 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CRYPTO_WORKERS = int(os.environ.get('CRYPTO_WORKERS', '2'))
+
+
+class CryptoExecutor:
+    """Thread pool for CPU-bound crypto: PBKDF2, Fernet, PDA derivation and signing.
+
+    Handlers await these instead of running them on the event loop, so one wallet
+    creation can't stall every other chat. Batch helpers run a whole list in a single
+    job to keep the per-call hand-off cost out of bulk paths.
+    """
+
+    def __init__(self, workers: int = CRYPTO_WORKERS):
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crypto")
+        self.jobs = 0
+        self.pending = 0
+        self.busy_seconds = 0.0
+
+    @staticmethod
+    def _timed(fn: Callable, args: tuple):
+        """(result, exception, seconds) of fn(*args), measured on the pool thread."""
+        started = time.perf_counter()
+        try:
+            return fn(*args), None, time.perf_counter() - started
+        except Exception as e:
+            return None, e, time.perf_counter() - started
+
+    async def run(self, fn: Callable, *args):
+        self.jobs += 1
+        self.pending += 1
+        try:
+            result, error, seconds = await asyncio.get_running_loop().run_in_executor(self._pool, self._timed, fn, args)
+        finally:
+            self.pending -= 1
+        # Summed here on the loop thread: += from several pool threads can lose updates
+        self.busy_seconds += seconds
+        if error is not None:
+            raise error
+        return result
+
+    async def map(self, fn: Callable, items: Iterable) -> list:
+        """fn over every item in one pool job."""
+        items = list(items)
+        if not items:
+            return []
+        return await self.run(lambda: [fn(item) for item in items])
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+async def warm_up():
+    """Derive the wallet encryption key off the loop so no handler pays for the PBKDF2."""
+    from src.utils.wallet import get_encryption_key
+    started = time.perf_counter()
+    await get_crypto_executor().run(get_encryption_key)
+    logger.info(f"Encryption key ready in {time.perf_counter() - started:.2f}s")
+
+
+async def generate_wallet(telegram_id: int):
+    from src.utils.wallet import generate_wallet as _generate_wallet
+    return await get_crypto_executor().run(_generate_wallet, telegram_id)
+
+
+async def decrypt_private_keys(encrypted_private_keys: List[str]) -> list:
+    from src.utils.wallet import decrypt_private_key
+    return await get_crypto_executor().map(decrypt_private_key, encrypted_private_keys)
+
+
+async def decrypt_private_key(encrypted_private_key: str):
+    return (await decrypt_private_keys([encrypted_private_key]))[0]
+
+
+async def associated_token_addresses(owners: List[str]) -> list:
+    """FAPCOIN token account per owner address (None where the address is invalid)."""
+    from solders.pubkey import Pubkey
+    from src.utils.wallet import get_associated_token_address
+
+    def derive(owner: str):
+        try:
+            return get_associated_token_address(Pubkey.from_string(owner))
+        except Exception:
+            return None
+
+    return await get_crypto_executor().map(derive, owners)
+
+
+_executor: Optional[CryptoExecutor] = None
+
+
+def get_crypto_executor() -> CryptoExecutor:
+    global _executor
+    if _executor is None:
+        _executor = CryptoExecutor()
+    return _executor
@@ -0,0 +1,158 @@
+import time
+import base64
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.rpc import rpc_request
+
+logger = logging.getLogger(__name__)
+
+MULTIPLE_ACCOUNTS_CHUNK = 100  # getMultipleAccounts accepts at most 100 accounts per call
+SWEEP_INTERVAL = 30.0
+RECENT_CREDIT_TTL = 3600.0
+TOKEN_AMOUNT_OFFSET = 64  # SPL token account layout: mint (32) | owner (32) | amount (u64 LE)
+
+
+def decode_token_amount(data) -> Optional[int]:
+    """Raw u64 amount from a base64-encoded SPL token account, or None if it can't be read."""
+    if not data:
+        return None
+    encoded = data[0] if isinstance(data, list) else data
+    try:
+        raw = base64.b64decode(encoded)
+    except Exception:
+        return None
+    if len(raw) < TOKEN_AMOUNT_OFFSET + 8:
+        return None
+    return int.from_bytes(raw[TOKEN_AMOUNT_OFFSET:TOKEN_AMOUNT_OFFSET + 8], "little")
+
+
+class DepositWatcher:
+    """Background sweep of every burner wallet's FAPCOIN account.
+
+    Each sweep loads the wallet list, derives the associated token accounts (cached per
+    wallet) and reads them with chunked getMultipleAccounts - about 100 RPC calls for 10k
+    wallets. Changed amounts are written back in one bulk update that credits increases
+    to the in-bot balance, so the deposit buttons only have to read the database.
+    Each sweep runs on one replica at a time (advisory lock), so the RPC load doesn't
+    grow with the replica count; the "deposit found" notice and last-sweep time are only
+    known on the replica that swept.
+    """
+
+    def __init__(self, interval: float = SWEEP_INTERVAL, chunk_size: int = MULTIPLE_ACCOUNTS_CHUNK):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.last_sweep_at: Optional[float] = None
+        self._ata_cache: Dict[str, Optional[str]] = {}
+        self._recent_credits: Dict[int, Tuple[float, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def seconds_since_sweep(self) -> Optional[float]:
+        if self.last_sweep_at is None:
+            return None
+        return time.monotonic() - self.last_sweep_at
+
+    def pop_recent_credit(self, telegram_id: int) -> Optional[float]:
+        """Amount credited to this user since they last looked, if any."""
+        entry = self._recent_credits.pop(telegram_id, None)
+        return entry[0] if entry else None
+
+    async def _run(self):
+        from src.utils.scheduler import run_exclusive
+
+        while True:
+            try:
+                await run_exclusive("deposit_sweep", self.sweep)
+            except Exception as e:
+                logger.error(f"Deposit sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _derive_token_accounts(self, public_keys: List[str]):
+        """Fill the ATA cache for new wallets; derivation runs as one crypto executor job."""
+        from src.utils.crypto_executor import associated_token_addresses
+        missing = [key for key in public_keys if key not in self._ata_cache]
+        for public_key, ata in zip(missing, await associated_token_addresses(missing)):
+            self._ata_cache[public_key] = str(ata) if ata else None
+
+    async def sweep(self) -> int:
+        """Check every wallet once and apply changes. Returns the number of wallets updated."""
+        from src.database import db
+        from src.utils.wallet import FAPCOIN_MINT_PUBKEY, FAPCOIN_DECIMALS
+
+        if FAPCOIN_MINT_PUBKEY is None:
+            return 0
+
+        wallets = await db.get_watched_wallets()
+        await self._derive_token_accounts([public_key for _, public_key, _ in wallets])
+        targets = []
+        for telegram_id, public_key, previous in wallets:
+            ata = self._ata_cache.get(public_key)
+            if ata:
+                targets.append((telegram_id, ata, previous))
+
+        amounts = await self._fetch_amounts([ata for _, ata, _ in targets])
+
+        observations = []
+        for telegram_id, ata, previous in targets:
+            if ata not in amounts:
+                continue  # chunk failed, keep the old watermark until the next sweep
+            observed = amounts[ata]
+            if observed != previous:
+                observations.append((telegram_id, previous, observed))
+
+        updated = await db.apply_onchain_balances(observations, FAPCOIN_DECIMALS)
+
+        now = time.monotonic()
+        scale = 10 ** FAPCOIN_DECIMALS
+        for telegram_id in [t for t, (_, at) in self._recent_credits.items() if now - at > RECENT_CREDIT_TTL]:
+            del self._recent_credits[telegram_id]
+        for telegram_id, previous, observed in observations:
+            if previous is not None and observed > previous:
+                credited, _ = self._recent_credits.get(telegram_id, (0.0, now))
+                self._recent_credits[telegram_id] = (credited + (observed - previous) / scale, now)
+        self.last_sweep_at = now
+
+        if observations:
+            logger.info(f"Deposit sweep: {len(targets)} wallets checked, {updated} balances updated")
+        return updated
+
+    async def _fetch_amounts(self, accounts: List[str]) -> Dict[str, int]:
+        """Raw token amount per account; accounts that don't exist yet read as 0."""
+        amounts = {}
+        for i in range(0, len(accounts), self.chunk_size):
+            chunk = accounts[i:i + self.chunk_size]
+            try:
+                result = await rpc_request(
+                    "getMultipleAccounts",
+                    [chunk, {"encoding": "base64", "commitment": "confirmed"}]
+                )
+            except Exception as e:
+                logger.warning(f"getMultipleAccounts failed for {len(chunk)} accounts: {e}")
+                continue
+            if "error" in result:
+                logger.warning(f"getMultipleAccounts RPC error: {result['error']}")
+                continue
+            values = result.get("result", {}).get("value", [])
+            for account, value in zip(chunk, values):
+                if value is None:
+                    amounts[account] = 0
+                    continue
+                amount = decode_token_amount(value.get("data"))
+                if amount is not None:
+                    amounts[account] = amount
+        return amounts
+
+
+_watcher: Optional[DepositWatcher] = None
+
+
+def get_deposit_watcher() -> DepositWatcher:
+    global _watcher
+    if _watcher is None:
+        _watcher = DepositWatcher()
+    return _watcher
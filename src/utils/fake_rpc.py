@@ -0,0 +1,647 @@
+"""Local fake Solana JSON-RPC server for offline load tests.
+
+Serves the methods the bot calls with configurable latency, error rates, 429 injection
+and delayed confirmation, so withdrawal and payout throughput and the retry logic can
+be exercised without mainnet:
+
+    python -m src.utils.fake_rpc serve --port 8899 --latency lognormal:80:0.5 --rate-limit 0.02
+    python -m src.utils.fake_rpc bench --payouts 200 --withdrawals 50 --max-rps 200
+
+Point the bot at it with SOLANA_RPC_URL=http://127.0.0.1:8899. Every address reads as a
+funded token account (its lamports serve as the SOL balance), except a deterministic
+missing_account_rate share that doesn't exist. Balances don't move when transactions
+land. Incoming payments for the payment indexer can be injected with POST /_fake/payments.
+
+The same port is also a stand-in for the RPC websocket (SOLANA_WS_URL=ws://127.0.0.1:8899/):
+signatureSubscribe notifies once the transaction reaches the requested commitment, and
+accountSubscribe notifies when POST /_fake/accounts changes an account. POST /_fake/ws/drop
+closes every socket (and with {"refuse": SECONDS} turns reconnects away for that long), and
+--ws-drop-every does so periodically, so resubscribing and the polling fallback get exercised.
+"""
+import os
+import sys
+import time
+import json
+import base64
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+from typing import Dict, List, Optional, Set
+
+from aiohttp import WSMsgType, web
+from solders.hash import Hash
+from solders.signature import Signature
+from solders.transaction import VersionedTransaction
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PROGRAM_ID_STR = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+TOKEN_ACCOUNT_SIZE = 165
+TOKEN_DECIMALS = 6
+BLOCKHASH_VALIDITY = 150  # blocks a blockhash stays valid
+SLOT_OFFSET = 20_000_000  # slots run ahead of block height on mainnet, keep them apart here too
+WS_STATUS_POLL = 0.1  # how often signature subscriptions look at the ledger, seconds
+
+
+class Distribution:
+    """Delay distribution parsed from 'fixed:MS', 'uniform:LO:HI' or 'lognormal:MEDIAN:SIGMA' (milliseconds)."""
+
+    def __init__(self, spec: str = "fixed:0"):
+        self.spec = spec
+        kind, *args = spec.split(":")
+        self.kind = kind
+        self.args = [float(a) for a in args]
+        if kind not in ("fixed", "uniform", "lognormal") or len(self.args) != {"fixed": 1, "uniform": 2, "lognormal": 2}[kind]:
+            raise ValueError(f"Bad distribution: {spec}")
+
+    def sample(self) -> float:
+        """One delay in seconds."""
+        if self.kind == "fixed":
+            ms = self.args[0]
+        elif self.kind == "uniform":
+            ms = random.uniform(*self.args)
+        else:
+            median, sigma = self.args
+            ms = random.lognormvariate(0.0, sigma) * median
+        return max(0.0, ms) / 1000
+
+
+class FakeRpcConfig:
+    """Fault injection and ledger knobs. Rates are probabilities per request or transaction."""
+
+    def __init__(self, latency: str = "fixed:0", method_latency: Dict[str, str] = None,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, server_error_rate: float = 0.0,
+                 max_rps: float = 0.0, retry_after: float = 1.0, confirm_delay: str = "uniform:400:1500",
+                 finalize_after: float = 13.0, drop_rate: float = 0.0, failure_rate: float = 0.0,
+                 simulation_failure_rate: float = 0.0, missing_account_rate: float = 0.0,
+                 blocks_per_second: float = 2.5, units_consumed: int = 12_000,
+                 lamports: int = 1_000 * 10 ** 9, token_raw: int = 10 ** 15, ws_drop_every: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency = Distribution(latency)
+        self.method_latency = {method: Distribution(spec) for method, spec in (method_latency or {}).items()}
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.confirm_delay = Distribution(confirm_delay)
+        self.finalize_after = finalize_after
+        self.drop_rate = drop_rate
+        self.failure_rate = failure_rate
+        self.simulation_failure_rate = simulation_failure_rate
+        self.missing_account_rate = missing_account_rate
+        self.blocks_per_second = blocks_per_second
+        self.units_consumed = units_consumed
+        self.lamports = lamports
+        self.token_raw = token_raw
+        self.ws_drop_every = ws_drop_every
+        if seed is not None:
+            random.seed(seed)
+
+
+class _Tx:
+    __slots__ = ("signature", "land_at", "dropped", "err", "slot", "block_time", "balances")
+
+    def __init__(self, signature: str, land_at: float, dropped: bool, err, balances: list = None):
+        self.signature = signature
+        self.land_at = land_at
+        self.dropped = dropped
+        self.err = err
+        self.slot = 0
+        self.block_time = 0
+        self.balances = balances or []  # [(owner, mint, pre_raw, post_raw)]
+
+
+class FakeLedger:
+    """Chain state behind the fake server: block height, accounts and transactions."""
+
+    def __init__(self, config: FakeRpcConfig):
+        self.config = config
+        self.started = time.monotonic()
+        self.accounts: Dict[str, dict] = {}
+        self.transactions: Dict[str, _Tx] = {}
+        self.by_address: Dict[str, List[str]] = {}
+
+    def block_height(self) -> int:
+        return 250_000_000 + int((time.monotonic() - self.started) * self.config.blocks_per_second)
+
+    def set_account(self, address: str, lamports: int = None, token_raw: int = None, exists: bool = True):
+        """Override what one address reads as."""
+        self.accounts[address] = {'lamports': lamports, 'token_raw': token_raw, 'exists': exists}
+
+    def account(self, address: str) -> Optional[dict]:
+        """{'lamports', 'token_raw'} for an address, or None when it doesn't exist."""
+        override = self.accounts.get(address, {})
+        exists = override.get('exists')
+        if exists is None:
+            digest = int.from_bytes(hashlib.sha256(address.encode()).digest()[:4], "little")
+            exists = digest / 2 ** 32 >= self.config.missing_account_rate
+        if not exists:
+            return None
+        lamports = override.get('lamports')
+        token_raw = override.get('token_raw')
+        return {
+            'lamports': self.config.lamports if lamports is None else lamports,
+            'token_raw': self.config.token_raw if token_raw is None else token_raw,
+        }
+
+    def _land(self, tx: _Tx, addresses: List[str]):
+        self.transactions[tx.signature] = tx
+        for address in addresses:
+            self.by_address.setdefault(address, []).append(tx.signature)
+
+    def submit(self, tx_base64: str) -> str:
+        """Record a sent transaction and decide when (and whether) it lands."""
+        tx = VersionedTransaction.from_bytes(base64.b64decode(tx_base64))
+        signature = str(tx.signatures[0])
+        if signature in self.transactions:
+            return signature  # a rebroadcast
+        config = self.config
+        err = {"InstructionError": [0, {"Custom": 1}]} if random.random() < config.failure_rate else None
+        record = _Tx(signature, time.monotonic() + config.confirm_delay.sample(), random.random() < config.drop_rate, err)
+        self._land(record, [str(key) for key in tx.message.account_keys])
+        return signature
+
+    def add_payment(self, sender: str, recipient: str, amount: float, mint: str, addresses: List[str]) -> str:
+        """A finalized token transfer from sender to recipient, listed under addresses."""
+        signature = str(Signature.new_unique())
+        raw = int(amount * 10 ** TOKEN_DECIMALS)
+        balances = [(sender, mint, raw, 0), (recipient, mint, 0, raw)]
+        record = _Tx(signature, time.monotonic() - self.config.finalize_after, False, None, balances)
+        self._land(record, addresses)
+        return signature
+
+    def status(self, signature: str) -> Optional[dict]:
+        record = self.transactions.get(signature)
+        now = time.monotonic()
+        if record is None or record.dropped or now < record.land_at:
+            return None
+        if not record.slot:
+            record.slot = self.block_height() + SLOT_OFFSET
+            record.block_time = int(time.time())
+        finalized = now >= record.land_at + self.config.finalize_after
+        return {
+            "slot": record.slot,
+            "confirmations": None if finalized else 1,
+            "err": record.err,
+            "status": {"Err": record.err} if record.err else {"Ok": None},
+            "confirmationStatus": "finalized" if finalized else "confirmed",
+        }
+
+
+def _token_account_data(token_raw: int) -> str:
+    data = bytearray(TOKEN_ACCOUNT_SIZE)
+    data[64:72] = token_raw.to_bytes(8, "little")
+    data[108] = 1  # initialized
+    return base64.b64encode(bytes(data)).decode()
+
+
+def _ui(raw: int) -> dict:
+    ui = raw / 10 ** TOKEN_DECIMALS
+    return {"amount": str(raw), "decimals": TOKEN_DECIMALS, "uiAmount": ui, "uiAmountString": f"{ui:f}".rstrip("0").rstrip(".")}
+
+
+class FakeRpcServer:
+    """aiohttp app answering single and batched JSON-RPC requests from a FakeLedger.
+
+    GET / upgrades to the websocket stand-in; fault injection applies to HTTP only.
+    """
+
+    def __init__(self, config: FakeRpcConfig = None):
+        self.config = config or FakeRpcConfig()
+        self.ledger = FakeLedger(self.config)
+        self.stats: Dict[str, int] = {}
+        self._bucket = self.config.max_rps
+        self._bucket_at = time.monotonic()
+        self._runner: Optional[web.AppRunner] = None
+        self._sockets: Set[web.WebSocketResponse] = set()
+        self._account_subscriptions: Dict[str, Dict[int, web.WebSocketResponse]] = {}  # address -> id -> socket
+        self._next_subscription = 1
+        self._refuse_until = 0.0
+        self._dropper: Optional[asyncio.Task] = None
+        self.url: Optional[str] = None
+
+    def _count(self, key: str):
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _over_limit(self) -> bool:
+        rate = self.config.max_rps
+        if rate <= 0:
+            return False
+        now = time.monotonic()
+        self._bucket = min(rate, self._bucket + (now - self._bucket_at) * rate)
+        self._bucket_at = now
+        if self._bucket < 1:
+            return True
+        self._bucket -= 1
+        return False
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8899) -> str:
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        app.router.add_get("/_fake/stats", self.handle_stats)
+        app.router.add_post("/_fake/payments", self.handle_payment)
+        app.router.add_get("/", self.handle_ws)
+        app.router.add_post("/_fake/accounts", self.handle_account)
+        app.router.add_post("/_fake/ws/drop", self.handle_ws_drop)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        if self.config.ws_drop_every > 0:
+            self._dropper = asyncio.create_task(self._drop_periodically())
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    @property
+    def ws_url(self) -> Optional[str]:
+        return "ws" + self.url[len("http"):] + "/" if self.url else None
+
+    async def stop(self):
+        if self._dropper is not None:
+            self._dropper.cancel()
+            self._dropper = None
+        await self.drop_websockets()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        calls = body if isinstance(body, list) else [body]
+        config = self.config
+
+        if self._over_limit() or random.random() < config.rate_limit_rate:
+            self._count("http_429")
+            return web.json_response(
+                {"jsonrpc": "2.0", "error": {"code": 429, "message": "Too many requests"}, "id": None},
+                status=429, headers={"Retry-After": f"{config.retry_after:g}"}
+            )
+        if random.random() < config.server_error_rate:
+            self._count("http_503")
+            return web.Response(status=503, text="Service unavailable")
+
+        method = calls[0].get("method", "") if calls else ""
+        await asyncio.sleep(config.method_latency.get(method, config.latency).sample())
+        responses = [self._call(call) for call in calls]
+        return web.json_response(responses if isinstance(body, list) else responses[0])
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def handle_payment(self, request: web.Request) -> web.Response:
+        payment = await request.json()
+        signature = self.ledger.add_payment(
+            payment["sender"], payment["recipient"], float(payment["amount"]), payment["mint"],
+            payment.get("addresses", [])
+        )
+        return web.json_response({"signature": signature})
+
+    async def handle_account(self, request: web.Request) -> web.Response:
+        """Change what an address reads as and notify its account subscribers."""
+        change = await request.json()
+        address = change["address"]
+        self.ledger.set_account(address, change.get("lamports"), change.get("token_raw"), change.get("exists", True))
+        notified = 0
+        for subscription, ws in list(self._account_subscriptions.get(address, {}).items()):
+            if await self._notify(ws, "accountNotification", subscription, self._account_value(address, "base64")):
+                notified += 1
+        return web.json_response({"notified": notified})
+
+    async def handle_ws_drop(self, request: web.Request) -> web.Response:
+        options = await request.json() if request.can_read_body else {}
+        refuse = float(options.get("refuse", 0))
+        self._refuse_until = time.monotonic() + refuse
+        dropped = await self.drop_websockets()
+        return web.json_response({"dropped": dropped, "refusing_for": refuse})
+
+    async def drop_websockets(self) -> int:
+        """Close every websocket as a flaky RPC node would. Returns how many were open."""
+        sockets = list(self._sockets)
+        for ws in sockets:
+            await ws.close()
+        if sockets:
+            self._count("ws_dropped")
+        return len(sockets)
+
+    async def _drop_periodically(self):
+        while True:
+            await asyncio.sleep(self.config.ws_drop_every)
+            await self.drop_websockets()
+
+    async def handle_ws(self, request: web.Request) -> web.StreamResponse:
+        if time.monotonic() < self._refuse_until:
+            self._count("ws_refused")
+            return web.Response(status=503, text="Service unavailable")
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        self._count("ws_connections")
+        watchers: Dict[int, asyncio.Task] = {}
+        accounts: Dict[int, str] = {}
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                call = json.loads(msg.data)
+                await self._ws_call(ws, call, watchers, accounts)
+        finally:
+            self._sockets.discard(ws)
+            for task in watchers.values():
+                task.cancel()
+            for subscription, address in accounts.items():
+                self._account_subscriptions.get(address, {}).pop(subscription, None)
+        return ws
+
+    async def _ws_call(self, ws: web.WebSocketResponse, call: dict, watchers: Dict[int, asyncio.Task],
+                       accounts: Dict[int, str]):
+        method = call.get("method", "")
+        params = call.get("params") or []
+        self._count(f"ws:{method}")
+        reply = {"jsonrpc": "2.0", "id": call.get("id")}
+        if method in ("signatureSubscribe", "accountSubscribe"):
+            subscription = self._next_subscription
+            self._next_subscription += 1
+            reply["result"] = subscription
+            await ws.send_json(reply)
+            # Started after the reply so the client knows the id before any notification
+            if method == "signatureSubscribe":
+                commitment = (params[1] if len(params) > 1 else {}).get("commitment", "finalized")
+                watchers[subscription] = asyncio.create_task(
+                    self._watch_signature(ws, subscription, params[0], commitment)
+                )
+            else:
+                accounts[subscription] = params[0]
+                self._account_subscriptions.setdefault(params[0], {})[subscription] = ws
+            return
+        if method == "signatureUnsubscribe":
+            task = watchers.pop(params[0], None)
+            if task:
+                task.cancel()
+            reply["result"] = task is not None
+        elif method == "accountUnsubscribe":
+            address = accounts.pop(params[0], None)
+            if address:
+                self._account_subscriptions.get(address, {}).pop(params[0], None)
+            reply["result"] = address is not None
+        else:
+            reply["error"] = {"code": -32601, "message": f"Method not found: {method}"}
+        await ws.send_json(reply)
+
+    async def _watch_signature(self, ws: web.WebSocketResponse, subscription: int, signature: str, commitment: str):
+        while not ws.closed:
+            status = self.ledger.status(signature)
+            if status and (commitment != "finalized" or status["confirmationStatus"] == "finalized"):
+                await self._notify(ws, "signatureNotification", subscription, {"err": status["err"]})
+                return
+            await asyncio.sleep(WS_STATUS_POLL)
+
+    async def _notify(self, ws: web.WebSocketResponse, method: str, subscription: int, value) -> bool:
+        if ws.closed:
+            return False
+        await ws.send_json({"jsonrpc": "2.0", "method": method, "params": {
+            "result": {"context": self._context(), "value": value}, "subscription": subscription,
+        }})
+        self._count(f"ws:{method}")
+        return True
+
+    def _call(self, call: dict) -> dict:
+        method = call.get("method", "")
+        params = call.get("params") or []
+        self._count(method)
+        reply = {"jsonrpc": "2.0", "id": call.get("id")}
+        if random.random() < self.config.error_rate:
+            self._count("injected_errors")
+            reply["error"] = {"code": -32603, "message": "Internal error (injected)"}
+            return reply
+        handler = getattr(self, f"_rpc_{method}", None)
+        if handler is None:
+            reply["error"] = {"code": -32601, "message": f"Method not found: {method}"}
+            return reply
+        try:
+            reply["result"] = handler(*params)
+        except Exception as e:
+            reply["error"] = {"code": -32602, "message": f"Invalid params: {e}"}
+        return reply
+
+    def _context(self) -> dict:
+        return {"slot": self.ledger.block_height() + SLOT_OFFSET}
+
+    def _account_value(self, address: str, encoding: str) -> Optional[dict]:
+        account = self.ledger.account(address)
+        if account is None:
+            return None
+        if encoding == "jsonParsed":
+            data = {"program": "spl-token", "space": TOKEN_ACCOUNT_SIZE,
+                    "parsed": {"type": "account", "info": {"owner": address, "state": "initialized",
+                                                           "tokenAmount": _ui(account['token_raw'])}}}
+        else:
+            data = [_token_account_data(account['token_raw']), "base64"]
+        return {"data": data, "executable": False, "lamports": account['lamports'],
+                "owner": TOKEN_PROGRAM_ID_STR, "rentEpoch": 0, "space": TOKEN_ACCOUNT_SIZE}
+
+    def _rpc_getBalance(self, address: str, options: dict = None):
+        account = self.ledger.account(address)
+        return {"context": self._context(), "value": account['lamports'] if account else 0}
+
+    def _rpc_getTokenAccountBalance(self, address: str, options: dict = None):
+        account = self.ledger.account(address)
+        if account is None:
+            raise ValueError("could not find account")
+        return {"context": self._context(), "value": _ui(account['token_raw'])}
+
+    def _rpc_getAccountInfo(self, address: str, options: dict = None):
+        encoding = (options or {}).get("encoding", "base64")
+        return {"context": self._context(), "value": self._account_value(address, encoding)}
+
+    def _rpc_getMultipleAccounts(self, addresses: list, options: dict = None):
+        encoding = (options or {}).get("encoding", "base64")
+        return {"context": self._context(), "value": [self._account_value(a, encoding) for a in addresses]}
+
+    def _rpc_getLatestBlockhash(self, options: dict = None):
+        height = self.ledger.block_height()
+        blockhash = str(Hash(os.urandom(32)))
+        return {"context": self._context(),
+                "value": {"blockhash": blockhash, "lastValidBlockHeight": height + BLOCKHASH_VALIDITY}}
+
+    def _rpc_getBlockHeight(self, options: dict = None):
+        return self.ledger.block_height()
+
+    def _rpc_getRecentPrioritizationFees(self, accounts: list = None):
+        slot = self.ledger.block_height() + SLOT_OFFSET
+        return [{"slot": slot - i, "prioritizationFee": random.choice([0, 1_000, 5_000, 20_000])} for i in range(150)]
+
+    def _rpc_simulateTransaction(self, tx_base64: str, options: dict = None):
+        VersionedTransaction.from_bytes(base64.b64decode(tx_base64))
+        err = None
+        if random.random() < self.config.simulation_failure_rate:
+            err = {"InstructionError": [2, {"Custom": 1}]}
+        units = None if err else self.config.units_consumed
+        return {"context": self._context(), "value": {"err": err, "logs": [], "accounts": None, "unitsConsumed": units}}
+
+    def _rpc_sendTransaction(self, tx_base64: str, options: dict = None):
+        return self.ledger.submit(tx_base64)
+
+    def _rpc_getSignatureStatuses(self, signatures: list, options: dict = None):
+        return {"context": self._context(), "value": [self.ledger.status(s) for s in signatures]}
+
+    def _rpc_getTransaction(self, signature: str, options: dict = None):
+        status = self.ledger.status(signature)
+        wanted = (options or {}).get("commitment", "finalized")
+        if status is None or (wanted == "finalized" and status["confirmationStatus"] != "finalized"):
+            return None
+        record = self.ledger.transactions[signature]
+        pre, post = [], []
+        for index, (owner, mint, pre_raw, post_raw) in enumerate(record.balances):
+            pre.append({"accountIndex": index, "mint": mint, "owner": owner, "uiTokenAmount": _ui(pre_raw)})
+            post.append({"accountIndex": index, "mint": mint, "owner": owner, "uiTokenAmount": _ui(post_raw)})
+        return {
+            "slot": record.slot,
+            "blockTime": record.block_time,
+            "meta": {"err": record.err, "fee": 5000, "innerInstructions": [],
+                     "preTokenBalances": pre, "postTokenBalances": post},
+            "transaction": {"signatures": [signature], "message": {"instructions": []}},
+            "version": 0,
+        }
+
+    def _rpc_getSignaturesForAddress(self, address: str, options: dict = None):
+        options = options or {}
+        limit = min(int(options.get("limit", 1000)), 1000)
+        before, until = options.get("before"), options.get("until")
+        finalized_only = options.get("commitment") == "finalized"
+        entries = []
+        started = before is None
+        for signature in reversed(self.ledger.by_address.get(address, [])):
+            if not started:
+                started = signature == before
+                continue
+            if signature == until:
+                break
+            status = self.ledger.status(signature)
+            if status is None or (finalized_only and status["confirmationStatus"] != "finalized"):
+                continue
+            record = self.ledger.transactions[signature]
+            entries.append({"signature": signature, "slot": record.slot, "err": record.err, "memo": None,
+                            "blockTime": record.block_time, "confirmationStatus": status["confirmationStatus"]})
+            if len(entries) >= limit:
+                break
+        return entries
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _bench(args, config: FakeRpcConfig):
+    """Run payouts and withdrawals through the real send paths against an in-process fake."""
+    from solders.keypair import Keypair
+
+    server = FakeRpcServer(config)
+    url = await server.start(port=args.port)
+    main_keypair = Keypair()
+    os.environ['SOLANA_RPC_URL'] = url
+    os.environ.setdefault('FAPCOIN_MINT', str(Keypair().pubkey()))
+    os.environ['MAIN_WALLET_ADDRESS'] = str(main_keypair.pubkey())
+    os.environ['MAIN_WALLET_PRIVATE_KEY'] = str(main_keypair)
+    os.environ.pop('MAIN_WALLET_KEY_FILE', None)
+
+    # Imported only now: wallet.py reads FAPCOIN_MINT at import time
+    from src.utils.payouts import get_payout_batcher
+    from src.utils.rpc import close_http_session, get_limiter
+    from src.utils.wallet import send_fapcoin
+
+    async def timed(coro, latencies: list, outcomes: dict):
+        started = time.perf_counter()
+        success, _, error = await coro
+        latencies.append(time.perf_counter() - started)
+        key = "ok" if success else (error or "failed")[:60]
+        outcomes[key] = outcomes.get(key, 0) + 1
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(coro, latencies: list, outcomes: dict):
+        async with semaphore:
+            await timed(coro, latencies, outcomes)
+
+    for name, count, make in (
+        ("payouts", args.payouts, lambda: get_payout_batcher().pay(str(Keypair().pubkey()), 1.0, label="bench")),
+        ("withdrawals", args.withdrawals, lambda: send_fapcoin(str(Keypair().pubkey()), 1.0)),
+    ):
+        if not count:
+            continue
+        latencies, outcomes = [], {}
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(make(), latencies, outcomes) for _ in range(count)))
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {count} in {elapsed:.1f}s ({count / elapsed:.1f}/s) "
+              f"p50 {_percentile(latencies, 0.5):.2f}s p99 {_percentile(latencies, 0.99):.2f}s")
+        for outcome, n in sorted(outcomes.items(), key=lambda item: -item[1]):
+            print(f"  {n:5d}  {outcome}")
+
+    print(f"server: {server.stats}")
+    print(f"client limiter: {get_limiter().stats}")
+    await close_http_session()
+    await server.stop()
+
+
+async def _serve(args, config: FakeRpcConfig):
+    server = FakeRpcServer(config)
+    url = await server.start(args.host, args.port)
+    print(f"Fake Solana RPC listening on {url} (websocket {server.ws_url})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(f"server: {server.stats}")
+        await server.stop()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog="python -m src.utils.fake_rpc", description=__doc__.split("\n\n")[0])
+    parser.add_argument("mode", choices=["serve", "bench"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency", default="fixed:0", help="e.g. lognormal:80:0.5 (ms)")
+    parser.add_argument("--method-latency", action="append", default=[], metavar="METHOD=SPEC")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="JSON-RPC internal errors")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="random HTTP 429 share")
+    parser.add_argument("--server-errors", type=float, default=0.0, help="random HTTP 503 share")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="429 above this request rate")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--confirm-delay", default="uniform:400:1500")
+    parser.add_argument("--finalize-after", type=float, default=13.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="sent transactions that never land")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="landed transactions that fail")
+    parser.add_argument("--simulation-failures", type=float, default=0.0)
+    parser.add_argument("--missing-accounts", type=float, default=0.0)
+    parser.add_argument("--blocks-per-second", type=float, default=2.5)
+    parser.add_argument("--ws-drop-every", type=float, default=0.0, help="close every websocket this often (s)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--payouts", type=int, default=100)
+    parser.add_argument("--withdrawals", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    config = FakeRpcConfig(
+        latency=args.latency,
+        method_latency=dict(item.split("=", 1) for item in args.method_latency),
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit, server_error_rate=args.server_errors,
+        max_rps=args.max_rps, retry_after=args.retry_after, confirm_delay=args.confirm_delay,
+        finalize_after=args.finalize_after, drop_rate=args.drop_rate, failure_rate=args.failure_rate,
+        simulation_failure_rate=args.simulation_failures, missing_account_rate=args.missing_accounts,
+        blocks_per_second=args.blocks_per_second, ws_drop_every=args.ws_drop_every, seed=args.seed,
+    )
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    runner = _bench if args.mode == "bench" else _serve
+    try:
+        asyncio.run(runner(args, config))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import time
+import base64
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.rpc import rpc_request
+
+logger = logging.getLogger(__name__)
+
+FEE_PERCENTILE = 75
+FEE_CACHE_TTL = 10.0
+MIN_PRIORITY_FEE = 1_000  # micro-lamports per CU
+MAX_PRIORITY_FEE = 2_000_000
+MAX_FEE_ACCOUNTS = 128  # getRecentPrioritizationFees accepts at most 128 accounts
+SIMULATION_UNIT_LIMIT = 1_400_000
+UNIT_HEADROOM = 1.15
+UNIT_HEADROOM_MIN = 1_000
+
+
+class FeeOracle:
+    """Priority fee from recent fees paid for writes to the accounts we touch.
+
+    Samples getRecentPrioritizationFees, takes the FEE_PERCENTILE of the last ~150 slots,
+    clamps it and caches it for FEE_CACHE_TTL seconds per account set.
+    """
+
+    def __init__(self, percentile: int = FEE_PERCENTILE, ttl: float = FEE_CACHE_TTL):
+        self.percentile = percentile
+        self.ttl = ttl
+        self._cache: Dict[Tuple[str, ...], Tuple[float, int]] = {}
+
+    async def get_priority_fee(self, accounts: Iterable[str]) -> int:
+        from src.utils.wallet import PRIORITY_FEE_MICRO_LAMPORTS
+
+        key = tuple(sorted(set(accounts)))[:MAX_FEE_ACCOUNTS]
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and now - cached[0] < self.ttl:
+            return cached[1]
+
+        try:
+            result = await rpc_request("getRecentPrioritizationFees", [list(key)])
+            samples = sorted(entry.get("prioritizationFee", 0) for entry in result.get("result") or [])
+        except Exception as e:
+            logger.warning(f"getRecentPrioritizationFees failed: {e}")
+            samples = []
+
+        if samples:
+            index = min(len(samples) - 1, len(samples) * self.percentile // 100)
+            fee = max(MIN_PRIORITY_FEE, min(MAX_PRIORITY_FEE, samples[index]))
+        else:
+            fee = cached[1] if cached else PRIORITY_FEE_MICRO_LAMPORTS
+
+        for stale in [k for k, (at, _) in self._cache.items() if now - at >= self.ttl]:
+            del self._cache[stale]
+        self._cache[key] = (now, fee)
+        return fee
+
+
+def compute_unit_limit(units_consumed: int) -> int:
+    """CU limit for a transaction that used units_consumed in simulation, plus headroom."""
+    return min(SIMULATION_UNIT_LIMIT, int(units_consumed * UNIT_HEADROOM) + UNIT_HEADROOM_MIN)
+
+
+async def prepare_transaction(instructions: List, payer, signers: List, blockhash,
+                              writable_accounts: Iterable[str] = ()) -> Tuple[Optional[object], Optional[str]]:
+    """Add a compute budget sized from simulation and priced by the fee oracle, then sign.
+
+    instructions must not include compute budget instructions. A draft with the maximum
+    CU limit is simulated; the final transaction uses the simulated unitsConsumed plus
+    headroom. Returns (signed_transaction, None) or (None, simulation_error).
+    """
+    from src.utils.tx_builder import build_transaction, compute_budget_instructions
+
+    micro_lamports = await get_fee_oracle().get_priority_fee(writable_accounts)
+
+    async def build(unit_limit: int):
+        budget = compute_budget_instructions(unit_limit=unit_limit, micro_lamports=micro_lamports)
+        return await build_transaction(budget + list(instructions), payer, signers, blockhash)
+
+    draft = await build(SIMULATION_UNIT_LIMIT)
+    tx_base64 = base64.b64encode(bytes(draft)).decode('utf-8')
+    sim_result = await rpc_request(
+        "simulateTransaction", [tx_base64, {"encoding": "base64", "commitment": "confirmed"}]
+    )
+    if "error" in sim_result:
+        return None, f"Simulation error: {sim_result['error']}"
+    sim_value = sim_result.get("result", {}).get("value", {})
+    if sim_value.get("err"):
+        return None, f"Simulation failed: {sim_value['err']}"
+
+    units_consumed = sim_value.get("unitsConsumed")
+    if not units_consumed:
+        return draft, None
+    return await build(compute_unit_limit(units_consumed)), None
+
+
+_oracle: Optional[FeeOracle] = None
+
+
+def get_fee_oracle() -> FeeOracle:
+    global _oracle
+    if _oracle is None:
+        _oracle = FeeOracle()
+    return _oracle
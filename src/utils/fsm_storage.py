@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional, Set
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StorageKey, StateType
+
+logger = logging.getLogger(__name__)
+
+FSM_STORAGE = os.environ.get('FSM_STORAGE', '')  # memory or postgres; default depends on WEBHOOK_URL
+FSM_TTL = int(os.environ.get('FSM_TTL', '900'))  # an abandoned flow is forgotten after this many seconds
+MEMORY_MAX_KEYS = 50_000
+ACTIVE_KEYS_REFRESH = float(os.environ.get('FSM_ACTIVE_REFRESH', '2'))  # seconds between active key reloads
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class MemoryTTLStorage(BaseStorage):
+    """In-process FSM storage with TTL eviction, for a single instance.
+
+    Every write pushes a key's expiry back by ttl; expired keys read as empty and are
+    dropped on later writes. At most max_keys keys are kept, oldest written first out.
+    """
+
+    def __init__(self, ttl: float = FSM_TTL, max_keys: int = MEMORY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._records: "OrderedDict[StorageKey, list]" = OrderedDict()  # key -> [state, data, expires]
+
+    def _get(self, key: StorageKey) -> Optional[list]:
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if record[2] <= time.monotonic():
+            del self._records[key]
+            return None
+        return record
+
+    def _put(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        self._records.pop(key, None)
+        if state is None and not data:
+            return
+        now = time.monotonic()
+        self._records[key] = [state, data, now + self.ttl]
+        # Records are in write order with the same ttl, so expired ones sit at the front
+        while self._records:
+            oldest_key, oldest = next(iter(self._records.items()))
+            if oldest[2] > now and len(self._records) <= self.max_keys:
+                break
+            del self._records[oldest_key]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._get(key)
+        self._put(key, _state_name(state), record[1] if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = self._get(key)
+        self._put(key, record[0] if record else None, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        return dict(record[1]) if record else {}
+
+    async def take(self, key: StorageKey, state: StateType) -> Optional[Dict[str, Any]]:
+        record = self._get(key)
+        if record is None or record[0] != _state_name(state):
+            return None
+        del self._records[key]
+        return dict(record[1])
+
+    async def close(self) -> None:
+        self._records.clear()
+
+
+class PostgresStorage(BaseStorage):
+    """FSM storage in the fsm_states table, so any replica can continue a flow.
+
+    Records carry an expires_at that every write pushes back by ttl; expired records
+    read as empty and cleanup() deletes them (scheduled every 15 minutes).
+
+    aiogram reads the state of every update before any filter runs, so reads go through
+    a local set of keys with an active flow, reloaded in one query every refresh seconds
+    and updated at once by this replica's own writes. Keys outside it read as empty
+    without a query; a flow started on another replica is seen here within refresh seconds.
+    """
+
+    def __init__(self, ttl: float = FSM_TTL, refresh: float = ACTIVE_KEYS_REFRESH):
+        self.ttl = ttl
+        self.refresh = refresh
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.stats = {'skipped': 0, 'read': 0}
+        self._active: Set[str] = set()
+        self._written: Dict[str, float] = {}  # keys this replica wrote -> when
+        self._refresh_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+    def _key(self, key: StorageKey) -> str:
+        return self.key_builder.build(key)
+
+    def _mark(self, key: str, active: bool):
+        self._written[key] = time.monotonic()
+        if active:
+            self._active.add(key)
+        else:
+            self._active.discard(key)
+
+    async def _is_active(self, key: str) -> bool:
+        if time.monotonic() >= self._refresh_at:
+            async with self._refresh_lock:
+                if time.monotonic() >= self._refresh_at:
+                    await self._reload_active()
+        return key in self._active
+
+    async def _reload_active(self):
+        from src.database import db
+        started = time.monotonic()
+        active = set(await db.get_active_fsm_keys())
+        # Keep what this replica wrote while the query ran; the result may predate it
+        for key, at in self._written.items():
+            if at >= started:
+                if key in self._active:
+                    active.add(key)
+                else:
+                    active.discard(key)
+        self._active = active
+        self._written = {key: at for key, at in self._written.items() if at >= started}
+        self._refresh_at = started + self.refresh
+
+    def _expires_at(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.ttl)
+
+    async def _record(self, key: StorageKey):
+        from src.database import db
+        key = self._key(key)
+        if not await self._is_active(key):
+            self.stats['skipped'] += 1
+            return None, None
+        self.stats['read'] += 1
+        return await db.get_fsm_record(key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        from src.database import db
+        state = _state_name(state)
+        if state is None and not await self.get_data(key):
+            await db.delete_fsm_record(self._key(key))
+            self._mark(self._key(key), False)
+            return
+        await db.set_fsm_field(self._key(key), 'state', state, self._expires_at())
+        self._mark(self._key(key), True)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._record(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        from src.database import db
+        if not data and await self.get_state(key) is None:
+            await db.delete_fsm_record(self._key(key))
+            self._mark(self._key(key), False)
+            return
+        await db.set_fsm_field(self._key(key), 'data', json.dumps(dict(data)), self._expires_at())
+        self._mark(self._key(key), True)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._record(key)
+        return json.loads(data) if data else {}
+
+    async def take(self, key: StorageKey, state: StateType) -> Optional[Dict[str, Any]]:
+        from src.database import db
+        data = await db.take_fsm_record(self._key(key), _state_name(state))
+        if data is not None:
+            self._mark(self._key(key), False)
+        return json.loads(data) if data is not None else None
+
+    async def cleanup(self):
+        from src.database import db
+        removed = await db.delete_expired_fsm_records()
+        if removed:
+            logger.info(f"Removed {removed} expired FSM records")
+
+    async def close(self) -> None:
+        pass
+
+
+async def take_state(context: FSMContext, state: StateType) -> Optional[Dict[str, Any]]:
+    """Clear context and return its data if it is in state, else None.
+
+    The check and the clear are one step, so when the same button is tapped twice and both
+    taps are handled at once (on one replica or two) only one of them gets the data.
+    """
+    return await context.storage.take(context.key, state)
+
+
+def create_fsm_storage(multi_instance: bool) -> BaseStorage:
+    """FSM_STORAGE if set, else Postgres when several instances may share updates and memory otherwise."""
+    kind = FSM_STORAGE or ('postgres' if multi_instance else 'memory')
+    if kind == 'postgres':
+        storage = PostgresStorage()
+    elif kind == 'memory':
+        storage = MemoryTTLStorage()
+    else:
+        raise ValueError(f"Unknown FSM_STORAGE: {kind}")
+    logger.info(f"FSM storage: {kind} (ttl {FSM_TTL}s)")
+    return storage
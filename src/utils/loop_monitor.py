@@ -0,0 +1,65 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.25
+SAMPLE_WINDOW = 240  # one minute of samples
+LAG_WARN_THRESHOLD = 0.1
+LAG_WARN_EVERY = 60.0
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task.
+
+    Anything that blocks the loop (sync crypto, heavy parsing) shows up as lag; the
+    last minute of samples is kept for /perf and long stalls are logged.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, window: int = SAMPLE_WINDOW):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._warned_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > LAG_WARN_THRESHOLD and time.monotonic() - self._warned_at > LAG_WARN_EVERY:
+                self._warned_at = time.monotonic()
+                logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms")
+
+    def stats(self) -> dict:
+        """Lag over the sample window in milliseconds: last, mean, p99 and max, plus the all-time max."""
+        if not self.samples:
+            return {'last': 0.0, 'mean': 0.0, 'p99': 0.0, 'max': 0.0, 'max_ever': self.max_lag * 1000}
+        ordered = sorted(self.samples)
+        return {
+            'last': self.samples[-1] * 1000,
+            'mean': sum(ordered) / len(ordered) * 1000,
+            'p99': ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] * 1000,
+            'max': ordered[-1] * 1000,
+            'max_ever': self.max_lag * 1000,
+        }
+
+
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor()
+    return _monitor
@@ -0,0 +1,225 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from solders.pubkey import Pubkey
+
+from src.utils.rpc import rpc_batch, rpc_request
+
+logger = logging.getLogger(__name__)
+
+INDEX_INTERVAL = 20.0
+SIGNATURE_PAGE = 1000  # getSignaturesForAddress returns at most 1000 per call
+TRANSACTION_BATCH = 50
+INITIAL_BACKFILL = 100  # signatures read on the very first run, before there is a cursor
+REFERENCE_BATCH = 100
+REFERENCE_SIGNATURE_LIMIT = 5
+PURCHASE_MATCH_WINDOW = timedelta(hours=2)
+MAX_SIGNATURE_ATTEMPTS = 5  # polls a transaction may fail to load before the cursor moves past it
+CURSOR_SETTING = 'payment_indexer_cursor'
+
+
+class PaymentIndexer:
+    """Background indexer of FAPCOIN paid into the team wallet.
+
+    Purchases paid through their Solana Pay link are found directly: one batched
+    getSignaturesForAddress per open reference key. Other payments are found by tailing
+    getSignaturesForAddress on the team wallet's token account from a cursor kept in
+    bot_settings, and matched to pending purchases by amount, sender and time window.
+    Transactions are fetched in JSON-RPC batches, purchases confirmed in bulk and buyers
+    notified in the group they bought in. A pasted tx hash only looks up the recorded
+    payment and wakes the indexer. Polls run on one replica at a time (advisory lock);
+    a replica woken while another is polling skips, since that poll covers it.
+
+    A transaction that can't be loaded holds the cursor so it is retried, but only for
+    MAX_SIGNATURE_ATTEMPTS polls: after that (unsupported version, history pruned on the
+    node) it is logged and skipped without a payment record, so the tail never stalls.
+    """
+
+    def __init__(self, interval: float = INDEX_INTERVAL):
+        self.interval = interval
+        self.bot = None
+        self.skipped = 0
+        self._failures: Dict[str, int] = {}  # signature -> polls it failed to load in
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, bot):
+        self.bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Poll now instead of at the next interval, e.g. after a user pasted a hash."""
+        self._wake.set()
+
+    async def _run(self):
+        from src.utils.scheduler import run_exclusive
+
+        while True:
+            try:
+                await run_exclusive("payment_indexer", self.poll)
+            except Exception as e:
+                logger.error(f"Payment indexer poll failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def poll(self) -> int:
+        """Index new payments and confirm the purchases they match. Returns purchases confirmed."""
+        from src.database import db
+        from src.utils.wallet import FAPCOIN_MINT, get_associated_token_address, validate_solana_address
+
+        team_wallet = await db.get_team_wallet() or os.environ.get('TEAM_WALLET_ADDRESS', '')
+        if not FAPCOIN_MINT or not validate_solana_address(team_wallet):
+            return 0
+
+        matches = await self._confirm_references(team_wallet, FAPCOIN_MINT)
+
+        token_account = str(get_associated_token_address(Pubkey.from_string(team_wallet)))
+        cursor_key = f"{CURSOR_SETTING}:{token_account}"
+        cursor = await db.get_setting(cursor_key)
+
+        entries = await self._new_signatures(token_account, cursor)
+        for i in range(0, len(entries), TRANSACTION_BATCH):
+            chunk = entries[i:i + TRANSACTION_BATCH]
+            indexed, payments = await self._index(chunk, team_wallet, FAPCOIN_MINT)
+            await db.record_incoming_payments(payments)
+            if indexed:
+                await db.set_setting(cursor_key, chunk[indexed - 1]["signature"])
+            if indexed < len(chunk):
+                break  # retry the rest from the cursor on the next poll
+
+        matches += await db.match_incoming_payments(PURCHASE_MATCH_WINDOW)
+        for match in matches:
+            await self._notify(match)
+        if matches:
+            logger.info(f"Payment indexer confirmed {len(matches)} purchases")
+        return len(matches)
+
+    async def _confirm_references(self, team_wallet: str, mint: str) -> List[dict]:
+        """Confirm open purchase intents whose reference key shows up in a payment."""
+        from src.database import db
+        from src.utils.tx_cache import get_transaction_cache
+
+        intents = await db.get_open_purchase_references(PURCHASE_MATCH_WINDOW)
+        matches = []
+        for i in range(0, len(intents), REFERENCE_BATCH):
+            chunk = intents[i:i + REFERENCE_BATCH]
+            responses = await rpc_batch([
+                ("getSignaturesForAddress", [reference, {"limit": REFERENCE_SIGNATURE_LIMIT, "commitment": "finalized"}])
+                for _, reference, _ in chunk
+            ])
+            found = {}
+            for (row_id, _, _), response in zip(chunk, responses):
+                entries = [e for e in reversed(response.get("result") or []) if e.get("err") is None]
+                if entries:
+                    found[row_id] = entries
+            if not found:
+                continue
+
+            summaries = await get_transaction_cache().get_summaries(
+                [entry["signature"] for entries in found.values() for entry in entries]
+            )
+            payments = []
+            for row_id, _, amount_paid in chunk:
+                for entry in found.get(row_id, []):
+                    summary = summaries.get(entry["signature"])
+                    payment = _payment_from(summary, entry, team_wallet, mint) if summary else None
+                    if payment and payment['amount'] >= amount_paid * 0.99:
+                        payment['transaction_row_id'] = row_id
+                        payments.append(payment)
+                        break
+            matches += await db.confirm_reference_payments(payments)
+        return matches
+
+    async def _new_signatures(self, token_account: str, cursor: Optional[str]) -> List[dict]:
+        """Signatures after the cursor, oldest first."""
+        options = {"limit": SIGNATURE_PAGE if cursor else INITIAL_BACKFILL, "commitment": "finalized"}
+        if cursor:
+            options["until"] = cursor
+        entries = []
+        while True:
+            result = await rpc_request("getSignaturesForAddress", [token_account, dict(options)])
+            if "error" in result:
+                raise RuntimeError(f"getSignaturesForAddress: {result['error']}")
+            page = result.get("result") or []
+            entries.extend(page)
+            if not cursor or len(page) < options["limit"]:
+                break
+            options["before"] = page[-1]["signature"]
+        entries.reverse()
+        return entries
+
+    async def _index(self, chunk: List[dict], team_wallet: str, mint: str):
+        """Returns (number of leading entries fully handled, incoming payments among them)."""
+        from src.utils.tx_cache import get_transaction_cache
+
+        wanted = [entry["signature"] for entry in chunk if entry.get("err") is None]
+        summaries = await get_transaction_cache().get_summaries(wanted)
+
+        payments = []
+        for index, entry in enumerate(chunk):
+            if entry.get("err") is not None:
+                continue
+            signature = entry["signature"]
+            summary = summaries.get(signature)
+            if summary is None:
+                attempts = self._failures.get(signature, 0) + 1
+                if attempts < MAX_SIGNATURE_ATTEMPTS:
+                    self._failures = {signature: attempts}  # only the one holding the cursor
+                    return index, payments
+                self._failures.pop(signature, None)
+                self.skipped += 1
+                logger.warning(f"Payment indexer skipped {signature}: transaction could not be loaded "
+                               f"in {attempts} polls")
+                continue
+            self._failures.pop(signature, None)
+            payment = _payment_from(summary, entry, team_wallet, mint)
+            if payment:
+                payments.append(payment)
+        return len(chunk), payments
+
+    async def _notify(self, match: dict):
+        if self.bot is None:
+            return
+        try:
+            await self.bot.send_message(
+                match['chat_id'],
+                f"✅ <b>PAYMENT RECEIVED!</b> ✅\n\n"
+                f"<a href=\"tg://user?id={match['telegram_id']}\">Your</a> purchase was confirmed on Solana.\n\n"
+                f"🎉 <b>+{match['growth']} cm added!</b>\n\n"
+                f"Use /top to see your new position on the leaderboard!"
+            )
+        except Exception as e:
+            logger.warning(f"Could not notify {match['telegram_id']} about purchase {match['signature']}: {e}")
+
+
+def _payment_from(summary, entry: dict, team_wallet: str, mint: str) -> Optional[dict]:
+    """IncomingPayment fields if the transaction paid FAPCOIN into the team wallet."""
+    received = sum(delta for owner, m, delta in summary.balance_changes if owner == team_wallet and m == mint)
+    if summary.failed or received <= 0:
+        return None
+    spent = [(delta, owner) for owner, m, delta in summary.balance_changes
+             if m == mint and owner != team_wallet and delta < 0]
+    block_time = entry.get("blockTime")
+    return {
+        'signature': entry["signature"],
+        'sender': min(spent)[1] if spent else None,
+        'amount': received,
+        'block_time': datetime.utcfromtimestamp(block_time) if block_time else datetime.utcnow(),
+    }
+
+
+_indexer: Optional[PaymentIndexer] = None
+
+
+def get_payment_indexer() -> PaymentIndexer:
+    global _indexer
+    if _indexer is None:
+        _indexer = PaymentIndexer()
+    return _indexer
@@ -0,0 +1,368 @@
+import os
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from solders.pubkey import Pubkey
+
+from src.utils.rpc import rpc_request, priority_lane
+
+logger = logging.getLogger(__name__)
+
+BATCH_WINDOW = 2.0
+MAX_TX_SIZE = 1232  # packet limit for a serialized transaction
+MAX_COMPUTE_UNITS = 1_400_000
+TRANSFER_COMPUTE_UNITS = 6_000
+CREATE_ATA_COMPUTE_UNITS = 30_000
+BASE_COMPUTE_UNITS = 10_000
+MAX_ATTEMPTS = 3
+ACCOUNT_LOOKUP_CHUNK = 100
+FEE_SETTLEMENT_MIN = 10.0
+FEE_SETTLEMENT_SCHEDULE = "*/10 * * * *"
+PAYOUT_WORKERS = int(os.environ.get('PAYOUT_WORKERS', '4'))
+PAYOUT_CLAIM_LIMIT = 10
+PAYOUT_IDLE_SLEEP = 5.0
+PAYOUT_RETRY_BASE = 30.0
+PAYOUT_STALE_AFTER = timedelta(minutes=10)
+
+
+class _Payout:
+    __slots__ = ("to_address", "amount", "label", "future", "attempts", "reservation")
+
+    def __init__(self, to_address: str, amount: float, label: Optional[str], future: asyncio.Future):
+        self.to_address = to_address
+        self.amount = amount
+        self.label = label
+        self.future = future
+        self.attempts = 0
+        self.reservation = None
+
+
+class _Recipient:
+    """One destination in a batch; payouts to the same address share a single transfer."""
+    __slots__ = ("owner", "ata", "raw_amount", "payouts", "needs_ata")
+
+    def __init__(self, owner: Pubkey, ata: Pubkey):
+        self.owner = owner
+        self.ata = ata
+        self.raw_amount = 0
+        self.payouts: List[_Payout] = []
+        self.needs_ata = False
+
+
+class PayoutBatcher:
+    """Packs FAPCOIN payouts from the main wallet into as few transactions as possible.
+
+    Payouts submitted within BATCH_WINDOW are grouped; each holds its amount in the
+    balance book, and one blockhash and one account lookup serve the whole batch, and transfer (plus ATA-create)
+    instructions are packed per transaction up to the size and compute limits. All
+    transactions are confirmed together through the shared tracker and every payout
+    resolves to its own (success, tx_signature, error).
+
+    A payout is only retried when its transaction certainly did not land (rejected
+    before sending, or expired blockhash), so a slow confirmation can never pay twice.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW):
+        self.window = window
+        self._queue: List[_Payout] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def submit(self, to_address: str, amount: float, label: str = None) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(_Payout(to_address, amount, label, future))
+        return future
+
+    async def pay(self, to_address: str, amount: float, label: str = None) -> Tuple[bool, Optional[str], Optional[str]]:
+        """Queue a payout and wait for it. Returns: (success, tx_signature, error_message)"""
+        return await self.submit(to_address, amount, label)
+
+    def _enqueue(self, payout: _Payout):
+        self._queue.append(payout)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        batch, self._queue = self._queue, []
+        try:
+            with priority_lane():
+                await self._process(batch)
+        except Exception as e:
+            logger.error(f"Payout batch failed: {e}")
+            for payout in batch:
+                self._finish(payout, False, None, str(e))
+        if self._queue:
+            # Retries and payouts submitted while this batch was in flight
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    def _finish(self, payout: _Payout, success: bool, tx_signature: Optional[str], error: Optional[str]):
+        self._settle(payout, spent=success or tx_signature is not None)
+        if payout.future.done():
+            return
+        payout.future.set_result((success, tx_signature, error))
+        label = f"{payout.label} " if payout.label else ""
+        if success:
+            logger.info(f"Payout {label}{payout.amount} FAPCOIN to {payout.to_address} confirmed: {tx_signature}")
+        else:
+            logger.error(f"Payout {label}{payout.amount} FAPCOIN to {payout.to_address} failed: {error}")
+
+    def _settle(self, payout: _Payout, spent: bool):
+        if payout.reservation is not None:
+            from src.utils.balance_book import get_balance_book
+            get_balance_book().settle(payout.reservation, spent)
+            payout.reservation = None
+
+    def _retry_or_fail(self, payouts: List[_Payout], error: str):
+        for payout in payouts:
+            payout.attempts += 1
+            if payout.attempts < MAX_ATTEMPTS:
+                # Not sent; the next batch reserves again
+                self._settle(payout, spent=False)
+                self._queue.append(payout)
+            else:
+                self._finish(payout, False, None, error)
+
+    async def _process(self, batch: List[_Payout]):
+        from src.utils.balance_book import get_balance_book
+        from src.utils.wallet import (
+            FAPCOIN_DECIMALS, get_main_wallet_context, get_associated_token_address, validate_solana_address
+        )
+
+        main_wallet = get_main_wallet_context()
+        if not main_wallet or not main_wallet.mint:
+            for payout in batch:
+                self._finish(payout, False, None, "Main wallet or FAPCOIN_MINT not configured")
+            return
+
+        book = get_balance_book()
+        recipients: Dict[str, _Recipient] = {}
+        for payout in batch:
+            if payout.amount <= 0 or not validate_solana_address(payout.to_address):
+                self._finish(payout, False, None, "Invalid destination address or amount")
+                continue
+            payout.reservation, error = await book.reserve(main_wallet, payout.amount)
+            if payout.reservation is None:
+                self._finish(payout, False, None, error)
+                continue
+            recipient = recipients.get(payout.to_address)
+            if recipient is None:
+                owner = Pubkey.from_string(payout.to_address)
+                recipient = _Recipient(owner, get_associated_token_address(owner, main_wallet.mint))
+                recipients[payout.to_address] = recipient
+            recipient.raw_amount += int(round(payout.amount * (10 ** FAPCOIN_DECIMALS)))
+            recipient.payouts.append(payout)
+
+        if not recipients:
+            return
+
+        result = await rpc_request("getLatestBlockhash", [{"commitment": "confirmed"}])
+        if "error" in result:
+            self._retry_or_fail([p for r in recipients.values() for p in r.payouts],
+                                f"RPC error getting blockhash: {result['error']}")
+            return
+        blockhash_str = result["result"]["value"]["blockhash"]
+        last_valid_block = result["result"]["value"]["lastValidBlockHeight"]
+
+        await self._mark_missing_atas(list(recipients.values()))
+
+        from solders.hash import Hash
+        blockhash = Hash.from_string(blockhash_str)
+
+        from src.utils.tx_builder import get_lookup_tables
+        lookup_tables = await get_lookup_tables().load()
+
+        transactions = self._pack(main_wallet, list(recipients.values()), blockhash, lookup_tables)
+        logger.info(f"Payout batch: {len(batch)} payouts, {len(recipients)} recipients, {len(transactions)} transactions")
+
+        outcomes = await asyncio.gather(*[
+            self._send(main_wallet, instructions, group, blockhash, last_valid_block)
+            for instructions, group in transactions
+        ])
+
+        for (_, group), (status, tx_signature, error) in zip(transactions, outcomes):
+            payouts = [p for r in group for p in r.payouts]
+            if status in ["confirmed", "finalized"]:
+                for payout in payouts:
+                    self._finish(payout, True, tx_signature, None)
+            elif status in ["rejected", "expired"]:
+                # Provably not landed, safe to rebuild in a later batch
+                self._retry_or_fail(payouts, error)
+            else:
+                for payout in payouts:
+                    self._finish(payout, False, tx_signature, error)
+
+    async def _mark_missing_atas(self, recipients: List[_Recipient]):
+        for i in range(0, len(recipients), ACCOUNT_LOOKUP_CHUNK):
+            chunk = recipients[i:i + ACCOUNT_LOOKUP_CHUNK]
+            result = await rpc_request(
+                "getMultipleAccounts",
+                [[str(r.ata) for r in chunk], {"encoding": "base64", "commitment": "confirmed"}]
+            )
+            values = (result.get("result") or {}).get("value")
+            for index, recipient in enumerate(chunk):
+                # Unknown if the lookup failed; the idempotent create is harmless either way
+                recipient.needs_ata = values is None or values[index] is None
+
+    def _pack(self, main_wallet, recipients: List[_Recipient], blockhash, lookup_tables: list = ()) -> list:
+        """Greedily fill transactions with recipients while they stay under the size and compute limits.
+
+        Returns [(instructions, recipients)]; the compute budget is added when each one is prepared.
+        """
+        from src.utils.tx_builder import Transfer, compute_budget_instructions, transaction_size, transfer_instructions
+
+        def group_instructions(group: List[_Recipient]) -> list:
+            transfers = [Transfer(r.owner, r.ata, r.raw_amount, r.needs_ata) for r in group]
+            return transfer_instructions(main_wallet.pubkey, main_wallet.ata, main_wallet.pubkey, transfers, main_wallet.mint)
+
+        def recipient_units(recipient: _Recipient) -> int:
+            return TRANSFER_COMPUTE_UNITS + (CREATE_ATA_COMPUTE_UNITS if recipient.needs_ata else 0)
+
+        def size(instructions: list) -> int:
+            # Budget values don't change the size, only their presence does
+            return transaction_size(compute_budget_instructions() + instructions, main_wallet.pubkey, blockhash, lookup_tables)
+
+        transactions = []
+        group: List[_Recipient] = []
+        for recipient in recipients:
+            candidate = group + [recipient]
+            units = BASE_COMPUTE_UNITS + sum(recipient_units(r) for r in candidate)
+            if group and (units > MAX_COMPUTE_UNITS or size(group_instructions(candidate)) > MAX_TX_SIZE):
+                transactions.append((group_instructions(group), group))
+                group = [recipient]
+            else:
+                group = candidate
+        if group:
+            transactions.append((group_instructions(group), group))
+        return transactions
+
+    async def _send(self, main_wallet, instructions: list, group: List[_Recipient], blockhash,
+                    last_valid_block: int) -> Tuple[str, Optional[str], Optional[str]]:
+        """Size, price and sign one transaction, then broadcast it until it lands or expires.
+
+        Returns (status, tx_signature, error) as from send_and_confirm; a simulation that
+        can't run counts as 'rejected', a simulated program error as 'failed'.
+        """
+        from src.utils.fees import prepare_transaction
+        from src.utils.sender import send_and_confirm
+
+        writable = [str(main_wallet.ata)] + [str(r.ata) for r in group]
+        try:
+            tx, sim_error = await prepare_transaction(
+                instructions, main_wallet.pubkey, [main_wallet.keypair], blockhash, writable_accounts=writable
+            )
+        except Exception as e:
+            return "rejected", None, str(e)
+        if tx is None:
+            status = "rejected" if sim_error.startswith("Simulation error") else "failed"
+            return status, None, sim_error
+
+        return await send_and_confirm(tx, last_valid_block)
+
+
+async def settle_fee_accruals(min_amount: float = FEE_SETTLEMENT_MIN) -> Dict[str, float]:
+    """Queue one payout job per destination wallet whose accrued fees reached min_amount.
+
+    The outbox workers pay the jobs; accruals become 'settled', 'unconfirmed' (sent but
+    not confirmed, for a manual check) or 'failed' when their job finishes.
+    """
+    from src.database import db
+
+    settlement_id, totals = await db.claim_fee_accruals(min_amount)
+    if totals:
+        logger.info(f"Fee settlement {settlement_id[:8]}: queued payouts for {len(totals)} wallets")
+    return totals
+
+
+class PayoutWorkerPool:
+    """Bounded pool of workers draining the payout_jobs outbox.
+
+    Each worker claims a few due jobs at a time (FOR UPDATE SKIP LOCKED, so replicas can
+    share the queue) and hands them to the payout batcher, so jobs claimed by different
+    workers still share transactions. Failures that certainly did not send are retried
+    with exponential backoff until max_attempts; a sent-but-unconfirmed payout is never
+    retried automatically.
+    """
+
+    def __init__(self, size: int = PAYOUT_WORKERS, claim_limit: int = PAYOUT_CLAIM_LIMIT):
+        self.size = size
+        self.claim_limit = claim_limit
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.size)]
+        logger.info(f"Payout outbox started with {self.size} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, index: int):
+        from src.database import db
+
+        worker_id = f"{self.worker_id}/{index}"
+        while True:
+            try:
+                jobs = await db.claim_payout_jobs(worker_id, self.claim_limit)
+            except Exception as e:
+                logger.error(f"Payout worker {index} could not claim jobs: {e}")
+                await asyncio.sleep(PAYOUT_IDLE_SLEEP)
+                continue
+            if not jobs:
+                await asyncio.sleep(PAYOUT_IDLE_SLEEP)
+                continue
+            await asyncio.gather(*[self._run_job(job) for job in jobs])
+
+    async def _run_job(self, job):
+        from src.database import db
+
+        try:
+            success, tx_signature, error = await get_payout_batcher().pay(
+                job.to_address, float(job.amount), label=f"job {job.id} ({job.kind})"
+            )
+        except Exception as e:
+            success, tx_signature, error = False, None, str(e)
+
+        next_attempt_at = None
+        if success:
+            status = 'confirmed'
+        elif tx_signature:
+            status = 'unconfirmed'
+        elif job.attempts < job.max_attempts:
+            status = 'pending'
+            delay = PAYOUT_RETRY_BASE * (2 ** (job.attempts - 1))
+            next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        else:
+            status = 'failed'
+
+        try:
+            await db.finish_payout_job(job.id, status, tx_signature, error, next_attempt_at)
+        except Exception as e:
+            logger.error(f"Could not record payout job {job.id} as {status} (tx {tx_signature}): {e}")
+
+
+_batcher: Optional[PayoutBatcher] = None
+
+
+def get_payout_batcher() -> PayoutBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = PayoutBatcher()
+    return _batcher
+
+
+_worker_pool: Optional[PayoutWorkerPool] = None
+
+
+def get_payout_worker_pool() -> PayoutWorkerPool:
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = PayoutWorkerPool()
+    return _worker_pool
@@ -0,0 +1,201 @@
+import time
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from src.utils.rpc import rpc_request
+
+logger = logging.getLogger(__name__)
+
+RECLAIM_SCHEDULE = "30 */6 * * *"
+RECLAIM_PAGE = 100  # getMultipleAccounts accepts at most 100 accounts per call
+RECLAIM_CONCURRENCY = 4
+MAX_TX_SIZE = 1232
+MAX_COMPUTE_UNITS = 1_400_000
+CLOSE_ACCOUNT_COMPUTE_UNITS = 3_000
+BASE_COMPUTE_UNITS = 10_000
+
+
+class _Closable:
+    """One empty token account of a retired wallet, with the keypair that owns it."""
+    __slots__ = ("wallet_id", "ata", "keypair", "lamports")
+
+    def __init__(self, wallet_id: int, ata, keypair, lamports: int):
+        self.wallet_id = wallet_id
+        self.ata = ata
+        self.keypair = keypair
+        self.lamports = lamports
+
+
+class RentReclaimer:
+    """Maintenance job closing the FAPCOIN accounts of deleted burner wallets.
+
+    delete_user_wallet keeps the retired wallet's key in retired_wallets. Each run reads
+    their token accounts with getMultipleAccounts, closes the empty ones with CloseAccount
+    instructions packed many per transaction (main wallet pays the fee and receives the
+    rent) and marks the wallets done. Accounts that never existed are marked done without
+    a transaction; accounts still holding FAPCOIN are left alone. Runs as the rent_reclaim
+    scheduler job (RECLAIM_SCHEDULE) on one replica.
+    """
+
+    def __init__(self):
+        self.totals = {'runs': 0, 'closed': 0, 'lamports': 0, 'transactions': 0, 'failed': 0}
+        self.last_run: Optional[dict] = None
+        self._lock = asyncio.Lock()
+
+    async def reclaim(self) -> dict:
+        """Close every empty retired token account once. Returns this run's metrics."""
+        from src.database import db
+        from src.utils import crypto_executor
+        from src.utils.wallet import get_main_wallet_context
+
+        main_wallet = get_main_wallet_context()
+        if main_wallet is None or main_wallet.mint is None:
+            return {}
+
+        async with self._lock:
+            started = time.perf_counter()
+            run = {'checked': 0, 'closed': 0, 'lamports': 0, 'transactions': 0, 'failed': 0, 'funded': 0}
+            after_id = 0
+            while True:
+                rows = await db.get_open_retired_wallets(after_id, RECLAIM_PAGE)
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                run['checked'] += len(rows)
+
+                atas = await crypto_executor.associated_token_addresses([public_key for _, public_key, _ in rows])
+                accounts = await self._fetch_accounts([str(ata) for ata in atas if ata])
+                missing, empty = [], []
+                for (wallet_id, _, encrypted_key), ata in zip(rows, atas):
+                    value = accounts.get(str(ata)) if ata else None
+                    if value is None:
+                        missing.append((wallet_id, 0))
+                    elif value['amount'] == 0:
+                        empty.append((wallet_id, ata, encrypted_key, value['lamports']))
+                    else:
+                        run['funded'] += 1
+                await db.mark_retired_wallets_closed(missing)
+                if empty:
+                    await self._close(main_wallet, empty, run)
+
+            run['seconds'] = time.perf_counter() - started
+            run['per_second'] = run['closed'] / run['seconds'] if run['seconds'] > 0 else 0.0
+            self.last_run = run
+            self.totals['runs'] += 1
+            for key in ('closed', 'lamports', 'transactions', 'failed'):
+                self.totals[key] += run[key]
+            if run['closed'] or run['failed']:
+                logger.info(f"Rent reclaim: closed {run['closed']} accounts in {run['transactions']} transactions, "
+                            f"{run['lamports'] / 1e9:.4f} SOL recovered, {run['failed']} failed, "
+                            f"{run['per_second']:.1f} accounts/s")
+            return run
+
+    async def _fetch_accounts(self, accounts: List[str]) -> dict:
+        """{account: {'lamports', 'amount'}} for the token accounts that exist."""
+        from src.utils.deposits import decode_token_amount
+
+        if not accounts:
+            return {}
+        result = await rpc_request("getMultipleAccounts", [accounts, {"encoding": "base64", "commitment": "confirmed"}])
+        if "error" in result:
+            raise RuntimeError(f"getMultipleAccounts: {result['error']}")
+        found = {}
+        for account, value in zip(accounts, result.get("result", {}).get("value", [])):
+            if value is None:
+                continue
+            amount = decode_token_amount(value.get("data"))
+            # Unreadable data counts as funded so the account is never closed blindly
+            found[account] = {'lamports': value.get("lamports", 0), 'amount': 1 if amount is None else amount}
+        return found
+
+    async def _close(self, main_wallet, empty: List[tuple], run: dict):
+        from solders.hash import Hash
+        from src.database import db
+        from src.utils.crypto_executor import decrypt_private_keys
+
+        keypairs = await decrypt_private_keys([encrypted_key for _, _, encrypted_key, _ in empty])
+        closables = [
+            _Closable(wallet_id, ata, keypair, lamports)
+            for (wallet_id, ata, _, lamports), keypair in zip(empty, keypairs)
+        ]
+
+        semaphore = asyncio.Semaphore(RECLAIM_CONCURRENCY)
+
+        async def close_group(instructions: list, group: List[_Closable]):
+            async with semaphore:
+                status, tx_signature, error = await self._send(main_wallet, instructions, group)
+            if status in ("confirmed", "finalized"):
+                run['closed'] += len(group)
+                run['lamports'] += sum(c.lamports for c in group)
+                run['transactions'] += 1
+                await db.mark_retired_wallets_closed([(c.wallet_id, c.lamports) for c in group], tx_signature)
+            else:
+                # Left open: the next run sees the accounts closed or still empty and retries
+                run['failed'] += len(group)
+                logger.warning(f"Closing {len(group)} retired token accounts {status}: {error}")
+
+        # Any blockhash gives the right size; each group fetches its own just before sending
+        await asyncio.gather(*(close_group(instructions, group)
+                               for instructions, group in self._pack(main_wallet, closables, Hash.default())))
+
+    def _pack(self, main_wallet, closables: List[_Closable], blockhash) -> list:
+        """Greedily fill transactions with CloseAccount instructions under the size and compute limits.
+
+        Every closed account adds its owner's signature, so size is what usually runs out first.
+        """
+        from src.utils.tx_builder import close_account_instruction, compute_budget_instructions, transaction_size
+
+        def group_instructions(group: List[_Closable]) -> list:
+            return [close_account_instruction(c.ata, main_wallet.pubkey, c.keypair.pubkey()) for c in group]
+
+        def size(instructions: list) -> int:
+            return transaction_size(compute_budget_instructions() + instructions, main_wallet.pubkey, blockhash)
+
+        transactions = []
+        group: List[_Closable] = []
+        for closable in closables:
+            candidate = group + [closable]
+            units = BASE_COMPUTE_UNITS + CLOSE_ACCOUNT_COMPUTE_UNITS * len(candidate)
+            if group and (units > MAX_COMPUTE_UNITS or size(group_instructions(candidate)) > MAX_TX_SIZE):
+                transactions.append((group_instructions(group), group))
+                group = [closable]
+            else:
+                group = candidate
+        if group:
+            transactions.append((group_instructions(group), group))
+        return transactions
+
+    async def _send(self, main_wallet, instructions: list,
+                    group: List[_Closable]) -> Tuple[str, Optional[str], Optional[str]]:
+        from solders.hash import Hash
+        from src.utils.fees import prepare_transaction
+        from src.utils.sender import send_and_confirm
+
+        signers = [main_wallet.keypair] + [c.keypair for c in group]
+        writable = [str(c.ata) for c in group]
+        try:
+            # Fetched per transaction: later groups wait for earlier ones and would start near expiry
+            result = await rpc_request("getLatestBlockhash", [{"commitment": "confirmed"}])
+            if "error" in result:
+                return "rejected", None, f"getLatestBlockhash: {result['error']}"
+            blockhash = Hash.from_string(result["result"]["value"]["blockhash"])
+            last_valid_block = result["result"]["value"]["lastValidBlockHeight"]
+            tx, sim_error = await prepare_transaction(
+                instructions, main_wallet.pubkey, signers, blockhash, writable_accounts=writable
+            )
+        except Exception as e:
+            return "rejected", None, str(e)
+        if tx is None:
+            return "failed", None, sim_error
+        return await send_and_confirm(tx, last_valid_block)
+
+
+_reclaimer: Optional[RentReclaimer] = None
+
+
+def get_rent_reclaimer() -> RentReclaimer:
+    global _reclaimer
+    if _reclaimer is None:
+        _reclaimer = RentReclaimer()
+    return _reclaimer
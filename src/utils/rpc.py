@@ -0,0 +1,263 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+RPC_RATE_LIMIT = float(os.environ.get('RPC_RATE_LIMIT', '10'))  # requests per second per endpoint
+RPC_MAX_CONCURRENCY = int(os.environ.get('RPC_MAX_CONCURRENCY', '16'))
+RPC_MAX_RETRIES = 4
+RPC_BACKOFF_BASE = 0.5
+RPC_BACKOFF_MAX = 10.0
+RETRY_AFTER_MAX = 60.0
+PRIORITY_RESERVED_SLOTS = 1  # in-flight slots only the priority lane may use
+
+# Per method class token buckets, below the endpoint rate (public nodes cap heavy methods separately)
+CLASS_RATES = {'heavy': 4.0}
+HEAVY_METHODS = {
+    'getMultipleAccounts', 'getSignaturesForAddress', 'getTransaction',
+    'getProgramAccounts', 'getTokenAccountsByOwner',
+}
+# Sends and everything that decides whether a send landed always use the priority lane
+PRIORITY_METHODS = {
+    'sendTransaction', 'simulateTransaction', 'getLatestBlockhash',
+    'getSignatureStatuses', 'getBlockHeight', 'getRecentPrioritizationFees',
+}
+
+_http_session: Optional[aiohttp.ClientSession] = None
+_priority_lane: ContextVar[bool] = ContextVar('rpc_priority_lane', default=False)
+
+
+class RpcError(Exception):
+    """The RPC call could not be completed (rate limited, server error or bad response) after retries."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+@contextmanager
+def priority_lane():
+    """Route every RPC call made inside this block (and tasks it creates) through the priority lane."""
+    token = _priority_lane.set(True)
+    try:
+        yield
+    finally:
+        _priority_lane.reset(token)
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst. A batch may take the bucket into debt."""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Seconds until a request may start (0 when it may start now)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, cost: int):
+        self.tokens -= cost
+
+
+class EndpointLimiter:
+    """Client-side rate and concurrency limits for one RPC endpoint.
+
+    Requests need a token from the endpoint bucket and from their method class bucket.
+    The in-flight limit follows AIMD: +1/limit on success, halved on 429 or 5xx, and a
+    429's Retry-After pauses every request to the endpoint. Priority requests (sends,
+    confirmations, payouts) go first and have PRIORITY_RESERVED_SLOTS in-flight slots the
+    normal lane can't take, so balance refreshes never starve them.
+    """
+
+    def __init__(self, rate: float = RPC_RATE_LIMIT, max_concurrency: int = RPC_MAX_CONCURRENCY):
+        self.bucket = TokenBucket(rate)
+        self.class_buckets = {name: TokenBucket(class_rate) for name, class_rate in CLASS_RATES.items()}
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.stats = {'requests': 0, 'throttled': 0, 'server_errors': 0, 'retries': 0, 'wait_seconds': 0.0}
+        self._priority_waiting = 0
+        self._cond = asyncio.Condition()
+
+    def _delay(self, method_class: str, priority: bool) -> Optional[float]:
+        """Seconds to wait before trying again, 0 to go now, None to wait for a release."""
+        now = time.monotonic()
+        if self.paused_until > now:
+            return self.paused_until - now
+        slots = int(self.limit)
+        if not priority:
+            if self._priority_waiting:
+                return None
+            slots = max(1, slots - PRIORITY_RESERVED_SLOTS)
+        if self.in_flight >= slots:
+            return None
+        class_bucket = self.class_buckets.get(method_class)
+        return max(self.bucket.delay(), class_bucket.delay() if class_bucket else 0.0)
+
+    async def acquire(self, method_class: str, priority: bool, cost: int = 1):
+        started = time.monotonic()
+        async with self._cond:
+            if priority:
+                self._priority_waiting += 1
+            try:
+                while True:
+                    delay = self._delay(method_class, priority)
+                    if delay == 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if priority:
+                    self._priority_waiting -= 1
+                    self._cond.notify_all()
+            self.bucket.take(cost)
+            if method_class in self.class_buckets:
+                self.class_buckets[method_class].take(cost)
+            self.in_flight += 1
+            self.stats['requests'] += 1
+        self.stats['wait_seconds'] += time.monotonic() - started
+
+    async def release(self, status: Optional[int] = None, retry_after: Optional[float] = None):
+        """Record the outcome (HTTP status, None for a transport error) and free the slot."""
+        async with self._cond:
+            self.in_flight -= 1
+            if status == 429 or (status is not None and status >= 500):
+                self.stats['throttled' if status == 429 else 'server_errors'] += 1
+                self.limit = max(1.0, self.limit / 2)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif status is not None:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+_limiters: Dict[str, EndpointLimiter] = {}
+
+
+def get_limiter(url: str = None) -> EndpointLimiter:
+    url = url or get_rpc_url()
+    limiter = _limiters.get(url)
+    if limiter is None:
+        limiter = _limiters[url] = EndpointLimiter()
+    return limiter
+
+
+def _method_class(method: str) -> str:
+    return 'heavy' if method in HEAVY_METHODS else 'read'
+
+
+def _retry_after(resp: aiohttp.ClientResponse) -> Optional[float]:
+    value = resp.headers.get('Retry-After')
+    try:
+        return min(RETRY_AFTER_MAX, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    return min(RPC_BACKOFF_MAX, RPC_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+async def _post(payload, method_class: str, priority: bool, cost: int, retries: int):
+    """POST a JSON-RPC body through the endpoint limiter, retrying 429, 5xx and transport errors."""
+    url = get_rpc_url()
+    limiter = get_limiter(url)
+    session = await get_http_session()
+    for attempt in range(retries + 1):
+        await limiter.acquire(method_class, priority, cost)
+        status, retry_after = None, None
+        try:
+            async with session.post(url, json=payload) as resp:
+                status = resp.status
+                retry_after = _retry_after(resp)
+                if status != 429 and status < 500:
+                    body = await resp.json(content_type=None)
+                    error = body.get("error") if isinstance(body, dict) else None
+                    if not (isinstance(error, dict) and error.get("code") == 429):
+                        return body
+                    status = 429  # some providers rate limit with HTTP 200
+                error = RpcError(f"RPC HTTP {status}", status)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            error = RpcError(f"RPC request failed: {e}", status)
+        finally:
+            await limiter.release(status, retry_after)
+        if attempt < retries:
+            limiter.stats['retries'] += 1
+            await asyncio.sleep(retry_after or _backoff(attempt))
+    raise error
+
+
+def get_rpc_url() -> str:
+    return os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Shared aiohttp session for RPC traffic, so background jobs reuse one connection pool."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    return _http_session
+
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+async def rpc_request(method: str, params: list = None, priority: bool = None,
+                      retries: int = RPC_MAX_RETRIES) -> dict:
+    """Send a single JSON-RPC call to the Solana RPC and return the decoded response body.
+
+    Goes through the endpoint limiter; raises RpcError when the node keeps rate limiting
+    or failing. JSON-RPC errors are returned in the body as before.
+    """
+    if priority is None:
+        priority = method in PRIORITY_METHODS or _priority_lane.get()
+    payload = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": method,
+        "params": params if params is not None else []
+    }
+    return await _post(payload, _method_class(method), priority, 1, retries)
+
+
+async def rpc_batch(calls: list, priority: bool = None) -> list:
+    """Send several (method, params) calls as one JSON-RPC batch; responses come back in call order.
+
+    The batch costs one token per call.
+    """
+    if not calls:
+        return []
+    if priority is None:
+        priority = _priority_lane.get()
+    method_class = 'heavy' if any(_method_class(method) == 'heavy' for method, _ in calls) else 'read'
+    payload = [
+        {"jsonrpc": "2.0", "id": index, "method": method, "params": params}
+        for index, (method, params) in enumerate(calls)
+    ]
+    body = await _post(payload, method_class, priority, len(calls), RPC_MAX_RETRIES)
+    if isinstance(body, dict):
+        # The node rejected the whole batch
+        return [body] * len(calls)
+    by_id = {item.get("id"): item for item in body}
+    return [by_id.get(index, {"error": "missing response"}) for index in range(len(calls))]
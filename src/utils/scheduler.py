@@ -0,0 +1,205 @@
+import time
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_TICK = 30.0
+MISFIRE_GRACE = timedelta(minutes=5)  # a job without catch-up still runs this late
+MAX_CATCH_UP_STEPS = 100_000
+
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))  # minute hour day month weekday
+
+
+def _parse_field(field: str, low: int, high: int) -> set:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Cron field out of range: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day month weekday) in UTC.
+
+    Supports *, lists, ranges and */step; weekday 0 is Sunday. As in cron, when both
+    day and weekday are restricted a time matches either of them.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, _FIELD_RANGES)
+        )
+        self.weekdays = {d % 7 for d in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, dt: datetime) -> datetime:
+        """The first matching minute strictly after dt."""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+
+class _Job:
+    __slots__ = ("name", "schedule", "func", "catch_up", "last_run_at", "task")
+
+    def __init__(self, name: str, schedule: CronSchedule, func: Callable[[], Awaitable], catch_up: bool):
+        self.name = name
+        self.schedule = schedule
+        self.func = func
+        self.catch_up = catch_up
+        self.last_run_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+def _lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a job name."""
+    return int.from_bytes(hashlib.sha256(f"scheduler:{name}".encode()).digest()[:8], "big", signed=True)
+
+
+async def run_exclusive(name: str, func: Callable[[], Awaitable]) -> bool:
+    """Run func unless another replica is running the job called name. Returns whether it ran.
+
+    For loops that tick faster than a cron minute; shares lock keys with JobScheduler jobs
+    of the same name.
+    """
+    from src.database import db
+
+    async with db.advisory_lock(_lock_key(name)) as acquired:
+        if acquired:
+            await func()
+        return acquired
+
+
+class JobScheduler:
+    """Cron-style jobs that run on exactly one replica.
+
+    Each job's last run is stored in scheduled_jobs. When a job is due, the replica that
+    gets its pg_try_advisory_lock re-reads the last run under the lock, runs the job and
+    records the scheduled time it covered; the others skip it. Runs missed while every
+    replica was down are coalesced into one run when the job catches up, and skipped
+    (unless within MISFIRE_GRACE) when it doesn't. A job seen for the first time starts
+    from its next scheduled time.
+    """
+
+    def __init__(self, tick: float = SCHEDULER_TICK):
+        self.tick = tick
+        self.jobs: Dict[str, _Job] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, schedule: str, func: Callable[[], Awaitable], catch_up: bool = True):
+        self.jobs[name] = _Job(name, CronSchedule(schedule), func, catch_up)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Scheduler started: {', '.join(f'{j.name} ({j.schedule.expression})' for j in self.jobs.values())}")
+
+    async def _run(self):
+        while True:
+            now = datetime.utcnow()
+            for job in self.jobs.values():
+                if job.task is not None and not job.task.done():
+                    continue
+                if job.last_run_at is not None and job.schedule.next_after(job.last_run_at) > now:
+                    continue
+                job.task = asyncio.create_task(self._run_if_due(job))
+            await asyncio.sleep(self.tick)
+
+    async def _run_if_due(self, job: _Job):
+        from src.database import db
+
+        try:
+            async with db.advisory_lock(_lock_key(job.name)) as acquired:
+                if not acquired:
+                    return  # another replica is running it
+                now = datetime.utcnow()
+                last_run_at = await db.get_job_last_run(job.name)
+                if last_run_at is None:
+                    await db.set_job_last_run(job.name, now, 'seeded')
+                    job.last_run_at = now
+                    return
+                job.last_run_at = last_run_at
+                due = job.schedule.next_after(last_run_at)
+                if due > now:
+                    return
+
+                latest = self._latest_due(job.schedule, due, now)
+                if not job.catch_up and now - latest > MISFIRE_GRACE:
+                    logger.warning(f"Job {job.name} missed its {latest:%Y-%m-%d %H:%M} run, skipping to the next one")
+                    await db.set_job_last_run(job.name, latest, 'skipped')
+                    job.last_run_at = latest
+                    return
+
+                started = time.perf_counter()
+                status, error = 'ok', None
+                try:
+                    await job.func()
+                except Exception as e:
+                    status, error = 'failed', str(e)
+                    logger.error(f"Job {job.name} failed: {e}")
+                duration = time.perf_counter() - started
+                await db.set_job_last_run(job.name, latest, status, error, duration)
+                job.last_run_at = latest
+                logger.info(f"Job {job.name} ran for {latest:%Y-%m-%d %H:%M} in {duration:.1f}s ({status})")
+        except Exception as e:
+            logger.error(f"Scheduler could not run {job.name}: {e}")
+
+    @staticmethod
+    def _latest_due(schedule: CronSchedule, due: datetime, now: datetime) -> datetime:
+        """The last scheduled time at or before now, starting from the first missed one."""
+        latest = due
+        for _ in range(MAX_CATCH_UP_STEPS):
+            following = schedule.next_after(latest)
+            if following > now:
+                break
+            latest = following
+        return latest
+
+
+_scheduler: Optional[JobScheduler] = None
+
+
+def get_scheduler() -> JobScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = JobScheduler()
+    return _scheduler
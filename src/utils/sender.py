@@ -0,0 +1,60 @@
+import base64
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+from src.utils.rpc import rpc_request, RPC_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+REBROADCAST_INTERVAL = 2.0
+DEFAULT_TIMEOUT = 120.0  # a blockhash stays valid for roughly 60-90s, expiry normally resolves first
+
+
+async def send_and_confirm(tx, last_valid_block_height: int, timeout: float = DEFAULT_TIMEOUT,
+                           preflight: bool = False) -> Tuple[str, Optional[str], Optional[str]]:
+    """Broadcast one signed transaction until it lands or its blockhash expires.
+
+    The same signed bytes are re-sent every REBROADCAST_INTERVAL seconds; the transaction
+    is never rebuilt here, so it can land at most once. Returns (status, signature, error)
+    where status is the tracker's ('confirmed', 'finalized', 'failed', 'expired',
+    'timeout') or 'rejected' when the node refused the first send. Only 'rejected' and
+    'expired' prove the payment did not happen and make a rebuild safe.
+    """
+    from src.utils.confirmations import get_confirmation_tracker
+
+    signature = str(tx.signatures[0])
+    tx_base64 = base64.b64encode(bytes(tx)).decode('utf-8')
+
+    try:
+        result = await _broadcast(tx_base64, skip_preflight=not preflight)
+        if "error" in result:
+            error = result['error']
+            error_msg = error.get('message', str(error)) if isinstance(error, dict) else str(error)
+            return "rejected", None, f"Transaction failed: {error_msg}"
+    except Exception as e:
+        # The node may still have received it; keep rebroadcasting and let the tracker decide
+        logger.warning(f"Initial send of {signature} failed, rebroadcasting: {e}")
+
+    future = get_confirmation_tracker().track(signature, last_valid_block_height, timeout)
+    while True:
+        try:
+            status, error = await asyncio.wait_for(asyncio.shield(future), REBROADCAST_INTERVAL)
+            return status, signature, error
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await _broadcast(tx_base64, skip_preflight=True, retries=0)
+        except Exception as e:
+            logger.debug(f"Rebroadcast of {signature} failed: {e}")
+
+
+async def _broadcast(tx_base64: str, skip_preflight: bool, retries: int = RPC_MAX_RETRIES) -> dict:
+    # maxRetries 0: the RPC node shouldn't queue its own retries, this loop owns rebroadcasting.
+    # Rebroadcasts skip client retries too, the next one is only REBROADCAST_INTERVAL away.
+    return await rpc_request("sendTransaction", [tx_base64, {
+        "encoding": "base64",
+        "skipPreflight": skip_preflight,
+        "preflightCommitment": "confirmed",
+        "maxRetries": 0
+    }], retries=retries)
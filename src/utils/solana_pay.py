@@ -0,0 +1,29 @@
+from decimal import Decimal
+from urllib.parse import quote
+
+from solders.keypair import Keypair
+
+
+def new_reference() -> str:
+    """Fresh Solana Pay reference key; only the public key is used, nobody signs with it."""
+    return str(Keypair().pubkey())
+
+
+def transfer_request_url(recipient: str, amount: float, spl_token: str = None, reference: str = None,
+                         label: str = None, message: str = None) -> str:
+    """Solana Pay transfer request URL (solana:<recipient>?amount=...&spl-token=...&reference=...).
+
+    Wallets add the reference as a read-only account on the transfer, so the payment
+    can be found with getSignaturesForAddress(reference).
+    """
+    params = [("amount", format(Decimal(str(amount)).normalize(), "f"))]
+    if spl_token:
+        params.append(("spl-token", spl_token))
+    if reference:
+        params.append(("reference", reference))
+    if label:
+        params.append(("label", label))
+    if message:
+        params.append(("message", message))
+    query = "&".join(f"{key}={quote(str(value), safe='')}" for key, value in params)
+    return f"solana:{recipient}?{query}"
@@ -0,0 +1,221 @@
+import os
+import json
+import asyncio
+import inspect
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+from src.utils.rpc import get_http_session
+
+logger = logging.getLogger(__name__)
+
+SubscriptionKey = Tuple[str, str]  # ("signature", signature) or ("account", pubkey)
+
+
+class _Subscription:
+    __slots__ = ("method", "params", "callback")
+
+    def __init__(self, method: str, params: list, callback: Optional[Callable] = None):
+        self.method = method
+        self.params = params
+        self.callback = callback
+
+
+class SolanaWebSocket:
+    """Push notifications from the Solana RPC websocket.
+
+    Signature subscriptions resolve the shared ConfirmationTracker as soon as the
+    cluster reports them; account subscriptions call back with the raw account value.
+    Every subscription is re-sent after a reconnect, and while the socket is down the
+    tracker keeps polling as before.
+    """
+
+    def __init__(self, url: str, commitment: str = "confirmed"):
+        self.url = url
+        self.commitment = commitment
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_request_id = 1
+        self._subscriptions: Dict[SubscriptionKey, _Subscription] = {}
+        self._requests: Dict[int, SubscriptionKey] = {}
+        self._server_ids: Dict[int, SubscriptionKey] = {}
+        self._key_server_ids: Dict[SubscriptionKey, int] = {}
+        self._sends = set()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe_signature(self, signature: str):
+        key = ("signature", signature)
+        if key in self._subscriptions:
+            return
+        self._subscriptions[key] = _Subscription(
+            "signatureSubscribe", [signature, {"commitment": self.commitment}]
+        )
+        self._schedule(self._send_subscribe(key))
+
+    def unsubscribe_signature(self, signature: str):
+        self._unsubscribe(("signature", signature), "signatureUnsubscribe")
+
+    def subscribe_account(self, pubkey: str, callback: Callable):
+        """callback(pubkey, value) is called with the account value on every change."""
+        key = ("account", pubkey)
+        existing = self._subscriptions.get(key)
+        if existing:
+            existing.callback = callback
+            return
+        self._subscriptions[key] = _Subscription(
+            "accountSubscribe", [pubkey, {"encoding": "base64", "commitment": self.commitment}], callback
+        )
+        self._schedule(self._send_subscribe(key))
+
+    def unsubscribe_account(self, pubkey: str):
+        self._unsubscribe(("account", pubkey), "accountUnsubscribe")
+
+    def _unsubscribe(self, key: SubscriptionKey, method: str):
+        if self._subscriptions.pop(key, None) is None:
+            return
+        server_id = self._key_server_ids.pop(key, None)
+        if server_id is not None:
+            self._server_ids.pop(server_id, None)
+            self._schedule(self._send(method, [server_id]))
+
+    def _schedule(self, coro):
+        if not self.is_connected:
+            coro.close()  # sent on (re)connect instead
+            return
+        task = asyncio.create_task(coro)
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    async def _send(self, method: str, params: list) -> int:
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        await self._ws.send_json({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        return request_id
+
+    async def _send_subscribe(self, key: SubscriptionKey):
+        subscription = self._subscriptions.get(key)
+        if subscription is None or not self.is_connected:
+            return
+        try:
+            request_id = await self._send(subscription.method, subscription.params)
+            self._requests[request_id] = key
+        except Exception as e:
+            logger.warning(f"WS subscribe {key[0]} failed: {e}")
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                session = await get_http_session()
+                async with session.ws_connect(self.url, heartbeat=30) as ws:
+                    self._ws = ws
+                    self._requests.clear()
+                    self._server_ids.clear()
+                    self._key_server_ids.clear()
+                    logger.info(f"Solana websocket connected, resubscribing {len(self._subscriptions)} subscriptions")
+                    for key in list(self._subscriptions):
+                        await self._send_subscribe(key)
+                    backoff = 1.0
+
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            try:
+                                self._handle_message(json.loads(msg.data))
+                            except Exception as e:
+                                logger.error(f"WS message handling error: {e}")
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Solana websocket error: {e}")
+            finally:
+                self._ws = None
+
+            logger.warning(f"Solana websocket disconnected, reconnecting in {backoff:.0f}s (polling fallback active)")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _handle_message(self, data: dict):
+        if "id" in data and data.get("id") in self._requests:
+            key = self._requests.pop(data["id"])
+            if "error" in data:
+                logger.warning(f"WS subscribe {key[0]} rejected: {data['error']}")
+                return
+            server_id = data.get("result")
+            if key in self._subscriptions:
+                self._server_ids[server_id] = key
+                self._key_server_ids[key] = server_id
+            return
+
+        method = data.get("method")
+        params = data.get("params", {})
+        key = self._server_ids.get(params.get("subscription"))
+        if key is None:
+            return
+        value = params.get("result", {}).get("value")
+
+        if method == "signatureNotification":
+            # Signature subscriptions are closed by the server after the first notification
+            self._server_ids.pop(params.get("subscription"), None)
+            self._key_server_ids.pop(key, None)
+            self._subscriptions.pop(key, None)
+            self._resolve_signature(key[1], value or {})
+        elif method == "accountNotification":
+            subscription = self._subscriptions.get(key)
+            if subscription and subscription.callback:
+                result = subscription.callback(key[1], value)
+                if inspect.isawaitable(result):
+                    self._schedule_callback(result)
+
+    def _schedule_callback(self, awaitable):
+        task = asyncio.ensure_future(awaitable)
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    def _resolve_signature(self, signature: str, value: dict):
+        from src.utils.confirmations import get_confirmation_tracker
+
+        tracker = get_confirmation_tracker()
+        if value.get("err"):
+            tracker.resolve(signature, "failed", f"Transaction failed on-chain: {value['err']}")
+        else:
+            tracker.resolve(signature, self.commitment)
+
+
+_solana_ws: Optional[SolanaWebSocket] = None
+
+
+def get_solana_ws() -> Optional[SolanaWebSocket]:
+    """The websocket client, or None when SOLANA_WS_URL is not configured."""
+    return _solana_ws
+
+
+def start_solana_ws() -> Optional[SolanaWebSocket]:
+    global _solana_ws
+    url = os.environ.get('SOLANA_WS_URL')
+    if not url:
+        logger.info("SOLANA_WS_URL not set - confirmations use HTTP polling only")
+        return None
+    if _solana_ws is None:
+        _solana_ws = SolanaWebSocket(url)
+    _solana_ws.start()
+    return _solana_ws
@@ -0,0 +1,298 @@
+import os
+import html
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.rpc import rpc_request
+
+logger = logging.getLogger(__name__)
+
+SWEEP_PAGE = 50  # wallet + token account per wallet = 100 accounts, one getMultipleAccounts call
+SWEEP_CONCURRENCY = int(os.environ.get('SWEEP_CONCURRENCY', '4'))
+SWEEP_RATE = float(os.environ.get('SWEEP_RATE', '2'))  # transfers started per second
+SWEEP_MIN_LAMPORTS = 5_000_000  # same 0.005 SOL gas floor /recover checks
+SWEEP_TRANSFER_TIMEOUT = 30.0
+PROGRESS_INTERVAL = 3.0
+MAX_FAILURES_KEPT = 20
+CHECKPOINT_SETTING = 'wallet_sweep_checkpoint'
+
+
+class RateLimiter:
+    """Spaces out calls so at most rate of them start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next_at > now:
+                await asyncio.sleep(self._next_at - now)
+                now = self._next_at
+            self._next_at = now + self.interval
+
+
+class WalletSweeper:
+    """Owner-run bulk sweep of FAPCOIN out of burner wallets.
+
+    Wallets are paged from user_wallets in id order. Each page's SOL and token balances
+    come from one getMultipleAccounts call, keys are decrypted as one crypto executor job,
+    and transfers run with bounded concurrency behind a rate limiter. Progress is edited
+    into a single message in the owner's chat. The checkpoint (last finished wallet id and
+    running totals) is kept in bot_settings after every page, so a stopped or crashed
+    sweep resumes where it left off; wallets already swept just read as empty.
+    """
+
+    def __init__(self, concurrency: int = SWEEP_CONCURRENCY, rate: float = SWEEP_RATE):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.state: Optional[dict] = None
+        self.bot = None
+        self._stop_requested = False
+        self._reported_at = 0.0
+        self._limiter = RateLimiter(rate)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def load_checkpoint(self) -> Optional[dict]:
+        from src.database import db
+        if self.running:
+            return self.state
+        raw = await db.get_setting(CHECKPOINT_SETTING)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            logger.warning("Ignoring unreadable wallet sweep checkpoint")
+            return None
+
+    async def start(self, bot, chat_id: int, destination: str, min_amount: float) -> Optional[str]:
+        """Start a new sweep from the first wallet. Returns an error message or None."""
+        if self.running:
+            return "A sweep is already running."
+        state = {
+            'status': 'running',
+            'destination': destination,
+            'min_amount': min_amount,
+            'last_id': 0,
+            'checked': 0,
+            'swept': 0,
+            'pending': 0,
+            'swept_amount': 0.0,
+            'skipped_empty': 0,
+            'skipped_gas': 0,
+            'failed': 0,
+            'failures': [],
+            'chat_id': chat_id,
+            'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        }
+        await self._launch(bot, state)
+        return None
+
+    async def resume(self, bot, chat_id: int) -> Optional[str]:
+        """Continue the checkpointed sweep. Returns an error message or None."""
+        if self.running:
+            return "A sweep is already running."
+        state = await self.load_checkpoint()
+        if state is None:
+            return "No sweep checkpoint to resume."
+        if state.get('status') == 'done':
+            return "The last sweep already finished. Start a new one with /sweepall [destination]."
+        state['status'] = 'running'
+        state['chat_id'] = chat_id
+        await self._launch(bot, state)
+        return None
+
+    def stop(self) -> bool:
+        """Ask the running sweep to stop after the current page."""
+        if not self.running:
+            return False
+        self._stop_requested = True
+        return True
+
+    async def _launch(self, bot, state: dict):
+        from src.database import db
+        self.bot = bot
+        self.state = state
+        self._stop_requested = False
+        state.pop('message_id', None)
+        await db.set_setting(CHECKPOINT_SETTING, json.dumps(state))
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        from src.database import db
+        state = self.state
+        await self._report(force=True)
+        try:
+            while not self._stop_requested:
+                page = await db.get_wallet_page(state['last_id'], SWEEP_PAGE)
+                if not page:
+                    state['status'] = 'done'
+                    break
+                await self._sweep_page(page)
+                state['last_id'] = page[-1][0]
+                await db.set_setting(CHECKPOINT_SETTING, json.dumps(state))
+                await self._report()
+            else:
+                state['status'] = 'stopped'
+        except Exception as e:
+            logger.error(f"Wallet sweep stopped at wallet id {state['last_id']}: {e}")
+            state['status'] = 'error'
+            state['error'] = str(e)[:200]
+        await db.set_setting(CHECKPOINT_SETTING, json.dumps(state))
+        await self._report(force=True)
+        logger.info(f"Wallet sweep {state['status']}: {state['swept']} swept, "
+                    f"{state['swept_amount']:,.2f} FAPCOIN, {state['failed']} failed")
+
+    async def _sweep_page(self, page: List[tuple]):
+        from src.utils import crypto_executor
+        from src.utils.wallet import FAPCOIN_DECIMALS
+
+        state = self.state
+        atas = await crypto_executor.associated_token_addresses([public_key for _, _, public_key, _ in page])
+        balances = await self._fetch_balances([
+            (public_key, str(ata)) for (_, _, public_key, _), ata in zip(page, atas) if ata
+        ])
+
+        min_raw = int(state['min_amount'] * (10 ** FAPCOIN_DECIMALS))
+        candidates = []
+        for (_, telegram_id, public_key, encrypted_key), ata in zip(page, atas):
+            state['checked'] += 1
+            lamports, token_raw = balances.get(public_key, (0, 0))
+            if not ata or token_raw <= 0 or token_raw < min_raw or public_key == state['destination']:
+                state['skipped_empty'] += 1
+            elif lamports < SWEEP_MIN_LAMPORTS:
+                state['skipped_gas'] += 1
+            else:
+                candidates.append((telegram_id, encrypted_key, ata, token_raw))
+        if not candidates:
+            return
+
+        keypairs = await crypto_executor.decrypt_private_keys([encrypted_key for _, encrypted_key, _, _ in candidates])
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def sweep_one(candidate, keypair):
+            async with semaphore:
+                await self._limiter.wait()
+                await self._transfer(candidate, keypair)
+                await self._report()
+
+        await asyncio.gather(*(sweep_one(c, k) for c, k in zip(candidates, keypairs)))
+
+    async def _fetch_balances(self, wallets: List[Tuple[str, str]]) -> Dict[str, Tuple[int, int]]:
+        """(lamports, raw token amount) per wallet address, from one getMultipleAccounts call."""
+        from src.utils.deposits import decode_token_amount
+
+        if not wallets:
+            return {}
+        accounts = [account for pair in wallets for account in pair]
+        result = await rpc_request("getMultipleAccounts", [accounts, {"encoding": "base64", "commitment": "confirmed"}])
+        if "error" in result:
+            raise RuntimeError(f"getMultipleAccounts: {result['error']}")
+        values = result.get("result", {}).get("value", [])
+        if len(values) != len(accounts):
+            raise RuntimeError(f"getMultipleAccounts returned {len(values)} of {len(accounts)} accounts")
+
+        balances = {}
+        for i, (public_key, _) in enumerate(wallets):
+            wallet_value, ata_value = values[2 * i], values[2 * i + 1]
+            lamports = wallet_value.get("lamports", 0) if wallet_value else 0
+            token_raw = (decode_token_amount(ata_value.get("data")) or 0) if ata_value else 0
+            balances[public_key] = (lamports, token_raw)
+        return balances
+
+    async def _transfer(self, candidate: tuple, keypair):
+        from src.utils.wallet import FAPCOIN_DECIMALS, _send_spl_transfer
+
+        state = self.state
+        telegram_id, _, ata, token_raw = candidate
+        amount = token_raw / (10 ** FAPCOIN_DECIMALS)
+        try:
+            status, tx_signature, error = await _send_spl_transfer(
+                keypair, ata, state['destination'], amount, timeout=SWEEP_TRANSFER_TIMEOUT, raw_amount=token_raw
+            )
+        except Exception as e:
+            status, tx_signature, error = "rejected", None, str(e)
+
+        if status in ("failed", "rejected", "expired"):
+            state['failed'] += 1
+            state['failures'] = (state['failures'] + [[telegram_id, (error or status)[:100]]])[-MAX_FAILURES_KEPT:]
+            logger.warning(f"Sweep of wallet of {telegram_id} failed ({status}): {error}")
+            return
+
+        # In-bot balances are owed from the main wallet whatever the burner holds, so they stay
+        # as they are; the deposit watcher just moves the watermark down to the swept wallet
+        if status in ("confirmed", "finalized"):
+            state['swept'] += 1
+        else:
+            state['pending'] += 1
+        state['swept_amount'] += amount
+        logger.info(f"Swept {amount:,.2f} FAPCOIN from wallet of {telegram_id}: {tx_signature} ({status})")
+
+    async def _report(self, force: bool = False):
+        """Edit the progress message in the owner chat, at most every PROGRESS_INTERVAL seconds."""
+        state = self.state
+        if self.bot is None or not state.get('chat_id'):
+            return
+        now = time.monotonic()
+        if not force and now - self._reported_at < PROGRESS_INTERVAL:
+            return
+        self._reported_at = now
+        text = format_progress(state)
+        try:
+            if state.get('message_id'):
+                await self.bot.edit_message_text(text, chat_id=state['chat_id'], message_id=state['message_id'])
+            else:
+                message = await self.bot.send_message(state['chat_id'], text)
+                state['message_id'] = message.message_id
+        except Exception as e:
+            if "message is not modified" not in str(e):
+                logger.warning(f"Could not report sweep progress: {e}")
+
+
+def format_progress(state: dict) -> str:
+    """HTML progress/status text for a sweep state."""
+    titles = {
+        'running': '🧹 <b>WALLET SWEEP RUNNING</b>',
+        'stopped': '⏸ <b>WALLET SWEEP STOPPED</b>',
+        'done': '✅ <b>WALLET SWEEP FINISHED</b>',
+        'error': '⚠️ <b>WALLET SWEEP INTERRUPTED</b>',
+    }
+    lines = [
+        titles.get(state.get('status'), '🧹 <b>WALLET SWEEP</b>'),
+        "",
+        f"📥 <b>To:</b> <code>{state['destination']}</code>",
+        f"🔎 <b>Checked:</b> {state['checked']} (up to wallet id {state['last_id']})",
+        f"💰 <b>Swept:</b> {state['swept']} wallets, {state['swept_amount']:,.2f} FAPCOIN",
+    ]
+    if state['pending']:
+        lines.append(f"⏳ <b>Unconfirmed:</b> {state['pending']}")
+    lines.append(f"⏭ <b>Skipped:</b> {state['skipped_empty']} empty, {state['skipped_gas']} without SOL for gas")
+    lines.append(f"❌ <b>Failed:</b> {state['failed']}")
+    for telegram_id, error in state['failures'][-5:]:
+        lines.append(f"  • <code>{telegram_id}</code>: {html.escape(error)}")
+    if state.get('error'):
+        lines.append(f"\nError: {html.escape(state['error'])}")
+    if state.get('status') in ('stopped', 'error'):
+        lines.append("\nUse /sweepall resume to continue from the checkpoint.")
+    return "\n".join(lines)
+
+
+_sweeper: Optional[WalletSweeper] = None
+
+
+def get_wallet_sweeper() -> WalletSweeper:
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = WalletSweeper()
+    return _sweeper
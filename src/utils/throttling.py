@@ -0,0 +1,161 @@
+import os
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.enums import ChatType
+from aiogram.types import CallbackQuery, Message
+
+logger = logging.getLogger(__name__)
+
+USER_RATE = float(os.environ.get('THROTTLE_USER_RATE', '0.5'))  # tokens per second per user
+USER_BURST = 10.0
+CHAT_RATE = float(os.environ.get('THROTTLE_CHAT_RATE', '5'))  # tokens per second per group
+CHAT_BURST = 40.0
+NOTIFY_INTERVAL = 10.0  # tell a throttled user at most this often
+CLEANUP_INTERVAL = 60.0
+DEFAULT_COST = 1.0
+
+# RPC-backed actions cost the most, DB-heavy ones more than the rest
+COMMAND_COSTS = {
+    'deposit': 5.0, 'recover': 5.0, 'verify': 5.0,
+    'grow': 2.0, 'top': 2.0, 'daily': 2.0, 'stats': 2.0, 'betstats': 2.0, 'withdraw': 2.0, 'wallet': 2.0,
+}
+CALLBACK_COSTS = (
+    ('action_deposit', 5.0), ('wallet_deposit', 5.0), ('action_verify', 5.0), ('withdraw_confirm', 5.0), ('paid_', 5.0),
+    ('action_grow', 2.0), ('action_top', 2.0), ('action_daily', 2.0), ('action_stats', 2.0), ('action_betstats', 2.0),
+    ('action_wallet', 2.0), ('action_withdraw', 2.0),
+)
+
+
+def message_cost(message: Message) -> float:
+    text = message.text or ""
+    if not text.startswith("/"):
+        return DEFAULT_COST
+    command = text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower() if len(text) > 1 else ""
+    return COMMAND_COSTS.get(command, DEFAULT_COST)
+
+
+def callback_cost(callback: CallbackQuery) -> float:
+    data = callback.data or ""
+    for prefix, cost in CALLBACK_COSTS:
+        if data.startswith(prefix):
+            return cost
+    return DEFAULT_COST
+
+
+class KeyedBuckets:
+    """Token buckets for many keys, stored as [tokens, updated] pairs.
+
+    A key that has been idle long enough to refill completely is the same as a new one,
+    so cleanup() drops those and memory follows the number of recently active keys.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[int, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def available(self, key: int, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        return min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def take(self, key: int, cost: float, now: float):
+        self._buckets[key] = [self.available(key, now) - cost, now]
+
+    def cleanup(self, now: float):
+        full_after = self.burst / self.rate if self.rate > 0 else float('inf')
+        idle = [key for key, (_, updated) in self._buckets.items() if now - updated >= full_after]
+        for key in idle:
+            del self._buckets[key]
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Drops messages and button taps from users or groups that exceed their budget.
+
+    Registered as inner middleware, so only events a handler has matched are charged;
+    group chatter that no handler takes costs nothing. Each event costs tokens by action
+    (COMMAND_COSTS / CALLBACK_COSTS) and needs them from both the sender's bucket and, in
+    groups, the chat's bucket; rejected events cost nothing and the handler never runs, so
+    spam stops before any DB or RPC work. Throttled callbacks are always answered so the
+    button stops spinning; the notice text is shown at most every NOTIFY_INTERVAL seconds
+    (callback toast or private reply, nothing in groups).
+    """
+
+    def __init__(self):
+        self.users = KeyedBuckets(USER_RATE, USER_BURST)
+        self.chats = KeyedBuckets(CHAT_RATE, CHAT_BURST)
+        self.stats = {'allowed': 0, 'throttled': 0}
+        self._notified: Dict[int, float] = {}
+        self._next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, CallbackQuery):
+            user = event.from_user
+            chat = event.message.chat if event.message else None
+            cost = callback_cost(event)
+        elif isinstance(event, Message):
+            user = event.from_user
+            chat = event.chat
+            cost = message_cost(event)
+        else:
+            return await handler(event, data)
+        if user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now >= self._next_cleanup:
+            self._cleanup(now)
+        chat_id: Optional[int] = chat.id if chat is not None and chat.type != ChatType.PRIVATE else None
+
+        if self.users.available(user.id, now) < cost or (
+                chat_id is not None and self.chats.available(chat_id, now) < cost):
+            self.stats['throttled'] += 1
+            await self._notify(event, user.id, now)
+            return None
+
+        self.users.take(user.id, cost, now)
+        if chat_id is not None:
+            self.chats.take(chat_id, cost, now)
+        self.stats['allowed'] += 1
+        return await handler(event, data)
+
+    async def _notify(self, event: Any, user_id: int, now: float):
+        notify = now - self._notified.get(user_id, 0.0) >= NOTIFY_INTERVAL
+        if notify:
+            self._notified[user_id] = now
+        text = "⏳ Slow down! Try again in a few seconds."
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(text if notify else None)
+            elif notify and event.chat.type == ChatType.PRIVATE:
+                await event.answer(text, parse_mode=None)
+        except Exception as e:
+            logger.debug(f"Could not tell {user_id} they are throttled: {e}")
+
+    def _cleanup(self, now: float):
+        self.users.cleanup(now)
+        self.chats.cleanup(now)
+        self._notified = {user_id: at for user_id, at in self._notified.items() if now - at < NOTIFY_INTERVAL}
+        self._next_cleanup = now + CLEANUP_INTERVAL
+
+
+_throttling: Optional[ThrottlingMiddleware] = None
+
+
+def get_throttling_middleware() -> ThrottlingMiddleware:
+    global _throttling
+    if _throttling is None:
+        _throttling = ThrottlingMiddleware()
+    return _throttling
@@ -0,0 +1,178 @@
+import os
+import time
+import base64
+import struct
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from solders.hash import Hash
+from solders.instruction import Instruction, AccountMeta
+from solders.message import Message, MessageV0
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.transaction import VersionedTransaction
+
+from src.utils.rpc import rpc_request
+from src.utils.wallet import (
+    SYSTEM_PROGRAM, TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID, COMPUTE_BUDGET_PROGRAM,
+    FAPCOIN_MINT_PUBKEY, PRIORITY_FEE_MICRO_LAMPORTS, DEFAULT_COMPUTE_UNIT_LIMIT
+)
+
+logger = logging.getLogger(__name__)
+
+# Optional address lookup table holding our fixed accounts (mint, token program,
+# treasury ATA, ...). Created once by the operator; v0 messages are used when it's set.
+ADDRESS_LOOKUP_TABLE = os.environ.get('ADDRESS_LOOKUP_TABLE', '')
+LOOKUP_TABLE_RETRY = 300.0
+
+# Instruction templates: packers and account metas that never change are built once
+_SET_UNIT_LIMIT = struct.Struct('<BI')
+_SET_UNIT_PRICE = struct.Struct('<BQ')
+_TOKEN_TRANSFER = struct.Struct('<BQ')
+_TRANSFER_TAG = 3
+_CLOSE_ACCOUNT_DATA = bytes([9])
+_CREATE_ATA_DATA = bytes()
+_CREATE_ATA_IDEMPOTENT_DATA = bytes([1])
+_SYSTEM_PROGRAM_META = AccountMeta(SYSTEM_PROGRAM, is_signer=False, is_writable=False)
+_TOKEN_PROGRAM_META = AccountMeta(TOKEN_PROGRAM_ID, is_signer=False, is_writable=False)
+_readonly_metas: Dict[Pubkey, AccountMeta] = {}
+
+
+def _readonly(pubkey: Pubkey) -> AccountMeta:
+    meta = _readonly_metas.get(pubkey)
+    if meta is None:
+        meta = _readonly_metas[pubkey] = AccountMeta(pubkey, is_signer=False, is_writable=False)
+    return meta
+
+
+def compute_budget_instructions(unit_limit: int = DEFAULT_COMPUTE_UNIT_LIMIT, micro_lamports: int = PRIORITY_FEE_MICRO_LAMPORTS) -> list:
+    """SetComputeUnitLimit + SetComputeUnitPrice instructions."""
+    return [
+        Instruction(COMPUTE_BUDGET_PROGRAM, _SET_UNIT_LIMIT.pack(2, unit_limit), []),
+        Instruction(COMPUTE_BUDGET_PROGRAM, _SET_UNIT_PRICE.pack(3, micro_lamports), []),
+    ]
+
+
+def create_ata_instruction(payer: Pubkey, ata: Pubkey, owner: Pubkey, mint: Pubkey = None, idempotent: bool = False):
+    """Associated token account Create instruction, paid for by payer.
+
+    The idempotent variant succeeds even if the account already exists.
+    """
+    accounts = [
+        AccountMeta(payer, is_signer=True, is_writable=True),
+        AccountMeta(ata, is_signer=False, is_writable=True),
+        _readonly(owner),
+        _readonly(mint or FAPCOIN_MINT_PUBKEY),
+        _SYSTEM_PROGRAM_META,
+        _TOKEN_PROGRAM_META,
+    ]
+    data = _CREATE_ATA_IDEMPOTENT_DATA if idempotent else _CREATE_ATA_DATA
+    return Instruction(ASSOCIATED_TOKEN_PROGRAM_ID, data, accounts)
+
+
+def token_transfer_instruction(source_ata: Pubkey, dest_ata: Pubkey, owner: Pubkey, raw_amount: int):
+    """SPL token Transfer instruction for raw_amount base units."""
+    accounts = [
+        AccountMeta(source_ata, is_signer=False, is_writable=True),
+        AccountMeta(dest_ata, is_signer=False, is_writable=True),
+        AccountMeta(owner, is_signer=True, is_writable=False),
+    ]
+    return Instruction(TOKEN_PROGRAM_ID, _TOKEN_TRANSFER.pack(_TRANSFER_TAG, raw_amount), accounts)
+
+
+def close_account_instruction(account: Pubkey, destination: Pubkey, owner: Pubkey):
+    """SPL token CloseAccount instruction: the account's rent lamports go to destination."""
+    accounts = [
+        AccountMeta(account, is_signer=False, is_writable=True),
+        AccountMeta(destination, is_signer=False, is_writable=True),
+        AccountMeta(owner, is_signer=True, is_writable=False),
+    ]
+    return Instruction(TOKEN_PROGRAM_ID, _CLOSE_ACCOUNT_DATA, accounts)
+
+
+class Transfer:
+    """One SPL transfer leg: raw_amount to owner's token account, creating it if needed."""
+    __slots__ = ("owner", "ata", "raw_amount", "create_ata")
+
+    def __init__(self, owner: Pubkey, ata: Pubkey, raw_amount: int, create_ata: bool = False):
+        self.owner = owner
+        self.ata = ata
+        self.raw_amount = raw_amount
+        self.create_ata = create_ata
+
+
+def transfer_instructions(payer: Pubkey, source_ata: Pubkey, authority: Pubkey, transfers: Iterable[Transfer],
+                          mint: Pubkey = None, idempotent: bool = True) -> list:
+    """Instructions for any number of transfers out of source_ata in one message (no compute budget)."""
+    instructions = []
+    for transfer in transfers:
+        if transfer.create_ata:
+            instructions.append(create_ata_instruction(payer, transfer.ata, transfer.owner, mint, idempotent=idempotent))
+        instructions.append(token_transfer_instruction(source_ata, transfer.ata, authority, transfer.raw_amount))
+    return instructions
+
+
+class LookupTableCache:
+    """The configured address lookup table, loaded once and retried after a failed load."""
+
+    def __init__(self, address: str = ADDRESS_LOOKUP_TABLE):
+        self.address = address
+        self._tables: list = []
+        self._loaded = False
+        self._failed_at: Optional[float] = None
+
+    def tables(self) -> list:
+        return self._tables
+
+    async def load(self) -> list:
+        if not self.address or self._loaded:
+            return self._tables
+        if self._failed_at is not None and time.monotonic() - self._failed_at < LOOKUP_TABLE_RETRY:
+            return self._tables
+        from solders.address_lookup_table_account import AddressLookupTable, AddressLookupTableAccount
+        try:
+            result = await rpc_request("getAccountInfo", [self.address, {"encoding": "base64"}])
+            value = (result.get("result") or {}).get("value")
+            if not value:
+                raise ValueError(result.get("error") or "account not found")
+            table = AddressLookupTable.deserialize(base64.b64decode(value["data"][0]))
+            self._tables = [AddressLookupTableAccount(Pubkey.from_string(self.address), list(table.addresses))]
+            self._loaded = True
+            logger.info(f"Address lookup table {self.address} loaded ({len(table.addresses)} addresses)")
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            logger.warning(f"Address lookup table {self.address} not loaded, using legacy messages: {e}")
+        return self._tables
+
+
+def compile_message(instructions: List[Instruction], payer: Pubkey, blockhash: Hash, lookup_tables: list = ()):
+    """v0 message against the lookup tables, or a legacy message when there are none."""
+    if lookup_tables:
+        return MessageV0.try_compile(payer, instructions, list(lookup_tables), blockhash)
+    return Message.new_with_blockhash(instructions, payer, blockhash)
+
+
+def transaction_size(instructions: List[Instruction], payer: Pubkey, blockhash: Hash, lookup_tables: list = ()) -> int:
+    """Serialized size of the signed transaction, without signing it."""
+    message = compile_message(instructions, payer, blockhash, lookup_tables)
+    placeholders = [Signature.default()] * message.header.num_required_signatures
+    return len(bytes(VersionedTransaction.populate(message, placeholders)))
+
+
+async def build_transaction(instructions: List[Instruction], payer: Pubkey, signers: list,
+                            blockhash: Hash) -> VersionedTransaction:
+    """Compile and sign a transaction; the signing runs on the crypto executor."""
+    from src.utils.crypto_executor import get_crypto_executor
+    lookup_tables = await get_lookup_tables().load()
+    message = compile_message(instructions, payer, blockhash, lookup_tables)
+    return await get_crypto_executor().run(VersionedTransaction, message, signers)
+
+
+_lookup_tables: Optional[LookupTableCache] = None
+
+
+def get_lookup_tables() -> LookupTableCache:
+    global _lookup_tables
+    if _lookup_tables is None:
+        _lookup_tables = LookupTableCache()
+    return _lookup_tables
@@ -0,0 +1,146 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.rpc import rpc_batch
+
+logger = logging.getLogger(__name__)
+
+FINALIZED_CACHE_SIZE = 4096
+NOT_FOUND_TTL = 15.0
+
+
+class TransferSummary:
+    """What purchase matching needs from a finalized transaction.
+
+    transfers holds (destination, amount) for every parsed transfer/transferChecked
+    instruction, inner instructions included; balance_changes holds (owner, mint, delta)
+    for every token account whose balance changed.
+    """
+    __slots__ = ("failed", "transfers", "balance_changes")
+
+    def __init__(self, failed: bool, transfers: List[Tuple[str, float]], balance_changes: List[Tuple[str, str, float]]):
+        self.failed = failed
+        self.transfers = transfers
+        self.balance_changes = balance_changes
+
+
+def _account_decimals(message: dict, meta: dict) -> Dict[str, int]:
+    """Decimals of every token account in the transaction, from its token balances."""
+    keys = [key.get('pubkey', '') if isinstance(key, dict) else key for key in message.get('accountKeys', [])]
+    decimals = {}
+    for entry in (meta.get('preTokenBalances') or []) + (meta.get('postTokenBalances') or []):
+        index = entry.get('accountIndex')
+        if index is not None and index < len(keys) and 'decimals' in entry.get('uiTokenAmount', {}):
+            decimals[keys[index]] = entry['uiTokenAmount']['decimals']
+    return decimals
+
+
+def summarize_transaction(tx: dict) -> TransferSummary:
+    """Reduce a jsonParsed getTransaction result to a TransferSummary."""
+    from src.utils.wallet import FAPCOIN_DECIMALS
+
+    meta = tx.get('meta', {}) or {}
+    if meta.get('err') is not None:
+        return TransferSummary(True, [], [])
+
+    message = tx.get('transaction', {}).get('message', {})
+    all_instructions = list(message.get('instructions', []))
+    for inner in meta.get('innerInstructions', []) or []:
+        all_instructions.extend(inner.get('instructions', []))
+
+    # A plain transfer carries only the raw amount; its decimals come from the token balances
+    decimals = _account_decimals(message, meta)
+    transfers = []
+    for instr in all_instructions:
+        parsed = instr.get('parsed')
+        if not parsed or not isinstance(parsed, dict):
+            continue
+        instr_type = parsed.get('type', '')
+        info = parsed.get('info', {})
+        if instr_type == 'transferChecked':
+            amount = float(info.get('tokenAmount', {}).get('uiAmount', 0))
+        elif instr_type == 'transfer':
+            scale = 10 ** decimals.get(info.get('destination', ''), FAPCOIN_DECIMALS)
+            amount = float(info.get('amount', 0)) / scale
+        else:
+            continue
+        transfers.append((info.get('destination', ''), amount))
+
+    accounts = {}
+    for sign, key in ((-1, 'preTokenBalances'), (1, 'postTokenBalances')):
+        for entry in meta.get(key, []) or []:
+            amount = float(entry.get('uiTokenAmount', {}).get('uiAmount', 0) or 0)
+            owner, mint, delta = accounts.get(entry.get('accountIndex'), (entry.get('owner', ''), entry.get('mint', ''), 0.0))
+            accounts[entry.get('accountIndex')] = (owner, mint, delta + sign * amount)
+    balance_changes = [change for change in accounts.values() if change[2] != 0]
+
+    return TransferSummary(False, transfers, balance_changes)
+
+
+class TransactionCache:
+    """Bounded LRU of finalized transaction summaries keyed by signature.
+
+    Finalized transactions never change, so hits are served without RPC. "Not found"
+    is cached for NOT_FOUND_TTL seconds only, since the transaction may still land.
+    """
+
+    def __init__(self, max_size: int = FINALIZED_CACHE_SIZE, not_found_ttl: float = NOT_FOUND_TTL):
+        self.max_size = max_size
+        self.not_found_ttl = not_found_ttl
+        self._entries: "OrderedDict[str, TransferSummary]" = OrderedDict()
+        self._missing: Dict[str, float] = {}
+
+    async def get_summaries(self, signatures: List[str]) -> Dict[str, TransferSummary]:
+        """Summaries for many signatures, fetching the uncached ones in one JSON-RPC batch.
+
+        Signatures that aren't found or whose request failed are left out.
+        """
+        now = time.monotonic()
+        summaries = {}
+        missing = []
+        for signature in signatures:
+            summary = self._entries.get(signature)
+            if summary is not None:
+                self._entries.move_to_end(signature)
+                summaries[signature] = summary
+            elif now - self._missing.get(signature, float('-inf')) >= self.not_found_ttl:
+                missing.append(signature)
+        if not missing:
+            return summaries
+
+        responses = await rpc_batch([
+            ("getTransaction", [signature, {"encoding": "jsonParsed", "commitment": "finalized",
+                                            "maxSupportedTransactionVersion": 0}])
+            for signature in missing
+        ])
+        for signature, response in zip(missing, responses):
+            if 'error' in response:
+                logger.debug(f"getTransaction {signature} failed: {response['error']}")
+                continue
+            if response.get('result') is None:
+                self._missing[signature] = now
+                continue
+            self._missing.pop(signature, None)
+            summaries[signature] = self._store(signature, summarize_transaction(response['result']))
+
+        if len(self._missing) > self.max_size:
+            self._missing = {s: at for s, at in self._missing.items() if now - at < self.not_found_ttl}
+        return summaries
+
+    def _store(self, signature: str, summary: TransferSummary) -> TransferSummary:
+        self._entries[signature] = summary
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return summary
+
+
+_cache: Optional[TransactionCache] = None
+
+
+def get_transaction_cache() -> TransactionCache:
+    global _cache
+    if _cache is None:
+        _cache = TransactionCache()
+    return _cache
@@ -0,0 +1,127 @@
+import re
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Set, Union
+
+import base58
+from aiogram.enums import ChatType
+from aiogram.filters import Filter
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+TX_HASH_MIN_LEN = 43  # shortest signature validate_solana_tx_hash accepts; explorer URLs are longer
+PENDING_REFRESH_INTERVAL = 15.0
+PENDING_WINDOW = timedelta(hours=24)  # older unpaid purchases don't open group scanning
+GROUP_CHAT_TYPES = (ChatType.GROUP, ChatType.SUPERGROUP)
+
+# One pass over the text: explorer URL, a message that is just a hash, or a hash inside other text
+TX_HASH_PATTERN = re.compile(
+    r'(?:solscan\.io/tx/|explorer\.solana\.com/tx/|solana\.fm/tx/|solanabeach\.io/transaction/)([A-Za-z0-9]{43,90})'
+    r'|\A([1-9A-HJ-NP-Za-km-z]{43,100})\Z'
+    r'|\b([1-9A-HJ-NP-Za-km-z]{64,90})\b'
+)
+
+
+def validate_solana_tx_hash(tx_hash: str) -> bool:
+    if len(tx_hash) < 43 or len(tx_hash) > 100:
+        return False
+    try:
+        decoded = base58.b58decode(tx_hash)
+        return len(decoded) >= 32
+    except ValueError:
+        return False
+
+
+def extract_tx_hash(text: str) -> Optional[str]:
+    """Extract transaction hash from any format - URL, raw hash, or text containing hash."""
+    for match in TX_HASH_PATTERN.finditer(text.strip()):
+        candidate = match.group(match.lastindex)
+        if validate_solana_tx_hash(candidate):
+            return candidate
+    return None
+
+
+class PendingPurchases:
+    """Ids of users with an unpaid purchase from the last PENDING_WINDOW.
+
+    Refreshed from the database every PENDING_REFRESH_INTERVAL so purchases started on
+    other replicas show up; purchases started here are added right away.
+    """
+
+    def __init__(self, interval: float = PENDING_REFRESH_INTERVAL):
+        self.interval = interval
+        self.users: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def add(self, telegram_id: int):
+        self.users.add(telegram_id)
+
+    def __contains__(self, telegram_id: int) -> bool:
+        return telegram_id in self.users
+
+    async def refresh(self):
+        from src.database import db
+        self.users = set(await db.get_pending_purchase_users(datetime.utcnow() - PENDING_WINDOW))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Could not refresh pending purchases: {e}")
+            await asyncio.sleep(self.interval)
+
+
+class TxHashPrefilter(Filter):
+    """Lets through only messages that carry a tx hash worth claiming, as tx_hash.
+
+    Short texts are dropped on length alone, and in groups so are messages from users
+    without a pending purchase, before any regex or base58 work. Private chats are
+    always scanned so a user without a purchase still gets an answer.
+    """
+
+    def __init__(self, pending: PendingPurchases):
+        self.pending = pending
+        self.stats = {'filtered': 0, 'scanned': 0, 'matched': 0}
+
+    async def __call__(self, message: Message) -> Union[bool, dict]:
+        text = message.text
+        if text is None or len(text) < TX_HASH_MIN_LEN or text.startswith("/") or message.from_user is None:
+            self.stats['filtered'] += 1
+            return False
+        chat_type = message.chat.type
+        if chat_type != ChatType.PRIVATE and (
+                chat_type not in GROUP_CHAT_TYPES or message.from_user.id not in self.pending):
+            self.stats['filtered'] += 1
+            return False
+
+        self.stats['scanned'] += 1
+        tx_hash = extract_tx_hash(text)
+        if tx_hash is None:
+            return False
+        self.stats['matched'] += 1
+        return {'tx_hash': tx_hash}
+
+
+_pending_purchases: Optional[PendingPurchases] = None
+_prefilter: Optional[TxHashPrefilter] = None
+
+
+def get_pending_purchases() -> PendingPurchases:
+    global _pending_purchases
+    if _pending_purchases is None:
+        _pending_purchases = PendingPurchases()
+    return _pending_purchases
+
+
+def get_tx_hash_prefilter() -> TxHashPrefilter:
+    global _prefilter
+    if _prefilter is None:
+        _prefilter = TxHashPrefilter(get_pending_purchases())
+    return _prefilter
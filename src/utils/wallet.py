@@ -1,6 +1,7 @@
 import os
 import base64
 import logging
+import base58
 from typing import Optional, Tuple
 from decimal import Decimal, ROUND_DOWN
 from solders.keypair import Keypair
@@ -78,34 +79,18 @@ def is_main_fapcoin_group(chat_id: int) -> bool:
 
 
 def get_main_wallet() -> Optional[Tuple[str, Keypair]]:
-    """Get the main wallet from environment for signing transactions.
+    """Get the main wallet for signing transactions.
     Returns (public_key, keypair) or None if not configured."""
-    address = os.environ.get('MAIN_WALLET_ADDRESS')
-    private_key = os.environ.get('MAIN_WALLET_PRIVATE_KEY')
-    
-    if not address or not private_key:
-        logger.warning("MAIN_WALLET not configured - on-chain transfers disabled")
-        return None
-    
-    try:
-        import base58
-        private_key_bytes = base58.b58decode(private_key)
-        keypair = Keypair.from_bytes(private_key_bytes)
-        loaded_address = str(keypair.pubkey())
-        
-        if loaded_address != address:
-            logger.error(f"Main wallet address mismatch! Expected {address}, got {loaded_address}")
-            return None
-        
-        logger.info(f"Main wallet loaded: {address[:8]}...{address[-4:]}")
-        return (address, keypair)
-    except Exception as e:
-        logger.error(f"Failed to load main wallet: {e}")
+    context = get_main_wallet_context()
+    if not context:
         return None
+    return (context.address, context.keypair)
 
 
 def get_main_wallet_address() -> Optional[str]:
     """Get just the main wallet address without loading private key."""
+    if _main_wallet_context:
+        return _main_wallet_context.address
     return os.environ.get('MAIN_WALLET_ADDRESS')
 
 
@@ -139,11 +124,111 @@ FAPCOIN_DECIMALS = 6
 SYSTEM_PROGRAM_ID = "11111111111111111111111111111111"
 TOKEN_PROGRAM_ID_STR = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
 ASSOCIATED_TOKEN_PROGRAM_ID_STR = "ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL"
+COMPUTE_BUDGET_PROGRAM_ID_STR = "ComputeBudget111111111111111111111111111111"
+
+# Parsed once at import; the send paths reuse these instead of re-parsing per transfer
+SYSTEM_PROGRAM = Pubkey.from_string(SYSTEM_PROGRAM_ID)
+TOKEN_PROGRAM_ID = Pubkey.from_string(TOKEN_PROGRAM_ID_STR)
+ASSOCIATED_TOKEN_PROGRAM_ID = Pubkey.from_string(ASSOCIATED_TOKEN_PROGRAM_ID_STR)
+COMPUTE_BUDGET_PROGRAM = Pubkey.from_string(COMPUTE_BUDGET_PROGRAM_ID_STR)
+FAPCOIN_MINT_PUBKEY = Pubkey.from_string(FAPCOIN_MINT) if FAPCOIN_MINT else None
+
+
+def get_associated_token_address(owner: Pubkey, mint: Pubkey = None) -> Pubkey:
+    """Derive the associated token account of owner for mint (FAPCOIN by default)."""
+    if mint is None:
+        mint = FAPCOIN_MINT_PUBKEY
+    seeds = [bytes(owner), bytes(TOKEN_PROGRAM_ID), bytes(mint)]
+    program_address, _ = Pubkey.find_program_address(seeds, ASSOCIATED_TOKEN_PROGRAM_ID)
+    return program_address
+
+
+PRIORITY_FEE_MICRO_LAMPORTS = 50000
+DEFAULT_COMPUTE_UNIT_LIMIT = 200000
+
+
+class MainWalletContext:
+    """Main wallet signer plus its derived addresses, built once and shared by all payouts."""
+
+    def __init__(self, address: str, keypair: Keypair):
+        self.address = address
+        self.keypair = keypair
+        self.pubkey = keypair.pubkey()
+        self.mint = FAPCOIN_MINT_PUBKEY
+        self.ata = get_associated_token_address(self.pubkey, self.mint) if self.mint else None
+
+
+_main_wallet_context: Optional[MainWalletContext] = None
+_main_wallet_loaded = False
+
+
+def _read_main_wallet_private_key() -> Optional[str]:
+    """Read the base58 private key, preferring MAIN_WALLET_KEY_FILE so it can be rotated on disk."""
+    key_file = os.environ.get('MAIN_WALLET_KEY_FILE')
+    if key_file:
+        try:
+            with open(key_file) as f:
+                return f.read().strip()
+        except OSError as e:
+            logger.error(f"Failed to read MAIN_WALLET_KEY_FILE: {e}")
+            return None
+    return os.environ.get('MAIN_WALLET_PRIVATE_KEY')
+
+
+def load_main_wallet_context(expected_address: str = None, strict: bool = False) -> Optional[MainWalletContext]:
+    """(Re)load the main wallet signer. Called once at startup and again by /reloadwallet.
+
+    The key (from MAIN_WALLET_KEY_FILE or MAIN_WALLET_PRIVATE_KEY) must belong to
+    expected_address, by default MAIN_WALLET_ADDRESS; a rotation passes the new address.
+    On a mismatch strict (startup) raises so the bot refuses to start, otherwise the
+    previously loaded signer stays active, as it does when a reload fails.
+    """
+    global _main_wallet_context, _main_wallet_loaded
+    _main_wallet_loaded = True
+    
+    address = expected_address or os.environ.get('MAIN_WALLET_ADDRESS')
+    private_key = _read_main_wallet_private_key()
+    
+    if not private_key or not address:
+        logger.warning("MAIN_WALLET not configured - on-chain transfers disabled")
+        return _main_wallet_context
+    
+    try:
+        keypair = Keypair.from_bytes(base58.b58decode(private_key))
+    except Exception as e:
+        logger.error(f"Failed to load main wallet: {e}")
+        return _main_wallet_context
+    loaded_address = str(keypair.pubkey())
+    
+    if loaded_address != address:
+        logger.error(f"Main wallet address mismatch! Expected {address}, got {loaded_address}")
+        if strict:
+            raise RuntimeError(f"Main wallet key does not belong to {address}")
+        return _main_wallet_context
+    
+    try:
+        _main_wallet_context = MainWalletContext(loaded_address, keypair)
+        logger.info(f"Main wallet loaded: {loaded_address[:8]}...{loaded_address[-4:]}")
+        return _main_wallet_context
+    except Exception as e:
+        logger.error(f"Failed to load main wallet: {e}")
+        return _main_wallet_context
+
+
+def get_main_wallet_context() -> Optional[MainWalletContext]:
+    """Get the cached main wallet signer, loading it on first use."""
+    if not _main_wallet_loaded:
+        load_main_wallet_context()
+    return _main_wallet_context
 
 
 async def get_token_balance(wallet_address: str, mint_address: str = None) -> float:
-    """Get FAPCOIN token balance for a wallet address."""
-    import aiohttp
+    """Get FAPCOIN token balance for a wallet address.
+    
+    A wallet without a token account has 0. Raises RpcError when the RPC can't answer,
+    so callers never mistake an outage for an empty wallet.
+    """
+    from src.utils.rpc import rpc_request, RpcError
     
     if mint_address is None:
         mint_address = FAPCOIN_MINT
@@ -151,60 +236,36 @@ async def get_token_balance(wallet_address: str, mint_address: str = None) -> fl
     if not mint_address:
         return 0.0
     
-    rpc_url = os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
-    
-    try:
-        from solders.pubkey import Pubkey as SoldersPubkey
-        
-        owner_pubkey = SoldersPubkey.from_string(wallet_address)
-        mint_pubkey = SoldersPubkey.from_string(mint_address)
-        token_program = SoldersPubkey.from_string(TOKEN_PROGRAM_ID_STR)
-        ata_program = SoldersPubkey.from_string(ASSOCIATED_TOKEN_PROGRAM_ID_STR)
-        
-        seeds = [bytes(owner_pubkey), bytes(token_program), bytes(mint_pubkey)]
-        ata_address, _ = SoldersPubkey.find_program_address(seeds, ata_program)
-        
-        async with aiohttp.ClientSession() as session:
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getTokenAccountBalance",
-                "params": [str(ata_address)]
-            }
-            async with session.post(rpc_url, json=payload) as resp:
-                result = await resp.json()
-                if "error" in result or result.get("result", {}).get("value") is None:
-                    return 0.0
-                ui_amount = result["result"]["value"].get("uiAmount", 0)
-                return float(ui_amount) if ui_amount else 0.0
-    except Exception as e:
-        logger.error(f"Error getting token balance: {e}")
+    owner_pubkey = Pubkey.from_string(wallet_address)
+    if mint_address == FAPCOIN_MINT:
+        mint_pubkey = FAPCOIN_MINT_PUBKEY
+    else:
+        mint_pubkey = Pubkey.from_string(mint_address)
+    ata_address = get_associated_token_address(owner_pubkey, mint_pubkey)
+    
+    result = await rpc_request("getAccountInfo", [str(ata_address), {"encoding": "jsonParsed", "commitment": "confirmed"}])
+    if "error" in result:
+        raise RpcError(f"Error getting token balance: {result['error']}")
+    value = result.get("result", {}).get("value")
+    if value is None:
         return 0.0
+    data = value.get("data")
+    if not isinstance(data, dict):
+        raise RpcError(f"Unexpected token account data for {ata_address}")
+    token_amount = data["parsed"]["info"]["tokenAmount"]
+    ui_amount = token_amount.get("uiAmount")
+    return float(ui_amount) if ui_amount else 0.0
 
 
 async def get_sol_balance(wallet_address: str) -> float:
-    """Get SOL balance for a wallet address."""
-    import aiohttp
-    
-    rpc_url = os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
+    """Get SOL balance for a wallet address. Raises RpcError when the RPC can't answer."""
+    from src.utils.rpc import rpc_request, RpcError
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getBalance",
-                "params": [wallet_address]
-            }
-            async with session.post(rpc_url, json=payload) as resp:
-                result = await resp.json()
-                if "error" in result:
-                    return 0.0
-                lamports = result.get("result", {}).get("value", 0)
-                return lamports / 1_000_000_000
-    except Exception as e:
-        logger.error(f"Error getting SOL balance: {e}")
-        return 0.0
+    result = await rpc_request("getBalance", [wallet_address, {"commitment": "confirmed"}])
+    if "error" in result:
+        raise RpcError(f"Error getting SOL balance: {result['error']}")
+    lamports = result.get("result", {}).get("value", 0)
+    return lamports / 1_000_000_000
 
 
 async def check_transaction_status(tx_signature: str) -> Tuple[str, Optional[str]]:
@@ -213,38 +274,27 @@ async def check_transaction_status(tx_signature: str) -> Tuple[str, Optional[str
     Returns: (status, error_message)
     status can be: 'confirmed', 'finalized', 'pending', 'failed'
     """
-    import aiohttp
-    import asyncio
-    
-    rpc_url = os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
+    from src.utils.rpc import rpc_request
     
     try:
-        async with aiohttp.ClientSession() as session:
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getSignatureStatuses",
-                "params": [[tx_signature], {"searchTransactionHistory": True}]
-            }
-            async with session.post(rpc_url, json=payload) as resp:
-                result = await resp.json()
-                
-                if "error" in result:
-                    return "failed", f"RPC error: {result['error']}"
-                
-                statuses = result.get("result", {}).get("value", [])
-                if not statuses or statuses[0] is None:
-                    return "pending", None
-                
-                status = statuses[0]
-                if status.get("err"):
-                    return "failed", f"Transaction error: {status['err']}"
-                
-                confirmation_status = status.get("confirmationStatus", "")
-                if confirmation_status in ["confirmed", "finalized"]:
-                    return confirmation_status, None
-                
-                return "pending", None
+        result = await rpc_request("getSignatureStatuses", [[tx_signature], {"searchTransactionHistory": True}])
+        
+        if "error" in result:
+            return "failed", f"RPC error: {result['error']}"
+        
+        statuses = result.get("result", {}).get("value", [])
+        if not statuses or statuses[0] is None:
+            return "pending", None
+        
+        status = statuses[0]
+        if status.get("err"):
+            return "failed", f"Transaction error: {status['err']}"
+        
+        confirmation_status = status.get("confirmationStatus", "")
+        if confirmation_status in ["confirmed", "finalized"]:
+            return confirmation_status, None
+        
+        return "pending", None
     except Exception as e:
         logger.error(f"Error checking tx status: {e}")
         return "failed", str(e)
@@ -253,6 +303,12 @@ async def check_transaction_status(tx_signature: str) -> Tuple[str, Optional[str
 async def send_fapcoin_with_retry(to_address: str, amount: float, max_retries: int = 3, check_delay: float = 5.0) -> Tuple[bool, Optional[str], Optional[str]]:
     """Send FAPCOIN with automatic retry and confirmation checking.
     
+    A new transaction is only built when the previous one provably did not land
+    (rejected before broadcast or blockhash expired). If a signature may still land,
+    it is returned as a failure instead of risking a second payment.
+    
+    check_delay is no longer used; confirmation comes from the shared tracker.
+    
     Returns: (success, tx_signature, error_message)
     """
     import asyncio
@@ -265,40 +321,18 @@ async def send_fapcoin_with_retry(to_address: str, amount: float, max_retries: i
         
         success, tx_signature, error = await send_fapcoin(to_address, amount)
         
-        if not success:
-            last_error = error
-            if "Insufficient" in (error or ""):
-                return False, None, error
-            await asyncio.sleep(2)
-            continue
-        
-        await asyncio.sleep(check_delay)
-        
-        status, status_error = await check_transaction_status(tx_signature)
-        
-        if status in ["confirmed", "finalized"]:
+        if success:
             logger.info(f"Transaction {tx_signature} confirmed on attempt {attempt + 1}")
             return True, tx_signature, None
-        elif status == "failed":
-            last_error = status_error or "Transaction failed on-chain"
-            logger.warning(f"Transaction {tx_signature} failed: {last_error}")
-            continue
-        else:
-            for _ in range(3):
-                await asyncio.sleep(3)
-                status, status_error = await check_transaction_status(tx_signature)
-                if status in ["confirmed", "finalized"]:
-                    logger.info(f"Transaction {tx_signature} confirmed after additional wait")
-                    return True, tx_signature, None
-                elif status == "failed":
-                    break
-            
-            if status in ["confirmed", "finalized"]:
-                return True, tx_signature, None
-            elif status == "failed":
-                last_error = status_error or "Transaction failed on-chain"
-            else:
-                return True, tx_signature, None
+        
+        if tx_signature:
+            logger.error(f"Transaction {tx_signature} not confirmed, not rebuilding: {error}")
+            return False, tx_signature, error
+        
+        last_error = error
+        if "Insufficient" in (error or ""):
+            return False, None, error
+        await asyncio.sleep(2)
     
     return False, None, last_error or "Transaction failed after all retries"
 
@@ -308,205 +342,103 @@ async def send_fapcoin(to_address: str, amount: float) -> Tuple[bool, Optional[s
     
     Professional-grade SPL token transfer with:
     - Compute budget for priority fees
-    - Fresh blockhash for each attempt
+    - Signed once and rebroadcast until confirmed or the blockhash expires
     - Proper ATA creation
     - Transaction confirmation waiting
     
+    tx_signature is None on failure only when the transfer provably did not land.
+    
     Returns: (success, tx_signature, error_message)
     """
-    import aiohttp
-    import struct
-    import asyncio
-    
-    main_wallet = get_main_wallet()
+    main_wallet = get_main_wallet_context()
     if not main_wallet:
         return False, None, "Main wallet not configured"
     
-    main_address, main_keypair = main_wallet
-    rpc_url = os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
-    
     if not FAPCOIN_MINT:
         return False, None, "FAPCOIN_MINT not configured"
     
     if not validate_solana_address(to_address):
         return False, None, "Invalid destination address"
     
-    sol_balance = await get_sol_balance(main_address)
-    if sol_balance < 0.005:
-        return False, None, f"Insufficient SOL for gas fees (have {sol_balance:.4f} SOL, need 0.005)"
+    from src.utils.balance_book import get_balance_book
     
-    token_balance = await get_token_balance(main_address)
-    if token_balance < amount:
-        return False, None, f"Insufficient FAPCOIN in main wallet (have {token_balance:,.2f}, need {amount:,.2f})"
+    # Admission against the local balance book, no RPC round trip
+    book = get_balance_book()
+    reservation, error = await book.reserve(main_wallet, amount)
+    if reservation is None:
+        return False, None, error
     
+    success, tx_signature, error = await _transfer_from_main(main_wallet, to_address, amount)
+    # Anything that may have landed counts as spent until the next reconcile
+    book.settle(reservation, spent=success or tx_signature is not None)
+    return success, tx_signature, error
+
+
+async def _transfer_from_main(main_wallet, to_address: str, amount: float) -> Tuple[bool, Optional[str], Optional[str]]:
     try:
-        raw_amount = int(amount * (10 ** FAPCOIN_DECIMALS))
-        
-        from solders.pubkey import Pubkey as SoldersPubkey
-        from solders.transaction import Transaction
-        from solders.message import Message
-        from solders.instruction import Instruction, AccountMeta
-        from solders.hash import Hash
-        
-        mint_pubkey = SoldersPubkey.from_string(FAPCOIN_MINT)
-        owner_pubkey = main_keypair.pubkey()
-        dest_pubkey = SoldersPubkey.from_string(to_address)
-        
-        TOKEN_PROGRAM_ID = SoldersPubkey.from_string(TOKEN_PROGRAM_ID_STR)
-        ASSOCIATED_TOKEN_PROGRAM_ID = SoldersPubkey.from_string(ASSOCIATED_TOKEN_PROGRAM_ID_STR)
-        SYSTEM_PROGRAM = SoldersPubkey.from_string(SYSTEM_PROGRAM_ID)
-        COMPUTE_BUDGET_PROGRAM = SoldersPubkey.from_string("ComputeBudget111111111111111111111111111111")
-        
-        def get_associated_token_address(owner: SoldersPubkey, mint: SoldersPubkey) -> SoldersPubkey:
-            seeds = [bytes(owner), bytes(TOKEN_PROGRAM_ID), bytes(mint)]
-            program_address, _ = SoldersPubkey.find_program_address(seeds, ASSOCIATED_TOKEN_PROGRAM_ID)
-            return program_address
-        
-        source_ata = get_associated_token_address(owner_pubkey, mint_pubkey)
-        dest_ata = get_associated_token_address(dest_pubkey, mint_pubkey)
-        
-        async with aiohttp.ClientSession() as session:
-            blockhash_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getLatestBlockhash",
-                "params": [{"commitment": "confirmed"}]
-            }
-            async with session.post(rpc_url, json=blockhash_payload) as resp:
-                result = await resp.json()
-                if "error" in result:
-                    return False, None, f"RPC error getting blockhash: {result['error']}"
-                blockhash_str = result["result"]["value"]["blockhash"]
-                last_valid_block = result["result"]["value"]["lastValidBlockHeight"]
-            
-            check_ata_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getAccountInfo",
-                "params": [str(dest_ata), {"encoding": "base64"}]
-            }
-            async with session.post(rpc_url, json=check_ata_payload) as resp:
-                ata_result = await resp.json()
-                dest_ata_exists = ata_result.get("result", {}).get("value") is not None
-        
-        instructions = []
-        
-        set_compute_limit_data = bytes([2]) + struct.pack('<I', 200000)
-        set_compute_limit_ix = Instruction(COMPUTE_BUDGET_PROGRAM, set_compute_limit_data, [])
-        instructions.append(set_compute_limit_ix)
-        
-        set_priority_fee_data = bytes([3]) + struct.pack('<Q', 50000)
-        set_priority_fee_ix = Instruction(COMPUTE_BUDGET_PROGRAM, set_priority_fee_data, [])
-        instructions.append(set_priority_fee_ix)
-        
-        if not dest_ata_exists:
-            create_ata_accounts = [
-                AccountMeta(owner_pubkey, is_signer=True, is_writable=True),
-                AccountMeta(dest_ata, is_signer=False, is_writable=True),
-                AccountMeta(dest_pubkey, is_signer=False, is_writable=False),
-                AccountMeta(mint_pubkey, is_signer=False, is_writable=False),
-                AccountMeta(SYSTEM_PROGRAM, is_signer=False, is_writable=False),
-                AccountMeta(TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-            ]
-            create_ata_ix = Instruction(ASSOCIATED_TOKEN_PROGRAM_ID, bytes(), create_ata_accounts)
-            instructions.append(create_ata_ix)
-            logger.info(f"Creating ATA for destination: {dest_ata}")
-        
-        transfer_data = bytes([3]) + struct.pack('<Q', raw_amount)
-        transfer_accounts = [
-            AccountMeta(source_ata, is_signer=False, is_writable=True),
-            AccountMeta(dest_ata, is_signer=False, is_writable=True),
-            AccountMeta(owner_pubkey, is_signer=True, is_writable=False),
-        ]
-        transfer_ix = Instruction(TOKEN_PROGRAM_ID, transfer_data, transfer_accounts)
-        instructions.append(transfer_ix)
-        
-        blockhash = Hash.from_string(blockhash_str)
-        message = Message.new_with_blockhash(instructions, owner_pubkey, blockhash)
-        tx = Transaction.new_unsigned(message)
-        tx.sign([main_keypair], blockhash)
-        
-        tx_bytes = bytes(tx)
-        tx_base64 = base64.b64encode(tx_bytes).decode('utf-8')
-        
-        async with aiohttp.ClientSession() as session:
-            sim_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "simulateTransaction",
-                "params": [tx_base64, {"encoding": "base64", "commitment": "confirmed"}]
-            }
-            async with session.post(rpc_url, json=sim_payload) as resp:
-                sim_result = await resp.json()
-                if "error" in sim_result:
-                    return False, None, f"Simulation error: {sim_result['error']}"
-                sim_value = sim_result.get("result", {}).get("value", {})
-                if sim_value.get("err"):
-                    return False, None, f"Simulation failed: {sim_value['err']}"
-            
-            send_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "sendTransaction",
-                "params": [tx_base64, {
-                    "encoding": "base64",
-                    "skipPreflight": True,
-                    "preflightCommitment": "confirmed",
-                    "maxRetries": 3
-                }]
-            }
-            async with session.post(rpc_url, json=send_payload) as resp:
-                send_result = await resp.json()
-                if "error" in send_result:
-                    error_msg = send_result['error'].get('message', str(send_result['error']))
-                    logger.error(f"Transaction send error: {error_msg}")
-                    return False, None, f"Transaction failed: {error_msg}"
-                tx_signature = send_result["result"]
-            
-            logger.info(f"Transaction sent: {tx_signature}, waiting for confirmation...")
-            
-            for i in range(30):
-                await asyncio.sleep(2)
-                
-                status_payload = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "getSignatureStatuses",
-                    "params": [[tx_signature], {"searchTransactionHistory": True}]
-                }
-                async with session.post(rpc_url, json=status_payload) as resp:
-                    status_result = await resp.json()
-                    statuses = status_result.get("result", {}).get("value", [])
-                    
-                    if statuses and statuses[0]:
-                        status = statuses[0]
-                        if status.get("err"):
-                            return False, tx_signature, f"Transaction failed on-chain: {status['err']}"
-                        
-                        confirmation = status.get("confirmationStatus", "")
-                        if confirmation in ["confirmed", "finalized"]:
-                            logger.info(f"FAPCOIN transfer confirmed: {tx_signature} - {amount} FAPCOIN to {to_address}")
-                            return True, tx_signature, None
-                
-                block_payload = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "getBlockHeight",
-                    "params": []
-                }
-                async with session.post(rpc_url, json=block_payload) as resp:
-                    block_result = await resp.json()
-                    current_block = block_result.get("result", 0)
-                    if current_block > last_valid_block:
-                        return False, None, "Transaction expired (blockhash too old)"
-            
-            return False, tx_signature, "Transaction sent but confirmation timed out"
-                
+        status, tx_signature, status_error = await _send_spl_transfer(
+            main_wallet.keypair, main_wallet.ata, to_address, amount, timeout=90.0
+        )
     except Exception as e:
         logger.error(f"FAPCOIN transfer error: {e}")
         import traceback
         logger.error(traceback.format_exc())
         return False, None, str(e)
+    
+    if status in ["confirmed", "finalized"]:
+        logger.info(f"FAPCOIN transfer confirmed: {tx_signature} - {amount} FAPCOIN to {to_address}")
+        return True, tx_signature, None
+    if status in ["rejected", "expired"]:
+        logger.error(f"FAPCOIN transfer not landed ({status}): {status_error}")
+        return False, None, status_error
+    return False, tx_signature, status_error
+
+
+async def _send_spl_transfer(signer: Keypair, source_ata: Pubkey, to_address: str, amount: float,
+                             timeout: float, raw_amount: Optional[int] = None) -> Tuple[str, Optional[str], Optional[str]]:
+    """Build, price, sign and broadcast one FAPCOIN transfer paid for by signer.
+    
+    Shared by the main wallet and user wallet send paths. raw_amount, when given, is sent
+    as-is instead of amount scaled by FAPCOIN_DECIMALS (the float round trip can drop a unit).
+    Returns: (status, tx_signature, error) as from send_and_confirm
+    """
+    from solders.hash import Hash
+    from src.utils.fees import prepare_transaction
+    from src.utils.rpc import rpc_request
+    from src.utils.sender import send_and_confirm
+    from src.utils.tx_builder import Transfer, transfer_instructions
+    
+    owner_pubkey = signer.pubkey()
+    dest_pubkey = Pubkey.from_string(to_address)
+    dest_ata = get_associated_token_address(dest_pubkey, FAPCOIN_MINT_PUBKEY)
+    if raw_amount is None:
+        raw_amount = int(amount * (10 ** FAPCOIN_DECIMALS))
+    
+    result = await rpc_request("getLatestBlockhash", [{"commitment": "confirmed"}])
+    if "error" in result:
+        return "rejected", None, f"RPC error getting blockhash: {result['error']}"
+    blockhash = Hash.from_string(result["result"]["value"]["blockhash"])
+    last_valid_block = result["result"]["value"]["lastValidBlockHeight"]
+    
+    ata_result = await rpc_request("getAccountInfo", [str(dest_ata), {"encoding": "base64"}], priority=True)
+    dest_ata_exists = ata_result.get("result", {}).get("value") is not None
+    if not dest_ata_exists:
+        logger.info(f"Creating ATA for destination: {dest_ata}")
+    
+    instructions = transfer_instructions(
+        owner_pubkey, source_ata, owner_pubkey, [Transfer(dest_pubkey, dest_ata, raw_amount, not dest_ata_exists)]
+    )
+    
+    # Compute budget comes from the fee oracle and the simulated unitsConsumed
+    tx, sim_error = await prepare_transaction(
+        instructions, owner_pubkey, [signer], blockhash,
+        writable_accounts=[str(source_ata), str(dest_ata)]
+    )
+    if tx is None:
+        return "rejected", None, sim_error
+    
+    # Signed once: rebroadcast until it lands or the blockhash provably expires
+    return await send_and_confirm(tx, last_valid_block, timeout=timeout)
 
 
 async def send_fapcoin_from_user_wallet(encrypted_private_key: str, to_address: str, amount: float) -> Tuple[bool, Optional[str], Optional[str]]:
@@ -516,12 +448,6 @@ async def send_fapcoin_from_user_wallet(encrypted_private_key: str, to_address:
     
     Returns: (success, tx_signature, error_message)
     """
-    import aiohttp
-    import struct
-    import asyncio
-    
-    rpc_url = os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
-    
     if not FAPCOIN_MINT:
         return False, None, "FAPCOIN_MINT not configured"
     
@@ -529,7 +455,8 @@ async def send_fapcoin_from_user_wallet(encrypted_private_key: str, to_address:
         return False, None, "Invalid destination address"
     
     try:
-        user_keypair = decrypt_private_key(encrypted_private_key)
+        from src.utils import crypto_executor
+        user_keypair = await crypto_executor.decrypt_private_key(encrypted_private_key)
         user_address = str(user_keypair.pubkey())
         
         sol_balance = await get_sol_balance(user_address)
@@ -540,137 +467,20 @@ async def send_fapcoin_from_user_wallet(encrypted_private_key: str, to_address:
         if token_balance < amount:
             return False, None, f"Insufficient FAPCOIN in user wallet (have {token_balance:,.2f}, need {amount:,.2f})"
         
-        raw_amount = int(amount * (10 ** FAPCOIN_DECIMALS))
-        
-        from solders.pubkey import Pubkey as SoldersPubkey
-        from solders.transaction import Transaction
-        from solders.message import Message
-        from solders.instruction import Instruction, AccountMeta
-        from solders.hash import Hash
-        
-        mint_pubkey = SoldersPubkey.from_string(FAPCOIN_MINT)
-        owner_pubkey = user_keypair.pubkey()
-        dest_pubkey = SoldersPubkey.from_string(to_address)
-        
-        TOKEN_PROGRAM_ID = SoldersPubkey.from_string(TOKEN_PROGRAM_ID_STR)
-        ASSOCIATED_TOKEN_PROGRAM_ID = SoldersPubkey.from_string(ASSOCIATED_TOKEN_PROGRAM_ID_STR)
-        SYSTEM_PROGRAM = SoldersPubkey.from_string(SYSTEM_PROGRAM_ID)
-        COMPUTE_BUDGET_PROGRAM = SoldersPubkey.from_string("ComputeBudget111111111111111111111111111111")
-        
-        def get_associated_token_address(owner: SoldersPubkey, mint: SoldersPubkey) -> SoldersPubkey:
-            seeds = [bytes(owner), bytes(TOKEN_PROGRAM_ID), bytes(mint)]
-            program_address, _ = SoldersPubkey.find_program_address(seeds, ASSOCIATED_TOKEN_PROGRAM_ID)
-            return program_address
-        
-        source_ata = get_associated_token_address(owner_pubkey, mint_pubkey)
-        dest_ata = get_associated_token_address(dest_pubkey, mint_pubkey)
-        
-        async with aiohttp.ClientSession() as session:
-            blockhash_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getLatestBlockhash",
-                "params": [{"commitment": "confirmed"}]
-            }
-            async with session.post(rpc_url, json=blockhash_payload) as resp:
-                result = await resp.json()
-                if "error" in result:
-                    return False, None, f"RPC error getting blockhash: {result['error']}"
-                blockhash_str = result["result"]["value"]["blockhash"]
-            
-            check_ata_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getAccountInfo",
-                "params": [str(dest_ata), {"encoding": "base64"}]
-            }
-            async with session.post(rpc_url, json=check_ata_payload) as resp:
-                ata_result = await resp.json()
-                dest_ata_exists = ata_result.get("result", {}).get("value") is not None
-        
-        instructions = []
-        
-        set_compute_limit_data = bytes([2]) + struct.pack('<I', 200000)
-        set_compute_limit_ix = Instruction(COMPUTE_BUDGET_PROGRAM, set_compute_limit_data, [])
-        instructions.append(set_compute_limit_ix)
-        
-        set_priority_fee_data = bytes([3]) + struct.pack('<Q', 50000)
-        set_priority_fee_ix = Instruction(COMPUTE_BUDGET_PROGRAM, set_priority_fee_data, [])
-        instructions.append(set_priority_fee_ix)
-        
-        if not dest_ata_exists:
-            create_ata_accounts = [
-                AccountMeta(owner_pubkey, is_signer=True, is_writable=True),
-                AccountMeta(dest_ata, is_signer=False, is_writable=True),
-                AccountMeta(dest_pubkey, is_signer=False, is_writable=False),
-                AccountMeta(mint_pubkey, is_signer=False, is_writable=False),
-                AccountMeta(SYSTEM_PROGRAM, is_signer=False, is_writable=False),
-                AccountMeta(TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-            ]
-            create_ata_ix = Instruction(ASSOCIATED_TOKEN_PROGRAM_ID, bytes(), create_ata_accounts)
-            instructions.append(create_ata_ix)
-        
-        transfer_data = bytes([3]) + struct.pack('<Q', raw_amount)
-        transfer_accounts = [
-            AccountMeta(source_ata, is_signer=False, is_writable=True),
-            AccountMeta(dest_ata, is_signer=False, is_writable=True),
-            AccountMeta(owner_pubkey, is_signer=True, is_writable=False),
-        ]
-        transfer_ix = Instruction(TOKEN_PROGRAM_ID, transfer_data, transfer_accounts)
-        instructions.append(transfer_ix)
-        
-        blockhash = Hash.from_string(blockhash_str)
-        message = Message.new_with_blockhash(instructions, owner_pubkey, blockhash)
-        tx = Transaction.new_unsigned(message)
-        tx.sign([user_keypair], blockhash)
+        source_ata = get_associated_token_address(user_keypair.pubkey(), FAPCOIN_MINT_PUBKEY)
+        status, tx_signature, status_error = await _send_spl_transfer(
+            user_keypair, source_ata, to_address, amount, timeout=30.0
+        )
         
-        tx_bytes = bytes(tx)
-        tx_base64 = base64.b64encode(tx_bytes).decode('utf-8')
+        if status in ["confirmed", "finalized"]:
+            logger.info(f"User wallet transfer confirmed: {tx_signature}")
+            return True, tx_signature, None
+        if status == "failed":
+            return False, tx_signature, status_error
+        if status in ["rejected", "expired"]:
+            return False, None, status_error
         
-        async with aiohttp.ClientSession() as session:
-            send_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "sendTransaction",
-                "params": [tx_base64, {
-                    "encoding": "base64",
-                    "skipPreflight": False,
-                    "preflightCommitment": "confirmed",
-                    "maxRetries": 3
-                }]
-            }
-            async with session.post(rpc_url, json=send_payload) as resp:
-                send_result = await resp.json()
-                if "error" in send_result:
-                    error_msg = send_result['error'].get('message', str(send_result['error']))
-                    return False, None, f"Transaction failed: {error_msg}"
-                tx_signature = send_result["result"]
-            
-            logger.info(f"User wallet transfer sent: {tx_signature}")
-            
-            for i in range(15):
-                await asyncio.sleep(2)
-                status_payload = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "getSignatureStatuses",
-                    "params": [[tx_signature], {"searchTransactionHistory": True}]
-                }
-                async with session.post(rpc_url, json=status_payload) as resp:
-                    status_result = await resp.json()
-                    statuses = status_result.get("result", {}).get("value", [])
-                    
-                    if statuses and statuses[0]:
-                        status = statuses[0]
-                        if status.get("err"):
-                            return False, tx_signature, f"Transaction failed: {status['err']}"
-                        
-                        confirmation = status.get("confirmationStatus", "")
-                        if confirmation in ["confirmed", "finalized"]:
-                            logger.info(f"User wallet transfer confirmed: {tx_signature}")
-                            return True, tx_signature, None
-            
-            return True, tx_signature, "Sent (confirmation pending)"
+        return True, tx_signature, "Sent (confirmation pending)"
                 
     except Exception as e:
         logger.error(f"User wallet transfer error: {e}")
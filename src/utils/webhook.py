@@ -0,0 +1,147 @@
+import os
+import hmac
+import asyncio
+import hashlib
+import logging
+from typing import Optional, Set
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '').rstrip('/')  # public base URL; unset = long polling
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_HOST = os.environ.get('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.environ.get('PORT', '8080'))
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get('WEBHOOK_MAX_CONNECTIONS', '40'))  # Telegram accepts 1-100
+UPDATE_CONCURRENCY = int(os.environ.get('UPDATE_CONCURRENCY', '64'))  # updates handled at once per instance
+SHUTDOWN_DRAIN_TIMEOUT = 20.0
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def webhook_enabled() -> bool:
+    return bool(WEBHOOK_URL)
+
+
+def webhook_secret(bot_token: str) -> str:
+    """WEBHOOK_SECRET, or one derived from the bot token so every replica agrees on it."""
+    secret = os.environ.get('WEBHOOK_SECRET')
+    if secret:
+        return secret
+    return hashlib.sha256(f"webhook:{bot_token}".encode()).hexdigest()
+
+
+class WebhookServer:
+    """Receives Telegram updates over HTTPS instead of getUpdates long polling.
+
+    Any number of instances can sit behind a load balancer: Telegram spreads up to
+    WEBHOOK_MAX_CONNECTIONS concurrent requests over them and all state lives in the
+    shared database. Requests without the secret token header are rejected. Each
+    instance handles at most UPDATE_CONCURRENCY updates at a time; past that a request
+    waits before it is acknowledged, so a busy instance slows Telegram down instead of
+    queueing updates in memory. /healthz answers the load balancer's health checks.
+    """
+
+    def __init__(self, dp, bot, secret: str, concurrency: int = UPDATE_CONCURRENCY):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.stats = {'received': 0, 'rejected': 0, 'handled': 0, 'failed': 0}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.stats['rejected'] += 1
+            return web.Response(status=401, text="Unauthorized")
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400, text="Bad update")
+        self.stats['received'] += 1
+
+        # Telegram retries an update until it gets a 2xx, so acknowledge once handling has a slot
+        await self._slots.acquire()
+        task = asyncio.create_task(self._feed(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({})
+
+    async def _feed(self, update: dict):
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+            self.stats['handled'] += 1
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error(f"Update {update.get('update_id')} failed: {e}")
+        finally:
+            self._slots.release()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({'ok': True, 'in_flight': self.in_flight, **self.stats})
+
+    async def register(self):
+        """Point Telegram at WEBHOOK_URL with the current secret; every replica runs this on startup.
+
+        Always sent: the secret can't be read back from getWebhookInfo, so skipping an
+        unchanged-looking registration would leave a rotated secret unregistered.
+        """
+        url = WEBHOOK_URL + WEBHOOK_PATH
+        await self.bot.set_webhook(
+            url,
+            secret_token=self.secret,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=self.dp.resolve_used_update_types(),
+        )
+        logger.info(f"Webhook set to {url} (max {WEBHOOK_MAX_CONNECTIONS} connections)")
+
+    async def serve(self):
+        """Register the webhook and serve updates until cancelled."""
+        await self.dp.emit_startup(bot=self.bot, dispatcher=self.dp, **self.dp.workflow_data)
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        try:
+            await self.register()
+            await asyncio.Event().wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Stop taking requests and let updates already accepted finish.
+
+        The webhook itself stays registered because other replicas keep serving it.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._tasks:
+            logger.info(f"Waiting for {len(self._tasks)} updates to finish")
+            await asyncio.wait(set(self._tasks), timeout=SHUTDOWN_DRAIN_TIMEOUT)
+        await self.dp.emit_shutdown(bot=self.bot, dispatcher=self.dp, **self.dp.workflow_data)
+        await self.bot.session.close()
+
+
+async def run_updates(dp, bot, bot_token: str):
+    """Serve updates through the webhook when WEBHOOK_URL is set, else long polling (local dev)."""
+    if webhook_enabled():
+        await WebhookServer(dp, bot, webhook_secret(bot_token)).serve()
+        return
+    info = await bot.get_webhook_info()
+    if info.url:
+        # getUpdates is refused while a webhook is set
+        logger.warning(f"Removing webhook {info.url} to poll locally")
+        await bot.delete_webhook()
+    await dp.start_polling(bot)